@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from backend import models
+from backend.prices import refresh_price_entries
 
 
 @admin.register(models.Contact)
@@ -18,10 +19,10 @@ class ContactAdmin(admin.ModelAdmin):
 class ShopAdmin(admin.ModelAdmin):
     """ Класс для отображения магазинов в административной панеле.
     """
-    list_display = ['id', 'name', 'state', 'seller', 'buyer', 'filename']
+    list_display = ['id', 'name', 'state', 'seller', 'buyer', 'filename', 'drop_dir', 'feed_refreshed_at']
     list_display_links = ['id', 'name']
     list_filter = ['state']
-    search_fields = ['name', 'filename']
+    search_fields = ['name', 'filename', 'drop_dir']
     ordering = ['-id']
 
 
@@ -54,6 +55,12 @@ class ProductInfoAdmin(admin.ModelAdmin):
     search_fields = ['model', 'catalog_number']
     ordering = ['-id']
 
+    def save_model(self, request, obj, form, change):
+        """ Сохраняет Описание товара и его строку Прайса.
+        """
+        super().save_model(request, obj, form, change)
+        refresh_price_entries([obj.id])
+
 
 @admin.register(models.Parameter)
 class ParameterAdmin(admin.ModelAdmin):
@@ -75,6 +82,27 @@ class ProductParameterAdmin(admin.ModelAdmin):
     list_editable = ['value']
     ordering = ['-id']
 
+    def save_model(self, request, obj, form, change):
+        """ Сохраняет Значение параметра и характеристики в строке Прайса его Описания товара.
+        """
+        old_info_id = models.ProductParameter.objects.filter(pk=obj.pk).values_list('product_info_id', flat=True).first()
+        super().save_model(request, obj, form, change)
+        refresh_price_entries({obj.product_info_id, old_info_id} - {None})
+
+    def delete_model(self, request, obj):
+        """ Удаляет Значение параметра из строки Прайса.
+        """
+        info_id = obj.product_info_id
+        super().delete_model(request, obj)
+        refresh_price_entries([info_id] if info_id else [])
+
+    def delete_queryset(self, request, queryset):
+        """ Удаляет выбранные Значения параметров из строк Прайса.
+        """
+        info_ids = set(queryset.exclude(product_info=None).values_list('product_info_id', flat=True))
+        super().delete_queryset(request, queryset)
+        refresh_price_entries(info_ids)
+
 
 class OrderItemInLine(admin.TabularInline):
     """ Класс для отображения товаров из заказа в административной панеле.
@@ -94,3 +122,69 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ['updated_state', 'created_at']
     ordering = ['-id']
     inlines = [OrderItemInLine]
+
+
+class ImportRunInLine(admin.TabularInline):
+    """ Класс для отображения замеров выполнений задания на загрузку в административной панеле.
+    """
+    model = models.ImportRun
+    fields = ['state', 'duration', 'phases', 'rows_per_second', 'queries', 'peak_memory', 'created_at']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+@admin.register(models.ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    """ Класс для отображения заданий на загрузку прайсов в административной панеле.
+    """
+    list_display = ['id', 'shop', 'state', 'mode', 'received', 'skipped', 'created', 'updated', 'retired', 'created_at',
+                    'finished_at']
+    list_display_links = ['id', 'shop']
+    list_filter = ['state', 'mode', 'shop']
+    readonly_fields = ['received', 'skipped', 'rejected', 'created', 'updated', 'unchanged', 'retired', 'started_at',
+                       'finished_at']
+    ordering = ['-id']
+    inlines = [ImportRunInLine]
+
+
+@admin.register(models.ImportRun)
+class ImportRunAdmin(admin.ModelAdmin):
+    """ Класс для отображения замеров загрузок прайсов в административной панеле.
+    """
+    list_display = ['id', 'job', 'state', 'duration', 'rows_per_second', 'queries', 'peak_memory', 'created_at']
+    list_display_links = ['id', 'job']
+    list_filter = ['state', 'job__shop']
+    readonly_fields = ['job', 'state', 'duration', 'phases', 'rows_per_second', 'queries', 'peak_memory', 'counters',
+                       'created_at']
+    ordering = ['-id']
+
+
+@admin.register(models.ImportItemError)
+class ImportItemErrorAdmin(admin.ModelAdmin):
+    """ Класс для отображения ошибок товаров при загрузке прайсов в административной панеле.
+    """
+    list_display = ['id', 'job', 'external_id', 'message']
+    list_display_links = ['id', 'job']
+    list_filter = ['job__shop']
+    search_fields = ['=job__id', 'external_id']
+    readonly_fields = ['job', 'external_id', 'message']
+    list_select_related = ['job__shop']
+    ordering = ['-id']
+
+
+@admin.register(models.PriceEntry)
+class PriceEntryAdmin(admin.ModelAdmin):
+    """ Класс для отображения строк Прайса в административной панеле (только просмотр).
+    """
+    list_display = ['info', 'product_name', 'catalog_number', 'category_name', 'shop_name', 'shop_open', 'quantity',
+                    'price_rrc']
+    list_filter = ['shop_open', 'shop']
+    search_fields = ['product_name', 'model']
+    ordering = ['-info']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
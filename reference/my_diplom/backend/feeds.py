@@ -0,0 +1,772 @@
+import bz2
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import zipfile
+import zlib
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from yaml import YAMLError, load as load_yaml
+from yaml.events import (AliasEvent, DocumentEndEvent, DocumentStartEvent, MappingEndEvent, MappingStartEvent,
+                         ScalarEvent, SequenceEndEvent, SequenceStartEvent, StreamEndEvent, StreamStartEvent)
+from yaml.nodes import MappingNode, ScalarNode, SequenceNode
+
+try:
+    # Парсер на C из библиотеки libyaml в разы быстрее парсера на чистом Python.
+    from yaml import CLoader as FeedLoader
+except ImportError:
+    from yaml import Loader as FeedLoader
+
+try:
+    from yaml import CDumper as FeedDumper
+except ImportError:
+    from yaml import Dumper as FeedDumper
+
+CHUNK_SIZE = 64 * 1024
+GOODS_LINE = re.compile(r'goods\s*:\s*(#.*)?$')
+DOCUMENT_MARKER = b'\n---'
+CONTENT_LINE = re.compile(rb'^[ \t]*[^\s#%]', re.MULTILINE)
+
+
+def hash_source(source):
+    """ Вычисляет контрольную сумму SHA-256 файла прайса, читая его частями.
+        Поток без произвольного доступа (ответ сервера) при этом копируется во временный файл.
+        Возвращает файл, установленный на начало, и контрольную сумму.
+    """
+    digest = hashlib.sha256()
+    target = source if source.seekable() else tempfile.TemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR)
+    while chunk := source.read(CHUNK_SIZE):
+        digest.update(chunk)
+        if target is not source:
+            target.write(chunk)
+    target.seek(0)
+
+    return target, digest.hexdigest()
+
+
+def spool_stream(stream):
+    """ Копирует поток без произвольного доступа во временный файл частями, не больше FEED_FETCH_MAX_SIZE байт.
+        Возвращает файл, установленный на начало.
+    """
+    max_size, size = settings.FEED_FETCH_MAX_SIZE, 0
+    spool = tempfile.TemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR)
+    while chunk := stream.read(CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_size:
+            spool.close()
+            raise ValidationError({'detail': [f'Размер файла превышает {max_size} байт.']})
+        spool.write(chunk)
+    spool.seek(0)
+
+    return spool
+
+
+class YamlFeedReader:
+    """ Потоковое чтение YAML-файла с прайсом поставщика.
+        Файл разбирается на уровне событий парсера. Ключи верхнего уровня (`shop`, `categories`)
+        читаются целиком, а товары из списка `goods` выдаются по одному, не накапливаясь в памяти.
+        Для потоковой обработки ключи `shop` и `categories` должны предшествовать ключу `goods`,
+        иначе товары сначала считываются в память целиком.
+        Файл нескольких Магазинов (список Магазинов или несколько документов) отмечается в 'multi_shop',
+        товары из него не читаются, а разделы Магазинов выделяет 'iter_shop_sections()'.
+        Поиск нескольких документов ('scan_documents') просматривает файл целиком, поэтому выполняется
+        только по запросу - в обработчике очереди. Без него документ, следующий за первым,
+        замечается после чтения товаров первого документа и отмечается в 'more_documents'.
+    """
+
+    def __init__(self, stream, scan_documents=False):
+        self.stream = stream
+        self.text = None
+        self.loader = FeedLoader(stream)
+        self.anchors = {}
+        self.header = {}
+        self.in_goods = False
+        self.buffer = None
+        self.multi_shop = False
+        self.more_documents = False
+        try:
+            self.read_header()
+            if not self.multi_shop and scan_documents:
+                self.multi_shop = has_many_documents(stream)
+            if self.in_goods and not {'shop', 'categories'} <= set(self.header.keys()):
+                self.buffer = list(self.read_goods())
+        except YAMLError as e:
+            self.close()
+            raise ValidationError({'detail': [f'Ошибка разбора файла: {e}']})
+
+    def close(self):
+        """ Освобождает ресурсы парсера.
+        """
+        self.loader.dispose()
+        if self.text is not None:
+            self.text.detach()
+            self.text = None
+
+    def compose_node(self):
+        """ Собирает узел документа из событий парсера (аналог 'Composer.compose_node()').
+        """
+        event = self.loader.get_event()
+        if isinstance(event, AliasEvent):
+            return self.anchors[event.anchor]
+
+        if isinstance(event, ScalarEvent):
+            tag = event.tag
+            if tag is None or tag == '!':
+                tag = self.loader.resolve(ScalarNode, event.value, event.implicit)
+            node = ScalarNode(tag, event.value, event.start_mark, event.end_mark, style=event.style)
+        elif isinstance(event, SequenceStartEvent):
+            tag = event.tag
+            if tag is None or tag == '!':
+                tag = self.loader.resolve(SequenceNode, None, event.implicit)
+            node = SequenceNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+            while not self.loader.check_event(SequenceEndEvent):
+                node.value.append(self.compose_node())
+            node.end_mark = self.loader.get_event().end_mark
+        else:
+            tag = event.tag
+            if tag is None or tag == '!':
+                tag = self.loader.resolve(MappingNode, None, event.implicit)
+            node = MappingNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+            while not self.loader.check_event(MappingEndEvent):
+                key = self.compose_node()
+                node.value.append((key, self.compose_node()))
+            node.end_mark = self.loader.get_event().end_mark
+
+        if event.anchor is not None:
+            self.anchors[event.anchor] = node
+
+        return node
+
+    def construct(self):
+        """ Читает следующий узел документа и преобразует его в объект Python.
+        """
+        return self.loader.construct_document(self.compose_node())
+
+    def read_header(self):
+        """ Читает начало документа до списка товаров.
+        """
+        self.loader.get_event()    # StreamStartEvent
+        if self.loader.check_event(StreamEndEvent):
+            return
+
+        self.loader.get_event()    # DocumentStartEvent
+        if self.loader.check_event(SequenceStartEvent):
+            # Документ - список Магазинов.
+            self.multi_shop = True
+            return
+        if not self.loader.check_event(MappingStartEvent):
+            raise ValidationError({'detail': ['Файл должен содержать словарь с ключами `shop`, `categories`'
+                                              ' и `goods`.']})
+
+        self.loader.get_event()
+        self.read_keys()
+
+    def read_keys(self):
+        """ Читает ключи верхнего уровня до ключа `goods` или до конца документа.
+        """
+        while not self.loader.check_event(MappingEndEvent):
+            key = self.construct()
+            if key == 'shops':
+                self.multi_shop = True
+                return
+            if key == 'goods' and self.loader.check_event(SequenceStartEvent):
+                self.loader.get_event()
+                self.in_goods = True
+                return
+
+            self.header[key] = self.construct()
+
+        self.loader.get_event()    # MappingEndEvent
+        self.loader.get_event()    # DocumentEndEvent
+        self.more_documents = not self.loader.check_event(StreamEndEvent)
+
+    def read_goods(self):
+        """ Выдаёт товары из списка `goods` по одному, затем дочитывает оставшиеся ключи.
+        """
+        while self.in_goods and not self.loader.check_event(SequenceEndEvent):
+            yield self.construct()
+
+        if self.in_goods:
+            self.loader.get_event()
+            self.in_goods = False
+            self.read_keys()
+
+    def iter_goods(self):
+        """ Выдаёт товары по одному.
+        """
+        try:
+            if self.buffer is not None:
+                yield from self.buffer
+            else:
+                yield from self.read_goods()
+        except YAMLError as e:
+            raise ValidationError({'detail': [f'Ошибка разбора файла: {e}']})
+        finally:
+            self.close()
+
+    def can_split(self):
+        """ Проверяет, можно ли выдавать товары текстом, не разбирая их (см. 'iter_raw_goods()').
+            Это возможно, если файл допускает произвольный доступ, а список `goods` записан в блочном стиле
+            после заголовка. Иначе позиция в файле восстанавливается и товары читаются через 'iter_goods()'.
+        """
+        if self.buffer is not None or not self.in_goods or not self.stream.seekable():
+            return False
+
+        position = self.stream.tell()
+        self.stream.seek(0)
+        self.text = io.TextIOWrapper(self.stream, encoding='utf-8-sig')
+        while line := self.text.readline():
+            if GOODS_LINE.match(line):
+                goods_position = self.text.tell()
+                while (line := self.text.readline()) and (not line.strip() or line.lstrip().startswith('#')):
+                    pass
+                if line.lstrip(' ').startswith('-'):
+                    self.text.seek(goods_position)
+                    return True
+                break
+
+        self.text.detach()
+        self.text = None
+        self.stream.seek(position)
+        return False
+
+    def iter_raw_goods(self):
+        """ Выдаёт текст каждого элемента списка `goods`, не разбирая его.
+            Элемент начинается строкой с '-' на уровне отступа первого элемента,
+            список заканчивается строкой с меньшим отступом или следующим ключом.
+        """
+        lines, indent = [], None
+        try:
+            while line := self.text.readline():
+                content = line.lstrip(' ')
+                if not content.strip() or content.startswith('#'):
+                    if lines:
+                        lines.append(line)
+                    continue
+
+                level = len(line) - len(content)
+                is_item = content.startswith('-') and content[1:2] in ('', ' ', '\t', '\r', '\n')
+                indent = level if indent is None else indent
+                if level < indent or (level == indent and not is_item):
+                    break
+                if level == indent and lines:
+                    yield ''.join(lines)
+                    lines = []
+                lines.append(line)
+
+            if lines:
+                yield ''.join(lines)
+        finally:
+            self.close()
+
+    @staticmethod
+    def parse_raw_goods(items):
+        """ Разбирает тексты элементов списка `goods`, полученные от 'iter_raw_goods()'.
+        """
+        goods = load_yaml(''.join(items), Loader=FeedLoader)
+        if not isinstance(goods, list):
+            raise ValueError('Список товаров `goods` имеет неверный формат.')
+
+        return goods
+
+
+def has_many_documents(stream):
+    """ Проверяет по тексту файла, есть ли в нём несколько документов YAML (строки '---').
+        Файл просматривается быстрым поиском по байтам без разбора, позиция чтения восстанавливается.
+        Разделитель '---' перед первым документом (до него только комментарии) второго документа не означает.
+    """
+    position = stream.tell()
+    stream.seek(0)
+    try:
+        # Части файла перекрываются на длину разделителя, чтобы найти разделитель на их границе.
+        data, content, markers = b'\n', False, 0
+        while chunk := stream.read(CHUNK_SIZE * 16):
+            data = data[-len(DOCUMENT_MARKER):] + chunk
+            start = 0
+            while (index := data.find(DOCUMENT_MARKER, start)) >= 0 and index + 5 <= len(data):
+                start = index + 1
+                if data[index + 4:index + 5] not in b' \t\r\n':
+                    continue
+                if markers or content or CONTENT_LINE.search(data, 0, index):
+                    return True
+                markers = 1
+            if not markers and not content:
+                content = CONTENT_LINE.search(data, 0, len(data) - len(DOCUMENT_MARKER)) is not None
+
+        return data.endswith(DOCUMENT_MARKER) and bool(markers or content)
+    finally:
+        stream.seek(position)
+
+
+def iter_node_events(loader):
+    """ Выдаёт события парсера одного узла документа вместе с вложенными узлами.
+    """
+    depth = 0
+    while True:
+        event = loader.get_event()
+        yield event
+        if isinstance(event, (MappingStartEvent, SequenceStartEvent)):
+            depth += 1
+        elif isinstance(event, (MappingEndEvent, SequenceEndEvent)):
+            depth -= 1
+        if depth == 0:
+            return
+
+
+def is_key(event, name):
+    """ Проверяет, что событие - ключ словаря с названием 'name'.
+    """
+    return isinstance(event, ScalarEvent) and event.value == name
+
+
+def get_shop_value(key, value, shop=None):
+    """ Возвращает название Магазина, если события 'value' - значение ключа `shop`, иначе 'shop'.
+    """
+    if is_key(key, 'shop') and len(value) == 1 and isinstance(value[0], ScalarEvent):
+        return value[0].value
+
+    return shop
+
+
+def iter_mapping_sections(loader, shop_name=None):
+    """ Выдаёт разделы Магазинов из словаря: сам словарь Магазина или список Магазинов под ключом `shops`.
+        Ключи до `goods` запоминаются, чтобы узнать Магазин раздела до записи товаров. Если ключ `shop`
+        указан после `goods`, раздел другого Магазина записывается и затем отбрасывается.
+    """
+    mapping_start = loader.get_event()
+    header, shop = [], None
+    while not loader.check_event(MappingEndEvent):
+        key = loader.peek_event()
+        if is_key(key, 'shops'):
+            loader.get_event()
+            yield from iter_list_sections(loader, shop_name)
+            # Прочие ключи словаря со списком Магазинов не используются.
+            while not loader.check_event(MappingEndEvent):
+                for _ in iter_node_events(loader):
+                    pass
+            loader.get_event()
+            return
+        if is_key(key, 'goods'):
+            break
+
+        events, value = list(iter_node_events(loader)), list(iter_node_events(loader))
+        shop = get_shop_value(key, value, shop)
+        header += events + value
+
+    if shop_name is not None and shop is not None and shop != shop_name:
+        while not loader.check_event(MappingEndEvent):
+            for _ in iter_node_events(loader):
+                pass
+        loader.get_event()
+        return
+
+    file = tempfile.TemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR)
+    emitter = FeedDumper(file, encoding='utf-8', allow_unicode=True)
+    try:
+        for event in [StreamStartEvent(encoding='utf-8'), DocumentStartEvent(explicit=False), mapping_start, *header]:
+            emitter.emit(event)
+        while not loader.check_event(MappingEndEvent):
+            key = loader.peek_event()
+            for event in iter_node_events(loader):
+                emitter.emit(event)
+            if is_key(key, 'shop'):
+                value = list(iter_node_events(loader))
+                shop = get_shop_value(key, value, shop)
+                for event in value:
+                    emitter.emit(event)
+        for event in [loader.get_event(), DocumentEndEvent(explicit=False), StreamEndEvent()]:
+            emitter.emit(event)
+    except BaseException:
+        file.close()
+        raise
+    finally:
+        emitter.dispose()
+
+    if shop_name is not None and shop != shop_name:
+        file.close()
+        return
+    file.seek(0)
+    yield shop, file
+
+
+def iter_list_sections(loader, shop_name=None):
+    """ Выдаёт разделы Магазинов из списка, каждый элемент которого - словарь одного Магазина.
+    """
+    if not loader.check_event(SequenceStartEvent):
+        raise ValidationError({'detail': ['Список Магазинов должен содержать словари с ключами `shop`,'
+                                          ' `categories` и `goods`.']})
+
+    loader.get_event()
+    while not loader.check_event(SequenceEndEvent):
+        if not loader.check_event(MappingStartEvent):
+            raise ValidationError({'detail': ['Список Магазинов должен содержать словари с ключами `shop`,'
+                                              ' `categories` и `goods`.']})
+        yield from iter_mapping_sections(loader, shop_name)
+    loader.get_event()
+
+
+def iter_shop_sections(stream, shop_name=None):
+    """ Делит YAML-файл нескольких Магазинов на разделы отдельных Магазинов.
+        Поддерживаются документы, разделённые строкой '---', и список Магазинов: документ-список
+        или словарь с ключом `shops`. Файл читается на уровне событий парсера, и каждый раздел переписывается
+        во временный файл по частям, поэтому файл в память целиком не загружается.
+        Выдаёт название Магазина и временный YAML-файл его раздела, установленный на начало.
+        Если задан 'shop_name', выдаются только разделы этого Магазина. Сжатый файл распаковывается на лету.
+    """
+    stream, _ = open_decompressed(stream)
+    loader = FeedLoader(stream)
+    try:
+        loader.get_event()    # StreamStartEvent
+        while not loader.check_event(StreamEndEvent):
+            loader.get_event()    # DocumentStartEvent
+            if loader.check_event(SequenceStartEvent):
+                yield from iter_list_sections(loader, shop_name)
+            elif loader.check_event(MappingStartEvent):
+                yield from iter_mapping_sections(loader, shop_name)
+            elif is_key(loader.peek_event(), ''):
+                loader.get_event()    # Пустой документ.
+            else:
+                raise ValidationError({'detail': ['Документ файла должен содержать словарь Магазина или список'
+                                                  ' Магазинов.']})
+            loader.get_event()    # DocumentEndEvent
+    except YAMLError as e:
+        raise ValidationError({'detail': [f'Ошибка разбора файла: {e}']})
+    except DECOMPRESS_ERRORS as e:
+        raise ValidationError({'detail': [f'Ошибка распаковки файла: {e}']})
+    finally:
+        loader.dispose()
+
+
+def get_shop_section(stream, shop_name):
+    """ Возвращает временный файл раздела Магазина из файла нескольких Магазинов или 'None', если раздела нет.
+    """
+    sections = iter_shop_sections(stream, shop_name)
+    try:
+        section = next(sections, None)
+    finally:
+        sections.close()
+
+    return section[1] if section else None
+
+
+class CsvFeedReader:
+    """ Потоковое чтение CSV-файла с прайсом поставщика (кодировка UTF-8, разделитель - запятая).
+        Каждая строка описывает один товар: колонки `shop`, `category`, `category_name`, `id`, `model`, `name`,
+        `price`, `price_rrc`, `quantity`, а все остальные колонки - характеристики товара (пустые пропускаются).
+        Название Магазина берётся из первой строки. Список Категорий собирается предварительным проходом по файлу,
+        поэтому нужен поток с произвольным доступом: 'open_feed_reader()' копирует другие потоки во временный файл.
+    """
+    GOOD_COLUMNS = ['id', 'category', 'model', 'name', 'price', 'price_rrc', 'quantity']
+    SERVICE_COLUMNS = ['shop', 'category_name']
+    multi_shop = False
+    more_documents = False
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.start = stream.tell()
+        self.header = {}
+        self.text = None
+        try:
+            self.text = self.open_text()
+            self.rows = csv.DictReader(self.text)
+            self.first = next(self.rows, None)
+            if self.first is not None and 'shop' in self.first.keys():
+                self.header['shop'] = self.first['shop']
+            self.header['categories'] = self.read_categories()
+        except (csv.Error, UnicodeDecodeError) as e:
+            self.close()
+            raise ValidationError({'detail': [f'Ошибка разбора файла: {e}']})
+
+    def open_text(self):
+        """ Открывает текстовое представление потока байтов.
+        """
+        return io.TextIOWrapper(self.stream, encoding='utf-8-sig', newline='')
+
+    def close(self):
+        """ Отсоединяет текстовое представление, не закрывая сам поток.
+        """
+        if self.text is not None:
+            self.text.detach()
+            self.text = None
+
+    def read_categories(self):
+        """ Собирает Категории из колонок `category` и `category_name` первым проходом по файлу,
+            затем возвращается к началу файла.
+        """
+        categories = {}
+        for row in [self.first, *self.rows] if self.first is not None else []:
+            if row.get('category') and row.get('category_name'):
+                categories.setdefault(row['category'], row['category_name'])
+
+        self.text.detach()
+        self.stream.seek(self.start)
+        self.text = self.open_text()
+        self.rows = csv.DictReader(self.text)
+        self.first = next(self.rows, None)
+
+        return [{'id': key, 'name': value} for key, value in categories.items()]
+
+    def iter_goods(self):
+        """ Выдаёт товары по одному в том же виде, что и YAML-файл.
+        """
+        for row in self.iter_raw_goods():
+            yield self.to_good(row)
+
+    def can_split(self):
+        """ Товары можно выдавать строками файла (см. 'iter_raw_goods()').
+        """
+        return True
+
+    def iter_raw_goods(self):
+        """ Выдаёт строки файла словарями `колонка: значение`.
+        """
+        try:
+            if self.first is not None:
+                yield self.first
+            yield from self.rows
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise ValidationError({'detail': [f'Ошибка разбора файла: {e}']})
+        finally:
+            self.close()
+
+    @classmethod
+    def parse_raw_goods(cls, items):
+        """ Преобразует строки файла, полученные от 'iter_raw_goods()', в описания товаров.
+        """
+        return [cls.to_good(row) for row in items]
+
+    @classmethod
+    def to_good(cls, row):
+        """ Преобразует строку файла в описание товара.
+        """
+        good = {key: row.get(key) for key in cls.GOOD_COLUMNS}
+        good['parameters'] = {key: value for key, value in row.items()
+                              if key not in cls.GOOD_COLUMNS and key not in cls.SERVICE_COLUMNS
+                              and key is not None and value not in (None, '')}
+        return good
+
+
+class JsonLinesFeedReader:
+    """ Потоковое чтение файла прайса в формате JSON Lines: по одному объекту JSON в строке.
+        Первая строка - заголовок с ключами `shop` и `categories` как в YAML-файле,
+        каждая следующая строка - описание одного товара. Пустые строки пропускаются.
+    """
+    multi_shop = False
+    more_documents = False
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.text = io.TextIOWrapper(stream, encoding='utf-8-sig')
+        self.line_number = 0
+        self.header = {}
+        try:
+            header = next(self.read_objects(), None)
+        except ValidationError:
+            self.close()
+            raise
+        if header is not None and not isinstance(header, dict):
+            self.close()
+            raise ValidationError({'detail': ['Первая строка файла должна содержать словарь с ключами `shop`'
+                                              ' и `categories`.']})
+        self.header = header or {}
+
+    def close(self):
+        """ Отсоединяет текстовое представление, не закрывая сам поток.
+        """
+        if self.text is not None:
+            self.text.detach()
+            self.text = None
+
+    def read_lines(self):
+        """ Выдаёт непустые строки файла.
+        """
+        try:
+            for line in self.text:
+                self.line_number += 1
+                if line.strip():
+                    yield line
+        except UnicodeDecodeError as e:
+            raise ValidationError({'detail': [f'Ошибка разбора файла, строка {self.line_number}: {e}']})
+
+    def read_objects(self):
+        """ Выдаёт объекты из непустых строк файла.
+        """
+        for line in self.read_lines():
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise ValidationError({'detail': [f'Ошибка разбора файла, строка {self.line_number}: {e}']})
+
+    def iter_goods(self):
+        """ Выдаёт товары по одному.
+        """
+        try:
+            yield from self.read_objects()
+        finally:
+            self.close()
+
+    def can_split(self):
+        """ Товары можно выдавать строками файла (см. 'iter_raw_goods()').
+        """
+        return True
+
+    def iter_raw_goods(self):
+        """ Выдаёт непустые строки файла, не разбирая их.
+        """
+        try:
+            yield from self.read_lines()
+        finally:
+            self.close()
+
+    @staticmethod
+    def parse_raw_goods(items):
+        """ Разбирает строки файла, полученные от 'iter_raw_goods()'.
+        """
+        return [json.loads(line) for line in items]
+
+
+# Форматы файлов прайса: читатель, типы содержимого (Content-Type) и расширения файлов.
+FEED_FORMATS = {
+    'yaml': (YamlFeedReader, ['application/yaml', 'application/x-yaml', 'text/yaml', 'text/x-yaml'],
+             ['.yaml', '.yml']),
+    'csv': (CsvFeedReader, ['text/csv', 'application/csv'], ['.csv']),
+    'jsonl': (JsonLinesFeedReader, ['application/jsonl', 'application/x-jsonlines', 'application/x-ndjson',
+                                    'application/jsonlines'], ['.jsonl', '.ndjson']),
+}
+DEFAULT_FEED_FORMAT = 'yaml'
+
+
+def get_feed_format(name='', content_type=''):
+    """ Определяет формат файла прайса по типу содержимого, а если он не указан или не известен, то по расширению.
+        Если формат не определён, файл считается YAML-файлом.
+    """
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    extension = os.path.splitext(urlsplit(name or '').path)[1].lower()
+    for feed_format, (_, content_types, _) in FEED_FORMATS.items():
+        if content_type in content_types:
+            return feed_format
+    for feed_format, (_, _, extensions) in FEED_FORMATS.items():
+        if extension in extensions:
+            return feed_format
+
+    return DEFAULT_FEED_FORMAT
+
+
+# Сжатые файлы прайса: сигнатура в начале файла и расширения, которые отбрасываются для определения формата.
+COMPRESSIONS = {
+    'gzip': (b'\x1f\x8b', ['.gz', '.gzip']),
+    'bzip2': (b'BZh', ['.bz2']),
+    'zip': (b'PK\x03\x04', ['.zip']),
+}
+# Ошибки чтения сжатого файла. ValueError выдают, например, GzipFile и ZipExtFile при ошибке перехода по потоку.
+DECOMPRESS_ERRORS = (OSError, EOFError, ValueError, zlib.error, zipfile.BadZipFile)
+
+
+def peek_header(stream, size=4):
+    """ Возвращает первые байты потока с произвольным доступом, не сдвигая позицию чтения.
+    """
+    position = stream.tell()
+    header = stream.read(size)
+    stream.seek(position)
+
+    return header
+
+
+class SizeLimitedStream(io.RawIOBase):
+    """ Поток распакованных данных, размер которого не больше 'max_size' байт.
+        Небольшой архив может распаковываться в файл огромного размера, поэтому чтение за пределом прерывается.
+    """
+
+    def __init__(self, stream, max_size):
+        self.stream = stream
+        self.max_size = max_size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self.stream.seekable()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self.stream.seek(offset, whence)
+
+    def tell(self):
+        return self.stream.tell()
+
+    def readinto(self, buffer):
+        size = self.stream.readinto(buffer)
+        if self.stream.tell() > self.max_size:
+            raise ValidationError({'detail': [f'Размер распакованного файла превышает {self.max_size} байт.']})
+        return size
+
+
+def open_decompressed(stream, name=''):
+    """ Распаковывает на лету файл прайса, сжатый gzip, bzip2 или zip. Сжатие определяется по сигнатуре в начале
+        файла. Данные распаковываются частями по мере разбора, распакованный файл целиком не сохраняется,
+        а его размер ограничен FEED_DECOMPRESSED_MAX_SIZE.
+        Возвращает поток распакованных данных и имя файла без расширения сжатия, по которому определяется формат.
+        Архив zip должен содержать один файл, формат определяется по его имени.
+        Поток без произвольного доступа сначала копируется во временный файл (см. 'spool_stream()'): распаковка
+        переходит по потоку, а оглавление zip находится в конце архива.
+    """
+    if not stream.seekable():
+        stream = spool_stream(stream)
+    header = peek_header(stream)
+    for compression, (signature, extensions) in COMPRESSIONS.items():
+        if header.startswith(signature):
+            break
+    else:
+        return stream, name
+
+    path = urlsplit(name or '').path
+    root, extension = os.path.splitext(path)
+    name = root if extension.lower() in extensions else path
+    max_size = settings.FEED_DECOMPRESSED_MAX_SIZE
+    if compression == 'gzip':
+        return io.BufferedReader(SizeLimitedStream(gzip.GzipFile(fileobj=stream, mode='rb'), max_size)), name
+    if compression == 'bzip2':
+        return io.BufferedReader(SizeLimitedStream(bz2.BZ2File(stream), max_size)), name
+
+    try:
+        archive = zipfile.ZipFile(stream)
+    except zipfile.BadZipFile as e:
+        raise ValidationError({'detail': [f'Ошибка распаковки файла: {e}']})
+    members = [member for member in archive.infolist() if not member.is_dir()]
+    if len(members) != 1:
+        raise ValidationError({'detail': [f'Архив zip должен содержать один файл прайса, а не `{len(members)}`.']})
+    if members[0].file_size > max_size:
+        raise ValidationError({'detail': [f'Размер распакованного файла превышает {max_size} байт.']})
+
+    return io.BufferedReader(SizeLimitedStream(archive.open(members[0]), max_size)), members[0].filename
+
+
+def open_feed_reader(stream, name='', content_type='', feed_format='', scan_documents=False):
+    """ Открывает поток читателем заданного или определённого по имени и типу содержимого формата.
+        Сжатый файл распаковывается на лету (см. 'open_decompressed()').
+        У читателя заголовок файла уже прочитан, а товары выдаются по одному через 'iter_goods()'.
+        Исходный поток сохраняется в 'reader.source': его закрытие освобождает соединение или файл.
+        С 'scan_documents=True' YAML-файл заранее проверяется на несколько документов (см. 'YamlFeedReader').
+    """
+    if not stream.seekable():
+        # Временная копия потока закрывается вместе с 'reader.source'.
+        stream = spool_stream(stream)
+    source = stream
+    stream, name = open_decompressed(stream, name)
+    feed_format = feed_format if feed_format in FEED_FORMATS.keys() else get_feed_format(name, content_type)
+    reader_class = FEED_FORMATS[feed_format][0]
+    try:
+        reader = reader_class(stream, scan_documents) if reader_class is YamlFeedReader else reader_class(stream)
+    except DECOMPRESS_ERRORS as e:
+        if stream is source:
+            raise
+        raise ValidationError({'detail': [f'Ошибка распаковки файла: {e}']})
+    reader.feed_format = feed_format
+    reader.source = source
+    return reader
@@ -0,0 +1,110 @@
+import hashlib
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from requests import RequestException, Session
+from requests.adapters import HTTPAdapter
+from rest_framework.exceptions import ValidationError
+
+from backend.feeds import CHUNK_SIZE
+
+SESSIONS = threading.local()
+
+
+def get_session():
+    """ Возвращает HTTP-сессию текущего потока с пулом соединений.
+        Повторные запросы к одному серверу поставщика используют уже открытые соединения.
+        Объект 'requests.Session' не потокобезопасен, поэтому у каждого потока своя сессия.
+    """
+    session = getattr(SESSIONS, 'session', None)
+    if session is None:
+        session = SESSIONS.session = Session()
+        adapter = HTTPAdapter(pool_connections=settings.FEED_FETCH_POOL_SIZE,
+                              pool_maxsize=settings.FEED_FETCH_POOL_SIZE)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+    return session
+
+
+class FetchedFeed:
+    """ Результат запроса файла прайса.
+        Если файл на сервере не изменился (ответ 304), то 'file' равен 'None'.
+    """
+
+    def __init__(self, file=None, feed_hash='', etag='', last_modified='', content_type=''):
+        self.file = file
+        self.feed_hash = feed_hash
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_type = content_type
+
+    @property
+    def not_modified(self):
+        return self.file is None
+
+
+def fetch_feed(url, etag='', last_modified=''):
+    """ Скачивает файл прайса во временный файл, вычисляя по пути его контрольную сумму.
+        Отправляет условный запрос с заголовками 'If-None-Match' и 'If-Modified-Since', если известны
+        значения 'ETag' и 'Last-Modified' прошлой загрузки. Время и размер загрузки ограничены
+        настройками FEED_FETCH_TIMEOUT, FEED_FETCH_TOTAL_TIMEOUT и FEED_FETCH_MAX_SIZE.
+    """
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    timeout, max_size = settings.FEED_FETCH_TIMEOUT, settings.FEED_FETCH_MAX_SIZE
+    deadline = time.monotonic() + settings.FEED_FETCH_TOTAL_TIMEOUT
+    file, expired = None, threading.Event()
+    try:
+        with get_session().get(url, headers=headers, stream=True, timeout=timeout) as response:
+            if response.status_code == 304:
+                return FetchedFeed(etag=etag, last_modified=last_modified)
+
+            response.raise_for_status()
+            if int(response.headers.get('Content-Length') or 0) > max_size:
+                raise ValidationError({'url': [f'Размер файла превышает {max_size} байт.']})
+
+            def expire():
+                expired.set()
+                try:
+                    # 'shutdown()' (urllib3 2.3+) прерывает чтение, ожидающее данных в другом потоке.
+                    response.raw.shutdown()
+                except (AttributeError, ValueError, RuntimeError, OSError):
+                    response.close()
+
+            # Сервер может отдавать файл медленно, но укладываясь в FEED_FETCH_TIMEOUT на каждое чтение.
+            # Сторожевой таймер закрывает соединение в срок FEED_FETCH_TOTAL_TIMEOUT, прерывая и зависшее чтение.
+            watchdog = threading.Timer(max(deadline - time.monotonic(), 0), expire)
+            watchdog.daemon = True
+            file, digest, size = tempfile.TemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR), hashlib.sha256(), 0
+            watchdog.start()
+            try:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_size:
+                        raise ValidationError({'url': [f'Размер файла превышает {max_size} байт.']})
+                    file.write(chunk)
+                    digest.update(chunk)
+            finally:
+                watchdog.cancel()
+            if expired.is_set():
+                raise ValidationError({'url': ['Превышено время загрузки файла.']})
+            file.seek(0)
+
+            return FetchedFeed(file, digest.hexdigest(), response.headers.get('ETag', ''),
+                               response.headers.get('Last-Modified', ''), response.headers.get('Content-Type', ''))
+    except Exception as e:
+        # Временный файл закрывается при любой ошибке, в том числе при обрыве соединения посреди файла.
+        if file is not None:
+            file.close()
+        if expired.is_set():
+            raise ValidationError({'url': ['Превышено время загрузки файла.']})
+        if isinstance(e, RequestException):
+            raise ValidationError({'url': [f'Не удалось загрузить файл: {e}']})
+        raise
@@ -1,6 +1,6 @@
 from django_filters import rest_framework as filters
 
-from backend.models import Order
+from backend.models import ImportRun, Order
 
 
 class OrderFilter(filters.FilterSet):
@@ -26,3 +26,19 @@ class OrderFilter(filters.FilterSet):
     class Meta:
         model = Order
         fields = ['customer']    # Можно выбрать какого-нибудь пользователя.
+
+
+class ImportRunFilter(filters.FilterSet):
+    """ Фильтр для замеров загрузок
+        по Магазину, заданию и датам.
+    """
+    # Можно выбрать загрузки одного Магазина или одного задания: '?shop=1', '?job=5'.
+    shop = filters.NumberFilter(field_name='job__shop')
+    job = filters.NumberFilter(field_name='job')
+
+    # Можно выбрать интервал дат выполнения: '?created_after=2024-07-20&created_before=2024-08-03'.
+    created = filters.DateFromToRangeFilter(field_name='created_at', lookup_expr='date')
+
+    class Meta:
+        model = ImportRun
+        fields = ['state']
@@ -0,0 +1,669 @@
+import hashlib
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.backends.base.operations import BaseDatabaseOperations
+from rest_framework.exceptions import ValidationError
+
+from backend.models import Category, Parameter, Product, ProductInfo, ProductParameter, Shop, parse_numeric_value
+from backend.prices import refresh_price_entries
+from backend.profiling import NullProfiler
+from backend.services import reset_feed_hash, set_new_category
+
+DUPLICATE_MSG = 'Товар с таким Номером по каталогу и Описанием повторяется в файле.'
+REQUIRED_MSG = 'Обязательное поле.'
+INTEGER_MSG = 'Требуется целое число.'
+EMPTY_VALUE_MSG = 'Это поле не может иметь пустое значение `null` или пустую строку ``.'
+STOCK_FIELDS = {'quantity', 'price', 'price_rrc'}
+# Поля моделей, в которые записываются целые значения товара: по ним проверяется диапазон значения.
+INT_FIELDS = {'external_id': ProductInfo._meta.get_field('catalog_number'),
+              'category': Category._meta.get_field('catalog_number'),
+              'quantity': ProductInfo._meta.get_field('quantity'),
+              'price': ProductInfo._meta.get_field('price'),
+              'price_rrc': ProductInfo._meta.get_field('price_rrc')}
+
+
+def describe_counters(received, skipped, created, updated, unchanged, retired=None):
+    """ Возвращает счётчики загрузки в виде сообщений.
+        В число пропущенных входят и товары без изменений.
+        Счётчик снятых с продажи товаров показывается только при синхронизации.
+    """
+    msg = [f'Получено товаров `{received}`', f'Пропущено `{skipped}`', f'Загружено `{created}`',
+           f'Обновлено `{updated}`', f'Без изменений `{unchanged}`']
+    if retired is not None:
+        msg.append(f'Снято с продажи `{retired}`')
+
+    return msg
+
+
+def get_content_hash(data):
+    """ Вычисляет контрольную сумму содержимого товара: Категории, модели, количества, цен и характеристик.
+        По ней при повторной загрузке определяется, изменился ли товар.
+    """
+    content = [data['category'], data['model'], data['quantity'], data['price'], data['price_rrc'],
+               sorted(data['parameters'].items())]
+    return hashlib.md5(json.dumps(content, ensure_ascii=False).encode(), usedforsecurity=False).hexdigest()
+
+
+def get_batch_size():
+    """ Возвращает размер пакета для массовой записи в БД.
+    """
+    return getattr(settings, 'IMPORT_BATCH_SIZE', 1000)
+
+
+def split_into_chunks(items, size):
+    """ Разбивает последовательность (или поток) товаров на пакеты фиксированного размера.
+    """
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def to_int(value):
+    """ Приводит значение к целому числу. Логические значения и дробные числа не принимаются.
+    """
+    if isinstance(value, bool):
+        raise ValueError(value)
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value.strip().lstrip('-').isdigit():
+        return int(value)
+
+    raise ValueError(value)
+
+
+def check_int_range(value, field):
+    """ Проверяет, что целое число помещается в поле модели 'field'. Возвращает текст ошибки или пустую строку.
+        Диапазон общий для всех СУБД (как в PostgreSQL): SQLite принимает и большие числа, но файл,
+        проверенный на ней, не должен отказывать при записи в другую СУБД.
+    """
+    low, high = BaseDatabaseOperations.integer_field_ranges[field.get_internal_type()]
+    if value < low:
+        return f'Убедитесь, что это значение больше либо равно {low}.'
+    if value > high:
+        return f'Убедитесь, что это значение меньше либо равно {high}.'
+
+    return ''
+
+
+def max_length_msg(length):
+    """ Возвращает текст ошибки превышения длины строки.
+    """
+    return f'Убедитесь, что это значение содержит не более {length} символов.'
+
+
+def clean_good(good):
+    """ Проверяет поля одного товара из загружаемого файла и приводит их к нужным типам.
+        Проверки повторяют проверки сериализатора 'ProductInfoSerializer', но не обращаются к БД.
+        Возвращает очищенные данные и словарь ошибок.
+    """
+    if not isinstance(good, dict):
+        return None, {'detail': ['Описание товара должно быть словарём с полями товара.']}
+
+    data, errors = {}, {}
+    for field, key, required in [('id', 'external_id', True), ('category', 'category', True),
+                                 ('quantity', 'quantity', False), ('price', 'price', False),
+                                 ('price_rrc', 'price_rrc', False)]:
+        value = good.get(field)
+        if value is None or value == '':
+            if required:
+                errors[key] = [REQUIRED_MSG]
+            else:
+                data[key] = 0
+            continue
+        try:
+            data[key] = to_int(value)
+        except ValueError:
+            errors[key] = [INTEGER_MSG]
+            continue
+        if error := check_int_range(data[key], INT_FIELDS[key]):
+            errors[key] = [error]
+
+    name = good.get('name')
+    name = str(name).strip() if name is not None else ''
+    name_length = Product._meta.get_field('name').max_length
+    if not name:
+        errors['name'] = [REQUIRED_MSG]
+    elif len(name) > name_length:
+        errors['name'] = [max_length_msg(name_length)]
+    data['name'] = name
+
+    model = good.get('model')
+    model = str(model) if model is not None else None
+    model_length = ProductInfo._meta.get_field('model').max_length
+    if model is not None and len(model) > model_length:
+        errors['model'] = [max_length_msg(model_length)]
+    data['model'] = model
+
+    parameters = good.get('parameters') or {}
+    if not isinstance(parameters, dict):
+        errors['product_parameters'] = ['Характеристики товара должны быть словарём `название: значение`.']
+        parameters = {}
+    param_length = Parameter._meta.get_field('name').max_length
+    value_length = ProductParameter._meta.get_field('value').max_length
+    data['parameters'] = {}
+    for param_name, value in parameters.items():
+        param_name = str(param_name)
+        value = str(value) if value is not None else ''
+        if len(param_name) > param_length:
+            errors.setdefault('product_parameters', []).append(f'`{param_name}`: {max_length_msg(param_length)}')
+        elif not value.replace(' ', ''):
+            errors.setdefault('product_parameters', []).append(f'`{param_name}`: {EMPTY_VALUE_MSG}')
+        elif len(value) > value_length:
+            errors.setdefault('product_parameters', []).append(f'`{param_name}`: {max_length_msg(value_length)}')
+        else:
+            data['parameters'][param_name] = value
+
+    return data, errors
+
+
+def clean_categories(categories):
+    """ Проверяет Категории из заголовка файла.
+        Возвращает словарь `номер по каталогу: название` правильных Категорий и список ошибок.
+    """
+    data, errors = {}, []
+    name_length = Category._meta.get_field('name').max_length
+    for category in categories:
+        try:
+            catalog_number, name = to_int(category.get('id')), str(category.get('name') or '').strip()
+        except (AttributeError, ValueError):
+            errors.append(f'Неверное описание Категории: {category}.')
+            continue
+        if error := check_int_range(catalog_number, INT_FIELDS['category']):
+            errors.append(f'Категория {catalog_number}: {error}')
+            continue
+        if not name or len(name) > name_length:
+            errors.append(f'Категория {catalog_number}: {REQUIRED_MSG if not name else max_length_msg(name_length)}')
+            continue
+        data[catalog_number] = name
+
+    return data, errors
+
+
+def find_category_conflicts(data):
+    """ Возвращает ошибки Категорий, название или номер которых в БД соответствуют другой паре
+        'название - номер по каталогу', чем в словаре `номер по каталогу: название`.
+    """
+    errors, numbers = [], {name: catalog_number for catalog_number, name in data.items()}
+    found = Category.objects.filter(catalog_number__in=list(data)) | Category.objects.filter(name__in=list(numbers))
+    for catalog_number, name in found.values_list('catalog_number', 'name'):
+        if data.get(catalog_number, name) != name or numbers.get(name, catalog_number) != catalog_number:
+            errors.append(f'Категория `{name}` с номером по каталогу `{catalog_number}` уже есть в БД'
+                          f' и не совпадает с Категорией из файла.')
+
+    return errors
+
+
+def write_categories(categories):
+    """ Создаёт Категории из заголовка файла, которых ещё нет в БД.
+        Вставка пропускает конфликты уникальности, поэтому одновременные загрузки, добавляющие одни и те же
+        Категории, не мешают друг другу. Категория, название или номер которой в БД соответствуют другой паре
+        'название - номер по каталогу', считается ошибкой файла.
+    """
+    data, errors = clean_categories(categories)
+    if errors:
+        raise ValidationError({'categories': errors})
+
+    with transaction.atomic():
+        # Строки вставляются в порядке ключа, чтобы одновременные вставки не блокировали друг друга по кругу.
+        Category.objects.bulk_create([Category(catalog_number=catalog_number, name=name)
+                                      for catalog_number, name in sorted(data.items())], ignore_conflicts=True)
+        if errors := find_category_conflicts(data):
+            raise ValidationError({'categories': errors})
+
+    return True
+
+
+def clean_stock_item(item):
+    """ Проверяет изменение остатка и цен одного товара: `{quantity, price, price_rrc}`, любые из полей.
+        Возвращает очищенные данные и словарь ошибок.
+    """
+    if not isinstance(item, dict) or not item:
+        return None, {'detail': ['Ожидается словарь с полями `quantity`, `price`, `price_rrc`.']}
+
+    data, errors = {}, {}
+    for key in item.keys() - STOCK_FIELDS:
+        errors[key] = ['Неизвестное поле.']
+    for key in STOCK_FIELDS & item.keys():
+        try:
+            data[key] = to_int(item[key])
+        except ValueError:
+            errors[key] = [INTEGER_MSG]
+            continue
+        if error := check_int_range(data[key], INT_FIELDS[key]):
+            errors[key] = [error]
+
+    return data, errors
+
+
+def update_stock(shop, items, batch_size=None):
+    """ Изменяет остатки и цены товаров Магазина по словарю `{external_id: {quantity, price, price_rrc}}`.
+        Изменения применяются пакетами запросов UPDATE, соединённых со списком значений по ключу
+        (Магазин, номер по каталогу), в одной транзакции. Не указанные поля товара не меняются.
+        Возвращает число полученных, найденных и изменённых товаров, неизвестные номера по каталогу и ошибки.
+    """
+    batch_size = batch_size or get_batch_size()
+    result = {'received': len(items), 'matched': 0, 'unknown': [], 'errors': {}}
+    rows = []
+    for external_id, item in items.items():
+        data, errors = clean_stock_item(item)
+        try:
+            catalog_number = to_int(external_id)
+            if error := check_int_range(catalog_number, INT_FIELDS['external_id']):
+                errors = {'external_id': [error], **(errors or {})}
+        except ValueError:
+            errors = {'external_id': [INTEGER_MSG], **(errors or {})}
+        if errors:
+            result['errors'][f'{external_id}'] = str(errors)
+            continue
+        rows.append((catalog_number, data.get('quantity'), data.get('price'), data.get('price_rrc')))
+
+    table = ProductInfo._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        for chunk in split_into_chunks(rows, batch_size):
+            found = dict(ProductInfo.objects.filter(shop=shop, catalog_number__in=[row[0] for row in chunk])
+                         .values_list('catalog_number', 'id'))
+            result['unknown'] += [row[0] for row in chunk if row[0] not in found]
+            result['matched'] += len(found)
+            if not found:
+                continue
+            # Контрольная сумма сбрасывается, так как остаток и цены входят в неё.
+            cursor.execute(
+                f'WITH delta (catalog_number, quantity, price, price_rrc) AS '
+                f'(VALUES {', '.join(['(%s, %s, %s, %s)'] * len(chunk))}) '
+                f'UPDATE {table} SET '
+                f'quantity = COALESCE(CAST(delta.quantity AS integer), {table}.quantity), '
+                f'price = COALESCE(CAST(delta.price AS integer), {table}.price), '
+                f'price_rrc = COALESCE(CAST(delta.price_rrc AS integer), {table}.price_rrc), '
+                f"content_hash = '' "
+                f'FROM delta WHERE {table}.shop_id = %s AND {table}.catalog_number = delta.catalog_number',
+                [value for row in chunk for value in row] + [shop.pk])
+            refresh_price_entries(found.values(), batch_size)
+
+    if result['matched']:
+        reset_feed_hash(shop)
+
+    return result
+
+
+def validate_goods(goods, categories):
+    """ Проверяет пакет товаров без обращения к БД: поля и типы, ссылки на Категории ('categories' - номера
+        по каталогу существующих Категорий). Для правильных товаров вычисляет контрольную сумму.
+        Повторы товаров проверяются при записи, так как требуют сведений обо всём файле.
+        Может выполняться в отдельном процессе, поэтому принимает и возвращает только простые данные.
+    """
+    checked = {'received': 0, 'rows': [], 'rejected': [], 'external_ids': []}
+    for good in goods:
+        checked['received'] += 1
+        data, errors = clean_good(good)
+        if data and 'external_id' in data.keys():
+            checked['external_ids'].append(data['external_id'])
+        if not errors and data['category'] not in categories:
+            errors = {'category_number': [f'Категория с номером по каталогу catalog_number={data['category']}'
+                                          f' не существует.']}
+        if errors:
+            external_id = good.get('id') if isinstance(good, dict) else None
+            checked['rejected'].append((f'{external_id}', errors))
+            continue
+
+        data['content_hash'] = get_content_hash(data)
+        checked['rows'].append(data)
+
+    return checked
+
+
+class ProductsImporter:
+    """ Массовая загрузка Описаний товаров в Магазин.
+        Справочники (названия Товаров, номера Категорий, названия Параметров) и ключи существующих
+        Описаний товара Магазина считываются из БД один раз и хранятся в словарях.
+        Товары записываются пакетами через 'bulk_create()' с обновлением при конфликте уникальности
+        'unique_product_info'. Ошибочный товар пропускается и попадает в отчёт, не прерывая загрузку пакета.
+        Записываются только новые и изменённые товары: изменения определяются сравнением контрольной суммы
+        товара из файла с контрольной суммой 'content_hash', сохранённой в Описании товара.
+        Каждый пакет записывается в своей транзакции вместе с контрольной точкой: контрольной суммой файла
+        'feed_hash' и числом обработанных товаров. Повторная загрузка того же файла после сбоя пропускает
+        'resume_from' товаров, уже обработанных прерванной загрузкой.
+    """
+
+    def __init__(self, shop, batch_size=None, feed_hash='', resume_from=0, profiler=None):
+        self.shop = shop
+        self.profiler = profiler or NullProfiler()     # Замеры времени этапов загрузки.
+        self.batch_size = batch_size or get_batch_size()
+        self.feed_hash = feed_hash
+        self.resume_from = resume_from
+        self.position = 0           # Число обработанных товаров файла, в том числе пропущенных при продолжении.
+        self.categories = {}        # catalog_number: category_id
+        self.products = {}          # name: [product_id, category_id]
+        self.parameters = {}        # name: parameter_id
+        self.infos = {}             # (product_id, catalog_number): (info_id, content_hash)
+        self.shop_categories = set()
+        self.seen = set()           # Ключи товаров, уже встреченных в файле.
+        self.seen_infos = set()     # Описания товаров Магазина, которые есть в файле.
+        self.seen_external_ids = set()    # Номера по каталогу всех товаров файла, в том числе ошибочных.
+        self.received, self.skipped, self.created, self.updated, self.unchanged = 0, 0, 0, 0, 0
+        self.rejected = 0
+        self.errors = []            # Ошибки товаров, ещё не сохранённые в БД: (external_id, сообщение).
+
+    def load_maps(self):
+        """ Считывает справочники и существующие Описания товаров Магазина в словари.
+        """
+        self.categories = dict(Category.objects.values_list('catalog_number', 'id'))
+        self.products = {name: [pk, category_id]
+                         for pk, name, category_id in Product.objects.values_list('id', 'name', 'category_id')}
+        self.parameters = dict(Parameter.objects.values_list('name', 'id'))
+        self.shop_categories = set(self.shop.categories.values_list('id', flat=True))
+        self.infos = {(product_id, catalog_number): (pk, content_hash)
+                      for pk, product_id, catalog_number, content_hash in ProductInfo.objects.filter(
+                          shop=self.shop).values_list('id', 'product_id', 'catalog_number', 'content_hash')}
+
+        return self
+
+    def add_error(self, external_id, errors):
+        """ Заносит ошибку товара в отчёт.
+        """
+        message = errors['prod_info_err'] if 'prod_info_err' in errors.keys() else str(errors)
+        self.errors.append((f'{external_id}', message))
+        self.rejected += 1
+        self.skipped += 1
+
+    def pop_errors(self):
+        """ Возвращает накопленные ошибки товаров и очищает список.
+        """
+        errors, self.errors = self.errors, []
+        return errors
+
+    def run(self, goods, on_chunk=None):
+        """ Загружает все товары пакетами.
+            После каждого пакета вызывается 'on_chunk(importer)', например, для сохранения хода загрузки.
+        """
+        goods = iter(goods)
+        if self.resume_from:
+            self.skip_goods(islice(goods, self.resume_from))
+        for chunk in self.profiler.timed(split_into_chunks(goods, self.batch_size), 'parse'):
+            self.import_chunk(chunk)
+            if on_chunk:
+                on_chunk(self)
+
+        return self
+
+    def skip_goods(self, goods):
+        """ Пропускает товары, обработанные прерванной загрузкой того же файла.
+            Товары не проверяются и не записываются, запоминаются только их ключи: они нужны для поиска
+            повторов и товаров, которых нет в файле (режим синхронизации).
+        """
+        for good in goods:
+            self.position += 1
+            if not isinstance(good, dict):
+                continue
+            try:
+                external_id = to_int(good.get('id'))
+            except ValueError:
+                continue
+            self.seen_external_ids.add(external_id)
+            self.seen.add((str(good.get('name') or '').strip(), external_id))
+
+        return self
+
+    def save_checkpoint(self):
+        """ Сохраняет контрольную точку загрузки в Магазине.
+        """
+        if self.feed_hash:
+            Shop.objects.filter(pk=self.shop.pk).update(checkpoint_hash=self.feed_hash, checkpoint_offset=self.position)
+
+        return True
+
+    def import_chunk(self, goods):
+        """ Проверяет и записывает в БД один пакет товаров.
+        """
+        with self.profiler.phase('validate'):
+            checked = validate_goods(goods, self.categories)
+
+        return self.write_chunk(checked)
+
+    def write_chunk(self, checked):
+        """ Записывает в БД пакет товаров, проверенный функцией 'validate_goods()'.
+            Повторы товаров в файле пропускаются.
+        """
+        self.received += checked['received']
+        self.position += checked['received']
+        self.seen_external_ids.update(checked['external_ids'])
+        for external_id, errors in checked['rejected']:
+            self.add_error(external_id, errors)
+
+        rows = []
+        for data in checked['rows']:
+            if (data['name'], data['external_id']) in self.seen:
+                self.add_error(data['external_id'], {'prod_info_err': DUPLICATE_MSG})
+                continue
+
+            self.seen.add((data['name'], data['external_id']))
+            rows.append(data)
+
+        rows = self.select_changed(rows)
+        # Время этапов записи не входит в этап 'commit': в нём остаются начало и фиксация транзакции.
+        with self.profiler.phase('commit'), transaction.atomic():
+            if rows:
+                with self.profiler.phase('products'):
+                    self.write_products(rows)
+                    self.write_infos(rows)
+                with self.profiler.phase('parameters'):
+                    self.write_parameter_names(rows)
+                    self.write_parameters(rows)
+                with self.profiler.phase('prices'):
+                    refresh_price_entries([row['info_id'] for row in rows], self.batch_size)
+            self.save_checkpoint()
+
+        return self
+
+    def write_products(self, rows):
+        """ Создаёт новые Товары, переносит существующие в новую Категорию и привязывает Категории к Магазину.
+        """
+        new, moved = {}, {}
+        for row in rows:
+            category_id = self.categories[row['category']]
+            product = self.products.get(row['name'])
+            if product is None:
+                new[row['name']] = category_id
+            elif product[1] != category_id:
+                moved[product[0]] = category_id
+
+        if new:
+            Product.objects.bulk_create([Product(name=name, category_id=category_id)
+                                         for name, category_id in sorted(new.items())],
+                                        batch_size=self.batch_size, ignore_conflicts=True)
+            for pk, name, category_id in Product.objects.filter(name__in=list(new)).values_list(
+                    'id', 'name', 'category_id'):
+                self.products[name] = [pk, category_id]
+                if category_id != new[name]:
+                    moved[pk] = new[name]
+
+        if moved:
+            # Смена Категории у существующего Товара - редкий случай, обрабатывается поштучно.
+            categories = Category.objects.in_bulk(set(moved.values()))
+            for product in Product.objects.select_related('category').filter(id__in=list(moved)):
+                set_new_category(product, categories[moved[product.id]])
+                self.products[product.name][1] = product.category_id
+            self.shop_categories = set(self.shop.categories.values_list('id', flat=True))
+
+        needed = {self.categories[row['category']] for row in rows} - self.shop_categories
+        if needed:
+            self.shop.categories.add(*needed)
+            self.shop_categories |= needed
+
+        return True
+
+    def write_parameter_names(self, rows):
+        """ Создаёт Параметры (названия характеристик), которых ещё нет в БД.
+        """
+        names = {name for row in rows for name in row['parameters'].keys()} - set(self.parameters.keys())
+        if names:
+            Parameter.objects.bulk_create([Parameter(name=name) for name in sorted(names)],
+                                          batch_size=self.batch_size, ignore_conflicts=True)
+            self.parameters.update(Parameter.objects.filter(name__in=list(names)).values_list('name', 'id'))
+
+        return True
+
+    def select_changed(self, rows):
+        """ Отбирает новые и изменённые товары. Товары без изменений пропускаются.
+        """
+        changed = []
+        for row in rows:
+            product = self.products.get(row['name'])
+            existing = self.infos.get((product[0], row['external_id'])) if product else None
+            row['is_new'] = existing is None
+            if existing is None:
+                self.created += 1
+            elif existing[1] == row['content_hash']:
+                self.seen_infos.add(existing[0])
+                self.unchanged += 1
+                self.skipped += 1
+                continue
+            else:
+                self.updated += 1
+            changed.append(row)
+
+        return changed
+
+    def write_infos(self, rows):
+        """ Создаёт или обновляет Описания товаров (upsert по ограничению 'unique_product_info').
+        """
+        objs = []
+        for row in rows:
+            row['product_id'] = self.products[row['name']][0]
+            objs.append(ProductInfo(product_id=row['product_id'], shop=self.shop, catalog_number=row['external_id'],
+                                    model=row['model'], quantity=row['quantity'], price=row['price'],
+                                    price_rrc=row['price_rrc'], content_hash=row['content_hash']))
+        ProductInfo.objects.bulk_create(objs, batch_size=self.batch_size, update_conflicts=True,
+                                        unique_fields=['product', 'shop', 'catalog_number'],
+                                        update_fields=['model', 'quantity', 'price', 'price_rrc', 'content_hash'])
+        if any(obj.pk is None for obj in objs):
+            # Не все СУБД возвращают первичные ключи при 'update_conflicts'.
+            ids = {(product_id, catalog_number): pk for pk, product_id, catalog_number in ProductInfo.objects.filter(
+                shop=self.shop, catalog_number__in=[row['external_id'] for row in rows]).values_list(
+                'id', 'product_id', 'catalog_number')}
+            for obj in objs:
+                obj.pk = ids[(obj.product_id, obj.catalog_number)]
+
+        for row, obj in zip(rows, objs):
+            row['info_id'] = obj.pk
+            self.infos[(obj.product_id, obj.catalog_number)] = (obj.pk, obj.content_hash)
+            self.seen_infos.add(obj.pk)
+
+        return True
+
+    def write_parameters(self, rows):
+        """ Записывает Значения параметров товаров и удаляет Значения, которых больше нет в файле.
+            Прежние Значения считываются одним запросом и только для изменённых Описаний товара.
+        """
+        old_params = {}
+        for pk, info_id, parameter_id, value in ProductParameter.objects.filter(
+                product_info_id__in=[row['info_id'] for row in rows if not row['is_new']]).values_list(
+                'id', 'product_info_id', 'parameter_id', 'value'):
+            old_params.setdefault(info_id, {})[parameter_id] = (pk, value)
+
+        objs, stale = [], []
+        for row in rows:
+            params = {self.parameters[name]: value for name, value in row['parameters'].items()}
+            old = old_params.get(row['info_id'], {})
+            for parameter_id, value in params.items():
+                if parameter_id not in old or old[parameter_id][1] != value:
+                    objs.append(ProductParameter(product_info_id=row['info_id'], parameter_id=parameter_id,
+                                                 value=value, numeric_value=parse_numeric_value(value)))
+            stale += [pk for parameter_id, (pk, value) in old.items() if parameter_id not in params]
+
+        if stale:
+            ProductParameter.objects.filter(id__in=stale).delete()
+        if objs:
+            ProductParameter.objects.bulk_create(objs, batch_size=self.batch_size, update_conflicts=True,
+                                                 unique_fields=['product_info', 'parameter'],
+                                                 update_fields=['value', 'numeric_value'])
+
+        return True
+
+    def get_vanished(self):
+        """ Возвращает 'id' Описаний товаров Магазина, которых нет в загруженном файле.
+            Описания, номер по каталогу которых встретился в файле хотя бы в ошибочном товаре, не возвращаются.
+        """
+        return {pk for (product_id, catalog_number), (pk, content_hash) in self.infos.items()
+                if pk not in self.seen_infos and catalog_number not in self.seen_external_ids}
+
+    def check(self, goods, header_categories=()):
+        """ Проверяет все товары файла без записи в БД (режим 'dry_run') и возвращает отчёт.
+            Данные из БД берутся из справочников 'load_maps()', поэтому число запросов не зависит от размера файла.
+            Ошибки - товары, которые не будут загружены: неизвестная Категория, повтор товара с тем же номером
+            по каталогу и названием, отрицательная цена. Ошибки Категорий заголовка, с которыми загрузка
+            не выполнится, собираются под ключом `categories` теми же проверками, что и в 'write_categories()'.
+            Предупреждения - товары, которые будут загружены с изменениями: перенос Товара в другую Категорию,
+            в том числе один Товар в разных Категориях файла (загрузка оставляет его в последней), отсутствующая цена.
+            Повтор товара не загружается, поэтому предупреждения по нему не выдаются.
+        """
+        header, category_errors = clean_categories(header_categories)
+        category_errors += find_category_conflicts(header)
+        categories = set(self.categories.keys()) | set(header.keys())
+        numbers = {pk: number for number, pk in self.categories.items()}
+        errors, warnings = {}, {}
+        if category_errors:
+            errors['categories'] = category_errors
+        file_categories = {}
+
+        for chunk in split_into_chunks(goods, self.batch_size):
+            rows = []
+            for good in chunk:
+                self.received += 1
+                data, good_errors = clean_good(good)
+                external_id = f'{good.get('id') if isinstance(good, dict) else None}'
+                messages = [f'{field}: {' '.join(str(msg) for msg in msgs)}' for field, msgs in good_errors.items()]
+                if not good_errors and data['category'] not in categories:
+                    messages.append(f'Категория с номером по каталогу catalog_number={data['category']} не существует.')
+                if messages:
+                    errors.setdefault(external_id, []).extend(messages)
+                    self.skipped += 1
+                    continue
+
+                if (data['name'], data['external_id']) in self.seen:
+                    # Загрузка отклоняет повтор товара с тем же ключом, что и здесь.
+                    errors.setdefault(external_id, []).append(DUPLICATE_MSG)
+                    self.skipped += 1
+                    continue
+                self.seen.add((data['name'], data['external_id']))
+
+                for field in ['price', 'price_rrc']:
+                    if good.get(field) in (None, ''):
+                        warnings.setdefault(external_id, []).append(f'{field}: Цена не указана, будет записан 0.')
+                product = self.products.get(data['name'])
+                if product and numbers.get(product[1]) != data['category']:
+                    warnings.setdefault(external_id, []).append(
+                        f'Товар `{data['name']}` будет перенесён из Категории {numbers.get(product[1])}'
+                        f' в Категорию {data['category']}.')
+                # Последней в словаре остаётся Категория последнего товара: её Товар и получит при загрузке.
+                found = file_categories.setdefault(data['name'], {})
+                found.pop(data['category'], None)
+                found[data['category']] = external_id
+                data['content_hash'] = get_content_hash(data)
+                rows.append(data)
+            self.select_changed(rows)
+
+        for name, found in file_categories.items():
+            if len(found) > 1:
+                last = list(found.keys())[-1]
+                for external_id in found.values():
+                    warnings.setdefault(external_id, []).append(
+                        f'Товар `{name}` указан в файле в разных Категориях: {', '.join(map(str, sorted(found)))},'
+                        f' будет записан в Категорию {last}.')
+
+        return {'detail': self.get_report(), 'errors': errors, 'warnings': warnings}
+
+    def get_report(self):
+        """ Возвращает счётчики загрузки.
+        """
+        return describe_counters(self.received, self.skipped, self.created, self.updated, self.unchanged)
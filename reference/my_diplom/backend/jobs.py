@@ -0,0 +1,507 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.files import File
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import APIException, ValidationError
+
+from backend.feeds import DECOMPRESS_ERRORS, get_shop_section, hash_source, iter_shop_sections, open_feed_reader
+from backend.fetchers import fetch_feed
+from backend.importers import ProductsImporter, write_categories
+from backend.models import Category, ImportItemError, ImportJob, ImportRun, Parameter, Product, Shop
+from backend.pipeline import get_import_workers, run_pipeline, use_pipeline
+from backend.profiling import ImportProfiler, NullProfiler
+from backend.validators import get_user_shop, open_source, retire_product_infos
+
+# Владелец блокировок Магазинов на время очистки справочников ('clean_catalog_orphans()'), не совпадает с 'id' задания.
+CATALOG_LOCK = 0
+
+
+def get_error_text(detail):
+    """ Собирает текст ошибки из вложенных словарей и списков 'ErrorDetail'.
+    """
+    if isinstance(detail, dict):
+        return ' '.join(get_error_text(value) for value in detail.values())
+    if isinstance(detail, list):
+        return ' '.join(get_error_text(value) for value in detail)
+
+    return str(detail)
+
+
+def create_import_job(shop, salesman, url, file=None, **options):
+    """ Создаёт задание на загрузку прайса. Загруженный файл сохраняется в хранилище.
+        Уже скачанный файл по ссылке ('file', например раздел файла нескольких Магазинов) тоже сохраняется,
+        и задание загружает его, не скачивая повторно.
+        Задание без Магазина ('shop' - None) создаётся по запросу на загрузку: Магазин определяет
+        обработчик очереди по заголовку файла (см. 'resolve_import_job()').
+    """
+    job = ImportJob(shop=shop, salesman=salesman, **options)
+    if isinstance(url, str):
+        job.url = url
+        if file is not None:
+            job.file.save(os.path.basename(urlsplit(url).path) or 'feed', File(file), save=False)
+    else:
+        job.file.save(url.name, url, save=False)
+    job.save()
+
+    return job
+
+
+def claim_import_job():
+    """ Забирает из очереди самое раннее задание.
+        Задание переводится в состояние "Выполняется" условным UPDATE, поэтому одно задание
+        не достанется двум процессам одновременно.
+        Задание, которое выполняется дольше IMPORT_LOCK_TIMEOUT без действующей блокировки Магазина
+        (процесс загрузки аварийно завершился), забирается повторно и продолжается с контрольной точки.
+    """
+    # Задания Магазинов, загрузка которых уже выполняется, остаются в очереди. Выполняющееся задание
+    # продлевает блокировку своего Магазина, поэтому живые задания этим же условием не забираются повторно.
+    locked = Shop.objects.filter(get_lock_filter()).values('pk')
+    stale = timezone.now() - timedelta(seconds=settings.IMPORT_LOCK_TIMEOUT)
+    queued = Q(state=ImportJob.State.NEW) | Q(state=ImportJob.State.RUNNING, started_at__lt=stale)
+    for job in ImportJob.objects.filter(queued).exclude(shop__in=locked).order_by('created_at')[:10]:
+        if ImportJob.objects.filter(pk=job.pk, state=job.state, started_at=job.started_at).update(
+                state=ImportJob.State.RUNNING, started_at=timezone.now()):
+            job.refresh_from_db()
+            return job
+
+    return None
+
+
+def get_lock_filter():
+    """ Возвращает условие действующей блокировки загрузки Магазина.
+    """
+    stale = timezone.now() - timedelta(seconds=settings.IMPORT_LOCK_TIMEOUT)
+    return Q(import_lock__isnull=False) & Q(import_locked_at__gt=stale)
+
+
+def acquire_shop_lock(job, wait=0):
+    """ Захватывает блокировку загрузки Магазина для задания условным UPDATE строки Магазина.
+        Если блокировка занята, повторяет попытки не дольше 'wait' секунд.
+    """
+    deadline = time.monotonic() + wait
+    while True:
+        if Shop.objects.filter(pk=job.shop_id).exclude(get_lock_filter() & ~Q(import_lock=job.pk)).update(
+                import_lock=job.pk, import_locked_at=timezone.now()):
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(min(settings.IMPORT_WORKER_INTERVAL, max(deadline - time.monotonic(), 0)))
+
+
+def hold_idle_shop(shop):
+    """ Удерживает до конца транзакции строку Магазина, загрузка которого не выполняется.
+        Условный UPDATE блокирует строку, поэтому задание не захватит блокировку загрузки, пока транзакция открыта.
+        Возвращает False, если загрузка Магазина уже выполняется.
+    """
+    return bool(Shop.objects.filter(pk=shop.pk).exclude(get_lock_filter()).update(import_lock=None,
+                                                                                   import_locked_at=None))
+
+
+def renew_shop_lock(job):
+    """ Продлевает блокировку загрузки Магазина, если она принадлежит заданию.
+    """
+    return Shop.objects.filter(pk=job.shop_id, import_lock=job.pk).update(import_locked_at=timezone.now())
+
+
+class ShopLockRenewal:
+    """ Продлевает блокировку загрузки Магазина в отдельном потоке каждую треть IMPORT_LOCK_TIMEOUT, пока
+        задание выполняется. Так блокировка не истекает посреди долгого этапа (скачивания файла, записи
+        большого пакета, снятия товаров с продажи), и вторая загрузка того же Магазина не начинается.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=f'import-lock-{job.pk}', daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(settings.IMPORT_LOCK_TIMEOUT / 3):
+                try:
+                    renew_shop_lock(self.job)
+                except DatabaseError:
+                    # Продление повторится на следующем шаге: до истечения блокировки их остаётся два.
+                    pass
+        finally:
+            # У потока своё соединение с БД, его нужно закрыть.
+            connections.close_all()
+
+
+def release_shop_lock(job):
+    """ Снимает блокировку загрузки Магазина, если она принадлежит заданию.
+    """
+    return Shop.objects.filter(pk=job.shop_id, import_lock=job.pk).update(import_lock=None, import_locked_at=None)
+
+
+def clean_catalog_orphans(wait=0):
+    """ Удаляет Товары без Описаний, Категории без Товаров и Магазинов и Параметры без Значений.
+        Справочники общие для всех Магазинов, а загрузка хранит их 'id' в словарях, поэтому очистка выполняется,
+        только пока не идёт ни одна загрузка: на её время захватываются блокировки всех Магазинов.
+        Если загрузка какого-то Магазина не завершилась за 'wait' секунд, возвращает 'None', иначе число удалённых.
+    """
+    deadline = time.monotonic() + wait
+    while True:
+        Shop.objects.exclude(get_lock_filter()).update(import_lock=CATALOG_LOCK, import_locked_at=timezone.now())
+        try:
+            if not Shop.objects.exclude(import_lock=CATALOG_LOCK).exists():
+                with transaction.atomic():
+                    products = Product.objects.filter(product_infos__isnull=True).delete()[1]
+                    categories = Category.objects.filter(products__isnull=True, shops__isnull=True).delete()[1]
+                    parameters = Parameter.objects.filter(product_parameters__isnull=True).delete()[1]
+                return {'products': products.get(Product._meta.label, 0),
+                        'categories': categories.get(Category._meta.label, 0),
+                        'parameters': parameters.get(Parameter._meta.label, 0)}
+        finally:
+            Shop.objects.filter(import_lock=CATALOG_LOCK).update(import_lock=None, import_locked_at=None)
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(min(settings.IMPORT_WORKER_INTERVAL, max(deadline - time.monotonic(), 0)))
+
+
+def claim_due_shops(interval):
+    """ Забирает Магазины со ссылкой на прайс, плановая загрузка которых не выполнялась дольше 'interval' секунд.
+        Время загрузки отмечается условным UPDATE, поэтому Магазин не достанется двум планировщикам.
+        Магазины, у которых есть незавершённые задания, пропускаются.
+    """
+    now = timezone.now()
+    overdue = Q(feed_refreshed_at__isnull=True) | Q(feed_refreshed_at__lte=now - timedelta(seconds=interval))
+    busy = ImportJob.objects.filter(state__in=[ImportJob.State.NEW, ImportJob.State.RUNNING]).values('shop')
+    shops = []
+    for shop in Shop.objects.filter(overdue).exclude(filename__isnull=True).exclude(filename='').exclude(id__in=busy):
+        if Shop.objects.filter(overdue, pk=shop.pk).update(feed_refreshed_at=now):
+            shop.feed_refreshed_at = now
+            shops.append(shop)
+
+    return shops
+
+
+def refresh_shop_feed(shop):
+    """ Выполняет плановую загрузку прайса по ссылке Магазина от имени его Менеджера по закупкам.
+    """
+    job = create_import_job(shop, shop.buyer, shop.filename, state=ImportJob.State.RUNNING,
+                            started_at=timezone.now())
+    return run_import_job(job)
+
+
+def import_drop_file(shop, path):
+    """ Загружает прайс из каталога Магазина на сервере от имени его Менеджера по закупкам, без запроса HTTP.
+        Файл копируется в хранилище заданий, поэтому поставщик может сразу выложить новый.
+        Если загрузка Магазина уже выполняется, задание с копией файла возвращается в очередь
+        и его выполнит 'run_import_worker', а не завершается ошибкой: повторно каталог файл не передаст.
+    """
+    with open(path, 'rb') as f:
+        job = create_import_job(shop, shop.buyer, File(f, name=os.path.basename(path)), state=ImportJob.State.RUNNING,
+                                started_at=timezone.now())
+    return run_import_job(job)
+
+
+def save_job_progress(job, importer):
+    """ Сохраняет ход выполнения задания.
+    """
+    job.received, job.skipped, job.rejected = importer.received, importer.skipped, importer.rejected
+    job.created, job.updated, job.unchanged = importer.created, importer.updated, importer.unchanged
+    # Сохраняются только новые ошибки, а не весь список заново после каждого пакета.
+    ImportItemError.objects.bulk_create([ImportItemError(job=job, external_id=external_id[:100], message=message)
+                                         for external_id, message in importer.pop_errors()],
+                                        batch_size=importer.batch_size)
+    ImportJob.objects.filter(pk=job.pk).update(received=job.received, skipped=job.skipped, rejected=job.rejected,
+                                               created=job.created, updated=job.updated, unchanged=job.unchanged)
+    return True
+
+
+def import_feed(shop, feed, on_chunk=None, parallel=False, feed_hash='', resume_from=0, profiler=None):
+    """ Загружает Категории из заголовка файла и товары из потока.
+        С параметром 'parallel' товары разбираются и проверяются пулом процессов, если формат файла это позволяет.
+        После каждого пакета сохраняется контрольная точка 'feed_hash', первые 'resume_from' товаров пропускаются.
+        Время этапов загрузки замеряется в 'profiler'.
+    """
+    profiler = profiler or NullProfiler()
+    if feed.header.get('categories'):
+        with profiler.phase('categories'):
+            write_categories(feed.header['categories'])
+
+    with profiler.phase('maps'):
+        importer = ProductsImporter(shop, feed_hash=feed_hash, resume_from=resume_from, profiler=profiler).load_maps()
+    if parallel and feed.can_split():
+        return run_pipeline(importer, feed, get_import_workers(), on_chunk=on_chunk)
+
+    return importer.run(feed.iter_goods(), on_chunk=on_chunk)
+
+
+def check_feed(shop, feed):
+    """ Проверяет файл прайса целиком без записи в БД и возвращает отчёт.
+        Ошибка распаковки сжатого файла (например, обрезанного архива) возвращается как ошибка запроса.
+    """
+    try:
+        return ProductsImporter(shop).load_maps().check(feed.iter_goods(), feed.header.get('categories') or [])
+    except DECOMPRESS_ERRORS as e:
+        raise ValidationError({'detail': [f'Ошибка распаковки файла: {e}']})
+
+
+def run_import_job(job, wait=0):
+    """ Выполняет задание на загрузку прайса.
+        Загрузки одного Магазина выполняются по очереди, загрузки разных Магазинов - одновременно.
+        Если блокировка Магазина занята дольше 'wait' секунд, задание возвращается в очередь,
+        а при ожидании ('wait' больше 0) завершается ошибкой. Замеры выполнения сохраняются в 'ImportRun'.
+    """
+    if job.state != ImportJob.State.RUNNING:
+        job.state, job.started_at = ImportJob.State.RUNNING, timezone.now()
+        job.save(update_fields=['state', 'started_at'])
+
+    if job.shop_id is None:
+        job = resolve_import_job(job)
+        if job.state != ImportJob.State.RUNNING:
+            return job
+
+    if not acquire_shop_lock(job, wait):
+        if not wait:
+            job.state, job.started_at = ImportJob.State.NEW, None
+            job.message = 'Загрузка прайса этого Магазина уже выполняется, задание возвращено в очередь.'
+            job.save(update_fields=['state', 'started_at', 'message'])
+            return job
+        job.state = ImportJob.State.FAILED
+        job.message = 'Загрузка прайса этого Магазина уже выполняется, повторите позже.'
+        return finish_import_job(job)
+
+    try:
+        with ShopLockRenewal(job):
+            # Предыдущая загрузка могла изменить контрольную сумму и заголовки файла Магазина.
+            job.shop.refresh_from_db()
+            with ImportProfiler(settings.IMPORT_TRACE_MEMORY) as profiler:
+                execute_import_job(job, profiler)
+        save_import_run(job, profiler)
+        return job
+    finally:
+        release_shop_lock(job)
+
+
+def run_import_jobs(jobs, wait=0):
+    """ Выполняет задания разных Магазинов одновременно в пуле потоков, не больше IMPORT_SHOP_WORKERS сразу.
+        Возвращает выполненные задания в исходном порядке.
+    """
+    def run(job):
+        try:
+            return run_import_job(job, wait)
+        finally:
+            # У каждого потока своё соединение с БД, его нужно закрыть.
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=max(min(len(jobs), settings.IMPORT_SHOP_WORKERS), 1)) as executor:
+        return list(executor.map(run, jobs))
+
+
+def resolve_import_job(job):
+    """ Определяет Магазин задания, созданного по запросу на загрузку.
+        Файл по ссылке скачивается здесь, в обработчике очереди, а не при обработке запроса,
+        и сохраняется в задание. Магазин определяется по заголовку файла, права проверяются
+        по пользователю, создавшему задание. Файл нескольких Магазинов делится на разделы (см. 'split_import_job()').
+        Возвращает задание с Магазином или уже завершённое задание.
+    """
+    try:
+        if job.file:
+            source, name, content_type = open_source(job.file)
+        else:
+            fetched = fetch_feed(job.url)
+            source, name, content_type = fetched.file, job.url, fetched.content_type
+        try:
+            # Файл просматривается на несколько документов здесь, а не при обработке запроса.
+            feed = open_feed_reader(source, job.url or name, content_type, job.feed_format, scan_documents=True)
+            feed.close()
+            if not job.file:
+                job.file.save(os.path.basename(urlsplit(job.url).path) or 'feed', File(source), save=False)
+            if feed.multi_shop:
+                source.seek(0)
+                return split_import_job(job, source)
+        finally:
+            source.close()
+        job.shop = get_user_shop(job.salesman, feed.header.get('shop'))
+    except APIException as e:
+        job.state, job.message = ImportJob.State.FAILED, get_error_text(e.detail)
+    except Exception as e:
+        job.state, job.message = ImportJob.State.FAILED, f'{e.__class__.__name__}: {e}'
+    else:
+        # Формат и число документов файла уже известны: задание не проверяет файл повторно.
+        job.feed_format = feed.feed_format
+        job.save(update_fields=['shop', 'file', 'feed_format'])
+        remember_shop_url(job.shop, job.url)
+        return job
+
+    return finish_import_job(job)
+
+
+def split_import_job(job, source):
+    """ Делит файл нескольких Магазинов на разделы, и каждый раздел загружается отдельным заданием
+        своего Магазина ('job.sections') с теми же режимом и способом снятия с продажи. Само задание завершается.
+        Если хотя бы один раздел загрузить нельзя, не создаётся ни одно задание.
+    """
+    files, sections = [], []
+    try:
+        for shop_name, file in iter_shop_sections(source):
+            files.append(file)
+            shop = get_user_shop(job.salesman, shop_name)
+            if any(shop == other for other, _ in sections):
+                raise ValidationError({'shop': [f'Раздел Магазина `{shop_name}` указан в файле дважды.']})
+            sections.append((shop, file))
+        if not sections:
+            raise ValidationError({'detail': ['В файле нет разделов Магазинов.']})
+
+        for shop, file in sections:
+            remember_shop_url(shop, job.url)
+            create_import_job(shop, job.salesman, job.url or File(file, name=f'{shop.id}.yaml'),
+                              file=file if job.url else None, feed_format='yaml', parent=job, mode=job.mode,
+                              retire=job.retire)
+    finally:
+        for file in files:
+            file.close()
+
+    job.state = ImportJob.State.DONE
+    job.message = f'Файл разделён на разделы Магазинов `{len(sections)}`, каждый загружается отдельным заданием.'
+    return finish_import_job(job)
+
+
+def remember_shop_url(shop, url):
+    """ Запоминает в Магазине ссылку для плановой загрузки.
+    """
+    if url and shop.filename != url:
+        # Заголовки 'ETag' и 'Last-Modified' относятся к прежней ссылке.
+        shop.filename, shop.feed_etag, shop.feed_last_modified = url, '', ''
+        shop.save(update_fields=['filename', 'feed_etag', 'feed_last_modified'])
+
+
+def save_import_run(job, profiler):
+    """ Сохраняет замеры выполнения задания.
+    """
+    rows_per_second = job.received / profiler.duration if profiler.duration else 0
+    return ImportRun.objects.create(
+        job=job, state=job.state, duration=round(profiler.duration, 4), phases=profiler.phases,
+        rows_per_second=round(rows_per_second, 1), queries=profiler.queries, peak_memory=profiler.peak_memory,
+        counters={'received': job.received, 'skipped': job.skipped, 'created': job.created, 'updated': job.updated,
+                  'unchanged': job.unchanged, 'retired': job.retired, 'resumed_from': job.resumed_from,
+                  'errors': job.rejected})
+
+
+def execute_import_job(job, profiler=None):
+    """ Загружает прайс задания.
+        Ошибка задания сохраняется в задании и не прерывает работу обработчика очереди.
+        Если файл не изменился с последней загрузки без ошибок товаров, товары не разбираются.
+        Файл по ссылке запрашивается условно: на ответ сервера 304 "Not Modified" он не скачивается.
+        В режиме синхронизации товары Магазина, которых нет в файле, снимаются с продажи.
+        Время этапов загрузки замеряется в 'profiler'.
+    """
+    profiler = profiler or NullProfiler()
+    try:
+        fetched = None
+        if job.url and not job.file:
+            # Заголовки прошлой загрузки действительны, только если файл загружался по той же ссылке.
+            # При синхронизации нужен полный список товаров, поэтому файл скачивается всегда.
+            conditional = job.mode == ImportJob.Mode.UPDATE and job.url == job.shop.filename
+            with profiler.phase('fetch'):
+                fetched = fetch_feed(job.url, job.shop.feed_etag if conditional else '',
+                                     job.shop.feed_last_modified if conditional else '')
+            if fetched.not_modified:
+                job.state, job.feed_unchanged = ImportJob.State.DONE, True
+                job.message = 'Файл на сервере не изменился с последней загрузки.'
+                return finish_import_job(job)
+            source, feed_hash = fetched.file, fetched.feed_hash
+            name, content_type = job.url, fetched.content_type
+        else:
+            with profiler.phase('fetch'):
+                source, name, content_type = open_source(job.file)
+                source, feed_hash = hash_source(source)
+            name = job.url or name
+
+        if job.mode == ImportJob.Mode.UPDATE and feed_hash == job.shop.feed_hash:
+            source.close()
+            job.state, job.feed_unchanged = ImportJob.State.DONE, True
+            job.message = 'Этот файл уже загружен, изменений нет.'
+            return finish_import_job(job)
+
+        parallel = use_pipeline(source)
+        with profiler.phase('parse'):
+            # Файл задания, Магазин которого определён по файлу, и раздел файла уже проверены на несколько документов.
+            feed = open_feed_reader(source, name, content_type, job.feed_format, scan_documents=not job.feed_format)
+            if feed.multi_shop:
+                # Из файла нескольких Магазинов загружается только раздел Магазина задания.
+                feed.close()
+                source.seek(0)
+                section = get_shop_section(source, job.shop.name)
+                source.close()
+                if section is None:
+                    raise ValidationError({'shop': [f'В файле нет раздела Магазина `{job.shop.name}`.']})
+                source = section
+                parallel = use_pipeline(source)
+                feed = open_feed_reader(source, feed_format='yaml')
+        if feed.header.get('shop') != job.shop.name:
+            feed.close()
+            raise ValidationError({'shop': [f'Файл относится к Магазину `{feed.header.get('shop')}`,'
+                                            f' а не к `{job.shop.name}`.']})
+
+        # Тот же файл, загрузка которого прервалась, продолжается с контрольной точки.
+        if job.shop.checkpoint_hash == feed_hash:
+            job.resumed_from = job.shop.checkpoint_offset
+        importer = import_feed(job.shop, feed, on_chunk=lambda imp: save_job_progress(job, imp), parallel=parallel,
+                               feed_hash=feed_hash, resume_from=job.resumed_from, profiler=profiler)
+        if job.mode == ImportJob.Mode.SYNC:
+            if not importer.seen:
+                # Файл без единого правильного товара - скорее ошибка выгрузки, чем закрытие всего ассортимента.
+                raise ValidationError({'detail': ['В файле нет ни одного правильного товара, товары Магазина'
+                                                  ' не сняты с продажи.']})
+            with profiler.phase('retire'):
+                result = retire_product_infos(job.shop, importer.get_vanished(),
+                                              delete=job.retire == ImportJob.Retire.DELETE,
+                                              batch_size=importer.batch_size)
+            job.retired = result['zeroed'] + result['deleted']
+    except APIException as e:
+        job.state, job.message = ImportJob.State.FAILED, get_error_text(e.detail)
+    except Exception as e:
+        job.state, job.message = ImportJob.State.FAILED, f'{e.__class__.__name__}: {e}'
+    else:
+        save_job_progress(job, importer)
+        job.state = ImportJob.State.DONE
+        if importer.received == 0:
+            job.message = 'У этого источника пустой список товаров.'
+        elif importer.received == importer.unchanged and not job.retired:
+            job.message = 'Возможно, этот файл уже загружен.'
+        else:
+            job.message = 'Загрузка выполнена.'
+        if job.resumed_from:
+            job.message += f' Продолжена с контрольной точки: пропущено товаров `{job.resumed_from}`.'
+        # Файл с ошибками товаров не запоминается: после исправления данных (например, добавления Категорий)
+        # его повторная загрузка должна снова обработать отклонённые товары, а не завершиться как "без изменений".
+        complete = not importer.rejected
+        shop_data = {'feed_hash': feed_hash if complete else '', 'checkpoint_hash': '', 'checkpoint_offset': 0}
+        if job.url and job.url == job.shop.filename:
+            # Заголовки ответа известны, только если файл скачан условным запросом задания Магазина.
+            known = complete and fetched is not None
+            shop_data.update(feed_etag=fetched.etag if known else '',
+                             feed_last_modified=fetched.last_modified if known else '')
+        Shop.objects.filter(pk=job.shop.pk).update(**shop_data)
+
+    return finish_import_job(job)
+
+
+def finish_import_job(job):
+    """ Завершает задание. Файл успешно выполненного задания удаляется из хранилища.
+    """
+    if job.state == ImportJob.State.DONE and job.file:
+        job.file.delete(save=False)
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=['state', 'message', 'feed_unchanged', 'retired', 'resumed_from', 'file', 'finished_at'])
+    return job
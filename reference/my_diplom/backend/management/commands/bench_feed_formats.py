@@ -0,0 +1,32 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend.feeds import FEED_FORMATS, open_feed_reader
+from backend.synthetic import write_synthetic_feed
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость разбора одного и того же синтетического каталога в форматах YAML, CSV и JSON Lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--goods', type=int, default=100_000, help='Количество товаров в синтетическом каталоге.')
+
+    def handle(self, *args, **options):
+        for feed_format in FEED_FORMATS.keys():
+            fd, path = tempfile.mkstemp(suffix=f'.{feed_format}')
+            os.close(fd)
+            try:
+                write_synthetic_feed(path, feed_format, goods_count=options['goods'])
+
+                start = time.perf_counter()
+                with open(path, 'rb') as f:
+                    reader = open_feed_reader(f, path)
+                    count = sum(1 for _ in reader.iter_goods())
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f'{feed_format}: размер {os.path.getsize(path) // 1024} КБ, товаров {count},'
+                                  f' время {elapsed:.2f} с, {count / elapsed:,.0f} товаров/с.')
+            finally:
+                os.remove(path)
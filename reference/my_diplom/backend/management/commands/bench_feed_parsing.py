@@ -0,0 +1,87 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+import django
+from django.core.management.base import BaseCommand
+from yaml import load as load_yaml, Loader
+
+from backend.feeds import YamlFeedReader
+from backend.synthetic import write_synthetic_feed
+
+try:
+    import resource
+except ImportError:    # Windows.
+    resource = None
+
+
+def parse_full(path):
+    """ Прежний способ: файл читается в память целиком, разбирается парсером на чистом Python,
+        затем из товаров строится вторая полная копия.
+    """
+    from backend.services import converting_products_data
+
+    with open(path, 'rb') as f:
+        content = f.read()
+    data = load_yaml(stream=content, Loader=Loader)
+    return len(converting_products_data(data['goods'], data['shop']))
+
+
+def parse_stream(path):
+    """ Потоковый способ: события парсера libyaml, товары выдаются пакетами фиксированного размера.
+    """
+    from backend.importers import get_batch_size, split_into_chunks
+
+    count = 0
+    with open(path, 'rb') as f:
+        reader = YamlFeedReader(f)
+        for chunk in split_into_chunks(reader.iter_goods(), get_batch_size()):
+            count += len(chunk)
+
+    return count
+
+
+def measure(func, path, queue):
+    """ Выполняет разбор в отдельном процессе и передаёт время и пиковый объём памяти (RSS).
+        Процесс запускается без копирования родительского ('spawn'), поэтому сначала настраивает Django,
+        а модули с моделями импортируются в функциях разбора.
+    """
+    django.setup()
+    start = time.perf_counter()
+    count = func(path)
+    elapsed = time.perf_counter() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024 if resource else None
+    queue.put((count, elapsed, rss))
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает время разбора и пиковую память (RSS) прежнего и потокового чтения YAML-прайса.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--goods', type=int, default=100_000, help='Количество товаров в синтетическом файле.')
+        parser.add_argument('--file', default='', help='Готовый файл прайса вместо синтетического.')
+
+    def handle(self, *args, **options):
+        path = options['file']
+        if not path:
+            fd, path = tempfile.mkstemp(suffix='.yaml')
+            os.close(fd)
+            write_synthetic_feed(path, goods_count=options['goods'])
+        self.stdout.write(f'Файл: {path}, размер {os.path.getsize(path) // 1024} КБ.')
+
+        # Каждый способ измеряется в отдельном процессе, чтобы пиковая память не смешивалась.
+        # Способ запуска 'spawn' доступен на всех платформах, как и в конвейере загрузки ('run_pipeline()').
+        context = multiprocessing.get_context('spawn')
+        try:
+            for title, func in [('Прежний (Loader, целиком)', parse_full), ('Потоковый (CLoader, события)', parse_stream)]:
+                queue = context.Queue()
+                process = context.Process(target=measure, args=(func, path, queue))
+                process.start()
+                count, elapsed, rss = queue.get()
+                process.join()
+                rss = f'{rss} МБ' if rss is not None else 'н/д'
+                self.stdout.write(f'{title}: товаров {count}, время {elapsed:.2f} с, пиковая память {rss}.')
+        finally:
+            if not options['file']:
+                os.remove(path)
@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext, override_settings, setup_test_environment,
+                               teardown_test_environment)
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from backend.feeds import FEED_FORMATS
+from backend.models import ImportRun, Salesman, Shop
+from backend.synthetic import SYNTHETIC_SHOP, write_synthetic_feed
+
+
+class Command(BaseCommand):
+    help = ('Загружает синтетические прайсы разного размера через PartnerUpdate в новую БД'
+            ' и выводит скорость загрузки, число SQL-запросов и время этапов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                            help='Количества товаров в прайсах.')
+        parser.add_argument('--format', dest='feed_format', choices=list(FEED_FORMATS.keys()), default='yaml',
+                            help='Формат файлов прайса.')
+        parser.add_argument('--categories', type=int, default=20, help='Количество Категорий.')
+        parser.add_argument('--parameters', type=int, default=3, help='Количество характеристик у товара.')
+        parser.add_argument('--duplicates', type=float, default=0.0, help='Доля повторяющихся товаров.')
+        parser.add_argument('--trace-memory', action='store_true', help='Замерять пиковую память (медленнее).')
+        parser.add_argument('--output', default='',
+                            help='Файл JSON Lines, в конец которого дописываются результаты для сравнения во времени.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            for size in options['sizes']:
+                fd, path = tempfile.mkstemp(suffix=f'.{options['feed_format']}')
+                os.close(fd)
+                try:
+                    write_synthetic_feed(path, options['feed_format'], goods_count=size,
+                                         categories_count=options['categories'],
+                                         parameters_count=options['parameters'], duplicates=options['duplicates'])
+                    for result in self.run_benchmark(path, options):
+                        result.update(goods=size, feed_format=options['feed_format'],
+                                      size_kb=os.path.getsize(path) // 1024)
+                        self.report(result, options['output'])
+                finally:
+                    os.remove(path)
+        finally:
+            teardown_test_environment()
+
+    def run_benchmark(self, path, options):
+        """ Создаёт новую БД и загружает в неё прайс дважды: первая загрузка создаёт все товары,
+            повторная загрузка того же файла находит их без изменений.
+        """
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            user = Salesman.persons.create_user(email='bench@example.com', password=None, is_active=True,
+                                                position=Salesman.UserType.BUYER)
+            shop = Shop.objects.create(name=SYNTHETIC_SHOP, buyer=user)
+            client = APIClient()
+            client.force_authenticate(user)
+
+            results = []
+            for run in ('first', 'repeat'):
+                # Повторная загрузка того же файла иначе пропускается целиком по контрольной сумме.
+                Shop.objects.filter(pk=shop.pk).update(feed_hash='')
+                results.append({'run': run, **self.upload(client, path, options)})
+
+            return results
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    @staticmethod
+    def upload(client, path, options):
+        """ Отправляет файл в PartnerUpdate и возвращает замеры запроса и выполнения задания.
+        """
+        # Загрузка выполняется в процессе обработки запроса, чтобы замерить её целиком.
+        with override_settings(IMPORT_JOBS_ASYNC=False, IMPORT_TRACE_MEMORY=options['trace_memory']):
+            with open(path, 'rb') as f, CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = client.post(reverse('backend:upload'), {'url': f}, format='multipart')
+                elapsed = time.perf_counter() - start
+
+        run = ImportRun.objects.filter(job_id=response.data.get('job_id')).first()
+        return {'status': response.status_code, 'seconds': round(elapsed, 3),
+                'rows_per_second': round(run.counters['received'] / elapsed, 1) if run else 0,
+                'queries': len(queries), 'phases': run.phases if run else {},
+                'peak_memory': run.peak_memory if run else None, 'counters': run.counters if run else {},
+                'message': response.data.get('message', response.data)}
+
+    def report(self, result, output):
+        """ Выводит результат и дописывает его в файл 'output'.
+        """
+        phases = ', '.join(f'{name} {value:.2f}' for name, value in sorted(result['phases'].items(),
+                                                                             key=lambda item: -item[1]))
+        memory = f', память {result['peak_memory'] // 1024 ** 2} МБ' if result['peak_memory'] else ''
+        self.stdout.write(f'{result['feed_format']} {result['goods']} товаров ({result['size_kb']} КБ),'
+                          f' {result['run']}: ответ {result['status']}, {result['seconds']:.2f} с,'
+                          f' {result['rows_per_second']:,.0f} товаров/с, SQL-запросов {result['queries']}{memory}.'
+                          f' Этапы, с: {phases}.')
+        if result['status'] >= 300:
+            self.stderr.write(f'{result['message']}')
+
+        if output:
+            result = {'date': timezone.now().isoformat(), 'database': connection.vendor, **result}
+            with open(output, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(result, ensure_ascii=False, default=str) + '\n')
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.jobs import clean_catalog_orphans
+
+
+class Command(BaseCommand):
+    help = ('Удаляет Товары без Описаний, Категории без Товаров и Магазинов и Параметры без Значений, например,'
+            ' после синхронизации прайсов с удалением товаров. Выполняется, только пока не идёт ни одна загрузка.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wait', type=float, default=settings.IMPORT_LOCK_WAIT,
+                            help='Сколько секунд ждать завершения выполняющихся загрузок.')
+
+    def handle(self, *args, **options):
+        result = clean_catalog_orphans(options['wait'])
+        if result is None:
+            raise CommandError('Выполняется загрузка прайса, повторите позже.')
+        self.stdout.write(f'Удалено Товаров: {result['products']}, Категорий: {result['categories']},'
+                          f' Параметров: {result['parameters']}.')
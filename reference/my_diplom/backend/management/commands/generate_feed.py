@@ -0,0 +1,37 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.feeds import FEED_FORMATS, get_feed_format
+from backend.synthetic import SYNTHETIC_SHOP, write_synthetic_feed
+
+
+class Command(BaseCommand):
+    help = ('Создаёт синтетический файл прайса в формате "data/shop1.yaml" с заданным количеством товаров,'
+            ' Категорий, характеристик и долей повторов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к создаваемому файлу.')
+        parser.add_argument('--goods', type=int, default=10_000, help='Количество товаров вместе с повторами.')
+        parser.add_argument('--categories', type=int, default=20, help='Количество Категорий.')
+        parser.add_argument('--parameters', type=int, default=3, help='Количество характеристик у товара.')
+        parser.add_argument('--duplicates', type=float, default=0.0,
+                            help='Доля товаров, повторяющих предыдущий товар, от 0 до 1.')
+        parser.add_argument('--shop', default=SYNTHETIC_SHOP, help='Название Магазина.')
+        parser.add_argument('--format', dest='feed_format', choices=list(FEED_FORMATS.keys()), default='',
+                            help='Формат файла. По умолчанию определяется по расширению, иначе YAML.')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['duplicates'] < 1:
+            raise CommandError('Доля повторов должна быть от 0 до 1.')
+        if options['categories'] < 1:
+            raise CommandError('Нужна хотя бы одна Категория.')
+
+        path = options['path']
+        feed_format = options['feed_format'] or get_feed_format(path)
+
+        write_synthetic_feed(path, feed_format, goods_count=options['goods'], categories_count=options['categories'],
+                             parameters_count=options['parameters'], duplicates=options['duplicates'],
+                             shop=options['shop'])
+        self.stdout.write(f'Файл {path}: формат {feed_format}, товаров {options['goods']},'
+                          f' размер {os.path.getsize(path) // 1024} КБ.')
@@ -0,0 +1,20 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from backend.prices import rebuild_price_entries
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает строки Прайса из Описаний товаров, например, после изменения данных в БД'
+            ' в обход приложения или переименования характеристик.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.IMPORT_BATCH_SIZE,
+                            help='Количество Описаний товаров, пересобираемых одним запросом.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = rebuild_price_entries(options['batch_size'])
+        self.stdout.write(f'Строк Прайса пересобрано: {count}, {time.perf_counter() - start:.2f} с.')
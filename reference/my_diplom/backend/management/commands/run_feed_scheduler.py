@@ -0,0 +1,71 @@
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from backend.jobs import claim_due_shops, refresh_shop_feed
+
+POLL_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = ('Периодически загружает прайсы всех Магазинов, у которых указана ссылка на файл.'
+            ' Задания выполняются в ограниченном пуле потоков, с ограничением числа запросов к одному серверу.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Загрузить прайсы, срок которых подошёл, и завершиться.')
+        parser.add_argument('--interval', type=float, default=settings.FEED_REFRESH_INTERVAL,
+                            help='Период плановой загрузки прайса одного Магазина в секундах.')
+        parser.add_argument('--workers', type=int, default=settings.FEED_REFRESH_WORKERS,
+                            help='Количество одновременных загрузок.')
+        parser.add_argument('--per-host', type=int, default=settings.FEED_REFRESH_PER_HOST,
+                            help='Количество одновременных загрузок с одного сервера.')
+        parser.add_argument('--jitter', type=float, default=settings.FEED_REFRESH_JITTER,
+                            help='Наибольшая случайная задержка запуска загрузки в секундах.')
+
+    def handle(self, *args, **options):
+        self.jitter = options['jitter']
+        per_host = max(options['per_host'], 1)
+        self.hosts = defaultdict(lambda: threading.BoundedSemaphore(per_host))
+        self.hosts_lock = threading.Lock()
+        # Сроки проверяются не реже раза в минуту, чтобы Магазины с новыми ссылками не ждали полный период.
+        poll = min(options['interval'], POLL_INTERVAL)
+
+        self.stdout.write('Планировщик загрузок запущен.')
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as executor:
+            while True:
+                shops = claim_due_shops(options['interval'])
+                for future in [executor.submit(self.refresh, shop) for shop in shops]:
+                    if options['once']:
+                        future.result()
+                if options['once']:
+                    break
+                time.sleep(poll)
+
+    def get_host_lock(self, url):
+        """ Возвращает семафор сервера, с которого загружается прайс.
+        """
+        with self.hosts_lock:
+            return self.hosts[urlsplit(url).hostname or '']
+
+    def refresh(self, shop):
+        """ Загружает прайс Магазина в отдельном потоке.
+            Случайная задержка разносит по времени запросы Магазинов, срок загрузки которых подошёл одновременно.
+        """
+        try:
+            time.sleep(random.uniform(0, self.jitter))
+            with self.get_host_lock(shop.filename):
+                job = refresh_shop_feed(shop)
+            self.stdout.write(f'Магазин `{shop.name}`, задание {job}. {job.message}')
+        except Exception as e:
+            self.stderr.write(f'Магазин `{shop.name}`: {e.__class__.__name__}: {e}')
+        finally:
+            # У каждого потока своё соединение с БД, его нужно закрыть.
+            connections.close_all()
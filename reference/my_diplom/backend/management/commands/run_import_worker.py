@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from backend.jobs import claim_import_job, run_import_job
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задания на загрузку прайсов из очереди. Можно запускать несколько процессов одновременно.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Выполнить задания из очереди и завершиться.')
+        parser.add_argument('--interval', type=float, default=settings.IMPORT_WORKER_INTERVAL,
+                            help='Период опроса очереди в секундах.')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Обработчик очереди загрузок запущен.')
+        while True:
+            job = claim_import_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+
+            # Магазин задания, созданного по запросу на загрузку, определяется по заголовку файла.
+            shop_name = job.shop.name if job.shop else 'определяется по файлу'
+            self.stdout.write(f'Задание {job.id}: загрузка прайса магазина `{shop_name}`.')
+            job = run_import_job(job)
+            self.stdout.write(f'Задание {job}. {job.message}')
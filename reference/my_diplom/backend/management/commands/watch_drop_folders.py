@@ -0,0 +1,69 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from backend.jobs import import_drop_file
+from backend.models import Shop
+from backend.watchers import DropFolder, InotifyWaiter, get_waiter
+
+
+class Command(BaseCommand):
+    help = ('Следит за каталогами на сервере, в которые поставщики выкладывают прайсы (поле `drop_dir` Магазина),'
+            ' и загружает новые и изменённые файлы в пуле потоков, без запроса HTTP.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Загрузить файлы, которые уже дописаны, и завершиться.')
+        parser.add_argument('--interval', type=float, default=settings.FEED_DROP_INTERVAL,
+                            help='Наибольший период просмотра каталогов в секундах.')
+        parser.add_argument('--settle', type=float, default=settings.FEED_DROP_SETTLE,
+                            help='Сколько секунд файл не должен меняться, чтобы считаться дописанным.')
+        parser.add_argument('--workers', type=int, default=settings.FEED_DROP_WORKERS,
+                            help='Количество одновременных загрузок.')
+        parser.add_argument('--polling', action='store_true',
+                            help='Просматривать каталоги периодически, не используя inotify.')
+
+    def handle(self, *args, **options):
+        folder = DropFolder(options['settle'])
+        waiter = get_waiter(options['polling'])
+        # С inotify каталоги просматриваются по событию, а пока файл дописывается - через 'settle' секунд.
+        poll = min(options['interval'], max(options['settle'], 1))
+
+        mode = 'inotify' if isinstance(waiter, InotifyWaiter) else 'периодический просмотр'
+        self.stdout.write(f'Наблюдение за каталогами прайсов запущено ({mode}).')
+        try:
+            with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as executor:
+                while True:
+                    folders = self.get_folders()
+                    waiter.watch(folders.keys())
+                    futures = [executor.submit(self.import_file, shop, path)
+                               for shop, path in folder.scan(folders, once=options['once'])]
+                    if options['once']:
+                        for future in futures:
+                            future.result()
+                        break
+                    waiter.wait(poll if folder.pending else options['interval'])
+        finally:
+            waiter.close()
+
+    @staticmethod
+    def get_folders():
+        """ Возвращает каталоги Магазинов: {путь: Магазин}. Список перечитывается на каждом просмотре.
+        """
+        return {os.path.abspath(shop.drop_dir): shop
+                for shop in Shop.objects.exclude(drop_dir='').select_related('buyer')}
+
+    def import_file(self, shop, path):
+        """ Загружает файл в отдельном потоке.
+        """
+        try:
+            job = import_drop_file(shop, path)
+            self.stdout.write(f'Магазин `{shop.name}`, файл {path}, задание {job}. {job.message}')
+        except Exception as e:
+            self.stderr.write(f'Магазин `{shop.name}`, файл {path}: {e.__class__.__name__}: {e}')
+        finally:
+            # У каждого потока своё соединение с БД, его нужно закрыть.
+            connections.close_all()
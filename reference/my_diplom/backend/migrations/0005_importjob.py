@@ -0,0 +1,41 @@
+# Generated by Django 5.0.6 on 2026-10-17 03:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0004_alter_contact_options_alter_parameter_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(blank=True, max_length=500, null=True, verbose_name='Загрузочный файл')),
+                ('file', models.FileField(blank=True, null=True, upload_to='imports/', verbose_name='Загруженный файл')),
+                ('state', models.CharField(choices=[('NE', 'В очереди'), ('RN', 'Выполняется'), ('DN', 'Выполнено'), ('FL', 'Ошибка')], default='NE', max_length=2, verbose_name='Состояние')),
+                ('received', models.PositiveIntegerField(default=0, verbose_name='Получено товаров')),
+                ('skipped', models.PositiveIntegerField(default=0, verbose_name='Пропущено')),
+                ('created', models.PositiveIntegerField(default=0, verbose_name='Загружено')),
+                ('updated', models.PositiveIntegerField(default=0, verbose_name='Обновлено')),
+                ('errors', models.JSONField(blank=True, default=dict, verbose_name='Ошибки товаров')),
+                ('message', models.TextField(blank=True, default='', verbose_name='Сообщение')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начало выполнения')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Окончание выполнения')),
+                ('salesman', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Менеджер по закупкам')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to='backend.shop', verbose_name='Магазин')),
+            ],
+            options={
+                'verbose_name': 'Задание на загрузку',
+                'verbose_name_plural': 'Задания на загрузку',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-17 03:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0005_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='feed_unchanged',
+            field=models.BooleanField(default=False, verbose_name='Файл не изменился'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='unchanged',
+            field=models.PositiveIntegerField(default=0, verbose_name='Без изменений'),
+        ),
+        migrations.AddField(
+            model_name='productinfo',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=32, verbose_name='Контрольная сумма содержимого при загрузке'),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='feed_hash',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Контрольная сумма последнего загруженного файла'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-17 03:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0006_import_hashes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='mode',
+            field=models.CharField(choices=[('UP', 'Обновление'), ('SY', 'Синхронизация')], default='UP', max_length=2, verbose_name='Режим загрузки'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='retire',
+            field=models.CharField(choices=[('ZR', 'Обнулить'), ('DL', 'Удалить')], default='ZR', max_length=2, verbose_name='Снятие с продажи'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='retired',
+            field=models.PositiveIntegerField(default=0, verbose_name='Снято с продажи'),
+        ),
+    ]
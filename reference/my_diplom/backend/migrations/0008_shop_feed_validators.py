@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-17 03:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0007_importjob_mode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='feed_etag',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Заголовок ETag последнего загруженного файла'),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='feed_last_modified',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Заголовок Last-Modified последнего загруженного файла'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 03:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0008_shop_feed_validators'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='feed_refreshed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последняя плановая загрузка'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 03:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0009_shop_feed_refreshed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='feed_format',
+            field=models.CharField(blank=True, default='', max_length=5, verbose_name='Формат файла'),
+        ),
+    ]
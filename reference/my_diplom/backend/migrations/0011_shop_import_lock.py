@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-17 03:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0010_importjob_feed_format'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='import_lock',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Задание, выполняющее загрузку'),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='import_locked_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Время блокировки загрузки'),
+        ),
+    ]
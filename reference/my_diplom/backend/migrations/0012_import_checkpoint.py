@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-17 03:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0011_shop_import_lock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='resumed_from',
+            field=models.PositiveIntegerField(default=0, verbose_name='Продолжено с товара'),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='checkpoint_hash',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Контрольная сумма файла прерванной загрузки'),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='checkpoint_offset',
+            field=models.PositiveIntegerField(default=0, verbose_name='Товаров записано прерванной загрузкой'),
+        ),
+    ]
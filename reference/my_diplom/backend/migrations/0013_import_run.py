@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-17 03:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0012_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.CharField(choices=[('NE', 'В очереди'), ('RN', 'Выполняется'), ('DN', 'Выполнено'), ('FL', 'Ошибка')], max_length=2, verbose_name='Результат')),
+                ('duration', models.FloatField(default=0, verbose_name='Время выполнения, с')),
+                ('phases', models.JSONField(blank=True, default=dict, verbose_name='Время этапов, с')),
+                ('rows_per_second', models.FloatField(default=0, verbose_name='Товаров в секунду')),
+                ('queries', models.PositiveIntegerField(default=0, verbose_name='SQL-запросов')),
+                ('peak_memory', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='Пиковая память, байт')),
+                ('counters', models.JSONField(blank=True, default=dict, verbose_name='Счётчики загрузки')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата выполнения')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='runs', to='backend.importjob', verbose_name='Задание')),
+            ],
+            options={
+                'verbose_name': 'Выполнение загрузки',
+                'verbose_name_plural': 'Выполнения загрузок',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
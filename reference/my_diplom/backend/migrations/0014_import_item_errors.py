@@ -0,0 +1,50 @@
+# Generated by Django 5.0.6 on 2026-10-17 04:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def move_errors(apps, schema_editor):
+    """ Переносит ошибки товаров из словаря задания в отдельную таблицу.
+    """
+    ImportJob = apps.get_model('backend', 'ImportJob')
+    ImportItemError = apps.get_model('backend', 'ImportItemError')
+    for job in ImportJob.objects.exclude(errors={}).iterator():
+        ImportItemError.objects.bulk_create([ImportItemError(job=job, external_id=str(external_id)[:100],
+                                                             message=str(message))
+                                             for external_id, message in job.errors.items()], batch_size=1000)
+        ImportJob.objects.filter(pk=job.pk).update(rejected=len(job.errors))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0013_import_run'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='rejected',
+            field=models.PositiveIntegerField(default=0, verbose_name='С ошибками'),
+        ),
+        migrations.CreateModel(
+            name='ImportItemError',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('external_id', models.CharField(blank=True, default='', max_length=100, verbose_name='Номер по каталогу')),
+                ('message', models.TextField(verbose_name='Сообщение')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='item_errors', to='backend.importjob', verbose_name='Задание')),
+            ],
+            options={
+                'verbose_name': 'Ошибка товара',
+                'verbose_name_plural': 'Ошибки товаров',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(move_errors, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='importjob',
+            name='errors',
+        ),
+    ]
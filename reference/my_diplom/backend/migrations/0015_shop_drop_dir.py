@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 04:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0014_import_item_errors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='drop_dir',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Каталог на сервере, в который поставщик выкладывает прайсы'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.0.6 on 2026-10-17 04:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_price_entries(apps, schema_editor):
+    """ Заполняет строки Прайса из существующих Описаний товаров.
+    """
+    PriceEntry = apps.get_model('backend', 'PriceEntry')
+    ProductInfo = apps.get_model('backend', 'ProductInfo')
+    ProductParameter = apps.get_model('backend', 'ProductParameter')
+    ids = list(ProductInfo.objects.filter(product__isnull=False, shop__isnull=False).order_by('id').values_list(
+        'id', flat=True))
+    for pos in range(0, len(ids), 1000):
+        infos = ProductInfo.objects.filter(id__in=ids[pos:pos + 1000]).select_related('product__category', 'shop')
+        parameters = {}
+        for info_id, name, value in ProductParameter.objects.filter(product_info__in=infos).order_by(
+                'id').values_list('product_info_id', 'parameter__name', 'value'):
+            parameters.setdefault(info_id, []).append({'parameter': name, 'value': value})
+        PriceEntry.objects.bulk_create([
+            PriceEntry(info_id=info.id, product_id=info.product_id, product_name=info.product.name, model=info.model,
+                       catalog_number=info.catalog_number, category=info.product.category,
+                       category_name=info.product.category.name if info.product.category else '',
+                       category_number=info.product.category.catalog_number if info.product.category else None,
+                       shop_id=info.shop_id, shop_name=info.shop.name, shop_open=info.shop.state == 'OP',
+                       quantity=info.quantity, price_rrc=info.price_rrc, parameters=parameters.get(info.id, []))
+            for info in infos])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0015_shop_drop_dir'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceEntry',
+            fields=[
+                ('info', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='price_entry', serialize=False, to='backend.productinfo', verbose_name='Описание товара')),
+                ('product_name', models.CharField(max_length=80, verbose_name='Название товара')),
+                ('model', models.CharField(blank=True, max_length=80, null=True, verbose_name='Модель')),
+                ('catalog_number', models.PositiveIntegerField(verbose_name='Номер по каталогу')),
+                ('category_name', models.CharField(blank=True, default='', max_length=40, verbose_name='Название категории')),
+                ('category_number', models.IntegerField(blank=True, null=True, verbose_name='Номер категории по каталогу')),
+                ('shop_name', models.CharField(max_length=50, verbose_name='Название магазина')),
+                ('shop_open', models.BooleanField(default=False, verbose_name='Магазин принимает заказы')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='Количество')),
+                ('price_rrc', models.PositiveIntegerField(default=0, verbose_name='Рекомендуемая розничная цена')),
+                ('parameters', models.JSONField(blank=True, default=list, verbose_name='Характеристики')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='backend.category', verbose_name='Категория')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='backend.product', verbose_name='Товар')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='backend.shop', verbose_name='Магазин')),
+            ],
+            options={
+                'verbose_name': 'Строка прайса',
+                'verbose_name_plural': 'Строки прайса',
+                'ordering': ['info'],
+                'indexes': [models.Index(condition=models.Q(('quantity__gt', 0), ('shop_open', True)), fields=['info'], name='price_entry_available'), models.Index(condition=models.Q(('quantity__gt', 0), ('shop_open', True)), fields=['category', 'info'], name='price_entry_category'), models.Index(condition=models.Q(('quantity__gt', 0), ('shop_open', True)), fields=['shop', 'info'], name='price_entry_shop'), models.Index(condition=models.Q(('quantity__gt', 0), ('shop_open', True)), fields=['product_name'], name='price_entry_name'), models.Index(condition=models.Q(('quantity__gt', 0), ('shop_open', True)), fields=['price_rrc'], name='price_entry_price')],
+            },
+        ),
+        migrations.RunPython(fill_price_entries, migrations.RunPython.noop),
+    ]
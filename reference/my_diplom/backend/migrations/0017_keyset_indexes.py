@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-17 04:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0016_price_entry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='priceentry',
+            name='price_entry_name',
+        ),
+        migrations.RemoveIndex(
+            model_name='priceentry',
+            name='price_entry_price',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at', 'id'], name='order_created'),
+        ),
+        migrations.AddIndex(
+            model_name='priceentry',
+            index=models.Index(condition=models.Q(('quantity__gt', 0), ('shop_open', True)), fields=['product_name', 'info'], name='price_entry_name'),
+        ),
+        migrations.AddIndex(
+            model_name='priceentry',
+            index=models.Index(condition=models.Q(('quantity__gt', 0), ('shop_open', True)), fields=['price_rrc', 'info'], name='price_entry_price'),
+        ),
+    ]
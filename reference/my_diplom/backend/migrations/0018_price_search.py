@@ -0,0 +1,86 @@
+from django.db import migrations
+
+# Индекс FTS5 хранит только слова, текст читается из 'backend_priceentry' (content=), а синхронизируют его триггеры.
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE backend_priceentry_fts USING fts5(product_name, model, category_name,"
+    " content='backend_priceentry', content_rowid='info_id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER backend_priceentry_fts_insert AFTER INSERT ON backend_priceentry BEGIN"
+    " INSERT INTO backend_priceentry_fts(rowid, product_name, model, category_name)"
+    " VALUES (new.info_id, new.product_name, new.model, new.category_name); END",
+    "CREATE TRIGGER backend_priceentry_fts_delete AFTER DELETE ON backend_priceentry BEGIN"
+    " INSERT INTO backend_priceentry_fts(backend_priceentry_fts, rowid, product_name, model, category_name)"
+    " VALUES ('delete', old.info_id, old.product_name, old.model, old.category_name); END",
+    "CREATE TRIGGER backend_priceentry_fts_update AFTER UPDATE OF product_name, model, category_name"
+    " ON backend_priceentry WHEN old.product_name IS NOT new.product_name OR old.model IS NOT new.model"
+    " OR old.category_name IS NOT new.category_name BEGIN"
+    " INSERT INTO backend_priceentry_fts(backend_priceentry_fts, rowid, product_name, model, category_name)"
+    " VALUES ('delete', old.info_id, old.product_name, old.model, old.category_name);"
+    " INSERT INTO backend_priceentry_fts(rowid, product_name, model, category_name)"
+    " VALUES (new.info_id, new.product_name, new.model, new.category_name); END",
+    "INSERT INTO backend_priceentry_fts(backend_priceentry_fts) VALUES ('rebuild')",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS backend_priceentry_fts_insert",
+    "DROP TRIGGER IF EXISTS backend_priceentry_fts_delete",
+    "DROP TRIGGER IF EXISTS backend_priceentry_fts_update",
+    "DROP TABLE IF EXISTS backend_priceentry_fts",
+]
+
+# Вычисляемый столбец обновляется самой СУБД при любой записи строки Прайса.
+POSTGRES_CREATE = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "ALTER TABLE backend_priceentry ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('russian'::regconfig, coalesce(product_name, '')), 'A')"
+    " || setweight(to_tsvector('russian'::regconfig, coalesce(model, '')), 'B')"
+    " || setweight(to_tsvector('russian'::regconfig, coalesce(category_name, '')), 'C')) STORED",
+    "CREATE INDEX price_entry_search ON backend_priceentry USING gin (search_vector)"
+    " WHERE shop_open AND quantity > 0",
+    "CREATE INDEX price_entry_name_trgm ON backend_priceentry USING gin (product_name gin_trgm_ops)"
+    " WHERE shop_open AND quantity > 0",
+]
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS price_entry_name_trgm",
+    "DROP INDEX IF EXISTS price_entry_search",
+    "ALTER TABLE backend_priceentry DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def has_fts5(schema_editor):
+    """ Проверяет, что SQLite собран с FTS5. Без него поиск работает без индекса.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return ('ENABLE_FTS5',) in cursor.fetchall()
+
+
+def create_search_index(apps, schema_editor):
+    """ Создаёт полнотекстовый индекс строк Прайса для текущей СУБД и заполняет его.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite' and has_fts5(schema_editor):
+        statements = SQLITE_CREATE
+    elif vendor == 'postgresql':
+        statements = POSTGRES_CREATE
+    else:
+        return
+
+    for sql in statements:
+        schema_editor.execute(sql, params=None)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0017_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
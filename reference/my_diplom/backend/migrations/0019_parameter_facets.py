@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-17 04:34
+
+import re
+
+from django.db import migrations, models
+
+# Копия 'backend.models.NUMERIC_VALUE' на момент миграции.
+NUMERIC_VALUE = re.compile(r'^\s*([-+]?\d+(?:[.,]\d+)?)\s*[^\W\d_]*\.?\s*$')
+
+
+def fill_numeric_values(apps, schema_editor):
+    """ Заполняет числовые значения существующих Значений параметров.
+        Число зависит только от Значения, поэтому каждое различное Значение разбирается один раз.
+    """
+    ProductParameter = apps.get_model('backend', 'ProductParameter')
+    for value in ProductParameter.objects.exclude(value=None).values_list('value', flat=True).distinct().iterator():
+        match = NUMERIC_VALUE.match(value)
+        if match:
+            ProductParameter.objects.filter(value=value).update(numeric_value=float(match.group(1).replace(',', '.')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0018_price_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productparameter',
+            name='numeric_value',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Числовое значение'),
+        ),
+        migrations.AddIndex(
+            model_name='productparameter',
+            index=models.Index(fields=['parameter', 'value', 'product_info'], name='product_parameter_value'),
+        ),
+        migrations.AddIndex(
+            model_name='productparameter',
+            index=models.Index(condition=models.Q(('numeric_value__isnull', False)), fields=['parameter', 'numeric_value', 'product_info'], name='product_parameter_number'),
+        ),
+        migrations.RunPython(fill_numeric_values, migrations.RunPython.noop),
+    ]
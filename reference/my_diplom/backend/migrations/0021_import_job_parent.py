@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-17 05:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0020_catalog_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sections', to='backend.importjob', verbose_name='Задание файла нескольких Магазинов'),
+        ),
+        migrations.AlterField(
+            model_name='importjob',
+            name='shop',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to='backend.shop', verbose_name='Магазин'),
+        ),
+    ]
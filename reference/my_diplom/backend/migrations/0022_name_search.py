@@ -0,0 +1,92 @@
+from django.db import migrations
+
+# Названия Категорий и Магазинов ищутся по вхождению подстроки ('category_name', 'shop_name' в запросах).
+# SQLite: индекс FTS5 с токенизатором 'trigram' (SQLite 3.34+) хранит тройки символов названия.
+NAME_TABLES = ['backend_category', 'backend_shop']
+SQLITE_TRIGRAM_VERSION = (3, 34, 0)
+
+
+def get_sqlite_create(table):
+    fts_table = f'{table}_name_fts'
+    return [
+        f"CREATE VIRTUAL TABLE {fts_table} USING fts5(name, content='{table}', content_rowid='id',"
+        " tokenize='trigram')",
+        f"CREATE TRIGGER {fts_table}_insert AFTER INSERT ON {table} BEGIN"
+        f" INSERT INTO {fts_table}(rowid, name) VALUES (new.id, new.name); END",
+        f"CREATE TRIGGER {fts_table}_delete AFTER DELETE ON {table} BEGIN"
+        f" INSERT INTO {fts_table}({fts_table}, rowid, name) VALUES ('delete', old.id, old.name); END",
+        f"CREATE TRIGGER {fts_table}_update AFTER UPDATE OF name ON {table} WHEN old.name IS NOT new.name BEGIN"
+        f" INSERT INTO {fts_table}({fts_table}, rowid, name) VALUES ('delete', old.id, old.name);"
+        f" INSERT INTO {fts_table}(rowid, name) VALUES (new.id, new.name); END",
+        f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')",
+    ]
+
+
+def get_sqlite_drop(table):
+    fts_table = f'{table}_name_fts'
+    return [
+        f"DROP TRIGGER IF EXISTS {fts_table}_insert",
+        f"DROP TRIGGER IF EXISTS {fts_table}_delete",
+        f"DROP TRIGGER IF EXISTS {fts_table}_update",
+        f"DROP TABLE IF EXISTS {fts_table}",
+    ]
+
+
+# PostgreSQL: триграммный индекс используется условием 'name ILIKE '%...%''.
+def get_postgres_create(table):
+    return [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        f"CREATE INDEX {table}_name_trgm ON {table} USING gin (name gin_trgm_ops)",
+    ]
+
+
+def get_postgres_drop(table):
+    return [f"DROP INDEX IF EXISTS {table}_name_trgm"]
+
+
+def has_trigram_fts5(schema_editor):
+    """ Проверяет, что SQLite собран с FTS5 и знает токенизатор 'trigram'. Без них поиск работает без индекса.
+    """
+    if schema_editor.connection.Database.sqlite_version_info < SQLITE_TRIGRAM_VERSION:
+        return False
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return ('ENABLE_FTS5',) in cursor.fetchall()
+
+
+def create_name_index(apps, schema_editor):
+    """ Создаёт индексы подстрок названий Категорий и Магазинов для текущей СУБД и заполняет их.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite' and has_trigram_fts5(schema_editor):
+        get_statements = get_sqlite_create
+    elif vendor == 'postgresql':
+        get_statements = get_postgres_create
+    else:
+        return
+
+    for table in NAME_TABLES:
+        for sql in get_statements(table):
+            schema_editor.execute(sql, params=None)
+
+
+def drop_name_index(apps, schema_editor):
+    get_statements = {'sqlite': get_sqlite_drop, 'postgresql': get_postgres_drop}.get(schema_editor.connection.vendor)
+    if get_statements is None:
+        return
+
+    for table in NAME_TABLES:
+        for sql in get_statements(table):
+            schema_editor.execute(sql, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0021_import_job_parent'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_name_index, drop_name_index),
+    ]
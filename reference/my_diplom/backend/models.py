@@ -1,6 +1,10 @@
+import re
+
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from backend.price_cache import bump_catalog_version
+
 Salesman = get_user_model()
 
 
@@ -39,6 +43,24 @@ class Contact(models.Model):
         return f'{self.get_short_contact()}. salesman_id: {self.salesman.id}'
 
 
+def has_changed_fields(save_kwargs, *fields):
+    """ Проверяет, что 'save()' с параметрами 'save_kwargs' сохраняет хотя бы одно из полей 'fields'.
+    """
+    update_fields = save_kwargs.get('update_fields')
+    return update_fields is None or bool(set(fields) & set(update_fields))
+
+
+# Число в начале Значения параметра, за которым может идти единица измерения: '256', '6,1', '2.5 кг', '512 ГБ'.
+NUMERIC_VALUE = re.compile(r'^\s*([-+]?\d+(?:[.,]\d+)?)\s*[^\W\d_]*\.?\s*$')
+
+
+def parse_numeric_value(value):
+    """ Возвращает числовое значение характеристики для фильтров диапазона или None, если Значение не число.
+    """
+    match = NUMERIC_VALUE.match(value or '')
+    return float(match.group(1).replace(',', '.')) if match else None
+
+
 class Shop(models.Model):
     """ Магазин.
     """
@@ -54,6 +76,20 @@ class Shop(models.Model):
     buyer = models.OneToOneField(to=Salesman, on_delete=models.SET_NULL, null=True, blank=True, related_name='buyer',
                                  verbose_name='Менеджер по закупкам')
     state = models.CharField(max_length=2, choices=Worked.choices, verbose_name='Приём заказов')
+    feed_hash = models.CharField(max_length=64, blank=True, default='',
+                                 verbose_name='Контрольная сумма последнего загруженного файла')
+    feed_etag = models.CharField(max_length=255, blank=True, default='',
+                                 verbose_name='Заголовок ETag последнего загруженного файла')
+    feed_last_modified = models.CharField(max_length=64, blank=True, default='',
+                                          verbose_name='Заголовок Last-Modified последнего загруженного файла')
+    feed_refreshed_at = models.DateTimeField(null=True, blank=True, verbose_name='Последняя плановая загрузка')
+    drop_dir = models.CharField(max_length=255, blank=True, default='',
+                                verbose_name='Каталог на сервере, в который поставщик выкладывает прайсы')
+    import_lock = models.PositiveIntegerField(null=True, blank=True, verbose_name='Задание, выполняющее загрузку')
+    import_locked_at = models.DateTimeField(null=True, blank=True, verbose_name='Время блокировки загрузки')
+    checkpoint_hash = models.CharField(max_length=64, blank=True, default='',
+                                       verbose_name='Контрольная сумма файла прерванной загрузки')
+    checkpoint_offset = models.PositiveIntegerField(default=0, verbose_name='Товаров записано прерванной загрузкой')
 
     objects = models.Manager()
     DoesNotExist = models.Manager
@@ -77,7 +113,11 @@ class Shop(models.Model):
         else:
             self.state = Shop.Worked.CLOSE
 
-        return super().save(*args, **kwargs)
+        super().save(*args, **kwargs)
+        if has_changed_fields(kwargs, 'name', 'state'):
+            # Название и состояние Магазина хранятся и в строках Прайса.
+            PriceEntry.objects.filter(shop=self).update(shop_name=self.name, shop_open=self.state == Shop.Worked.OPEN)
+            bump_catalog_version()
 
 
 class Category(models.Model):
@@ -98,6 +138,15 @@ class Category(models.Model):
     def __str__(self):
         return f'{self.id}: {self.name}, num={self.catalog_number}'
 
+    def save(self, *args, **kwargs):
+        """ Сохраняет Категорию и её название в строках Прайса.
+        """
+        super().save(*args, **kwargs)
+        if has_changed_fields(kwargs, 'name', 'catalog_number'):
+            PriceEntry.objects.filter(category=self).update(category_name=self.name,
+                                                            category_number=self.catalog_number)
+            bump_catalog_version()
+
 
 class Product(models.Model):
     """ Товар.
@@ -117,6 +166,17 @@ class Product(models.Model):
     def __str__(self):
         return f'{self.id}: {self.name}'
 
+    def save(self, *args, **kwargs):
+        """ Сохраняет Товар, его название и Категорию в строках Прайса.
+        """
+        super().save(*args, **kwargs)
+        if has_changed_fields(kwargs, 'name', 'category'):
+            category = self.category
+            PriceEntry.objects.filter(product=self).update(
+                product_name=self.name, category=category, category_name=category.name if category else '',
+                category_number=category.catalog_number if category else None)
+            bump_catalog_version()
+
 
 class ProductInfo(models.Model):
     """ Описание товара.
@@ -130,6 +190,8 @@ class ProductInfo(models.Model):
     quantity = models.PositiveIntegerField(default=0, verbose_name='Количество')
     price = models.PositiveIntegerField(default=0, verbose_name='Закупочная цена')
     price_rrc = models.PositiveIntegerField(default=0, verbose_name='Рекомендуемая розничная цена')
+    content_hash = models.CharField(max_length=32, blank=True, default='',
+                                    verbose_name='Контрольная сумма содержимого при загрузке')
 
     objects = models.Manager()
     DoesNotExist = models.Manager
@@ -163,6 +225,23 @@ class Parameter(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """ Сохраняет Параметр и его название в характеристиках строк Прайса.
+        """
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if not adding and has_changed_fields(kwargs, 'name'):
+            # Модуль Прайса импортирует модели, поэтому импортируется здесь.
+            from backend.prices import refresh_price_entries
+
+            # Характеристики хранятся в строке Прайса списком, поэтому строки Описаний с Параметром пересобираются.
+            info_ids = list(self.product_parameters.filter(product_info__isnull=False).values_list(
+                'product_info_id', flat=True).distinct())
+            refresh_price_entries(info_ids)
+            if not info_ids:
+                # Названия Параметров есть и в фильтрах Прайса, не только в строках.
+                bump_catalog_version()
+
 
 class ProductParameter(models.Model):
     """ Значение параметра товара.
@@ -172,6 +251,7 @@ class ProductParameter(models.Model):
     parameter = models.ForeignKey(to=Parameter, on_delete=models.CASCADE, related_name='product_parameters',
                                   verbose_name='Название параметра')
     value = models.CharField(max_length=100, null=True, blank=True, verbose_name='Значение параметра')
+    numeric_value = models.FloatField(null=True, blank=True, editable=False, verbose_name='Числовое значение')
 
     objects = models.Manager()
     DoesNotExist = models.Manager
@@ -182,6 +262,20 @@ class ProductParameter(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['product_info', 'parameter'], name='unique_product_parameter'),
         ]
+        # Фильтры Прайса по характеристикам: Описания товаров выбираются из индекса, не читая таблицу.
+        indexes = [
+            models.Index(fields=['parameter', 'value', 'product_info'], name='product_parameter_value'),
+            models.Index(fields=['parameter', 'numeric_value', 'product_info'], name='product_parameter_number',
+                         condition=models.Q(numeric_value__isnull=False)),
+        ]
+
+    def save(self, *args, **kwargs):
+        """ Сохраняет Значение параметра вместе с его числовым значением.
+        """
+        self.numeric_value = parse_numeric_value(self.value)
+        if kwargs.get('update_fields') is not None and 'value' in kwargs['update_fields']:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'numeric_value'}
+        super().save(*args, **kwargs)
 
 
 class Order(models.Model):
@@ -216,6 +310,10 @@ class Order(models.Model):
         verbose_name = 'Заказ'
         verbose_name_plural = 'Список заказов'
         ordering = ['-created_at']
+        # Для постраничного вывода по курсору: сортировка по дате создания дополняется 'id'.
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='order_created'),
+        ]
 
     def __str__(self):
         return str(self.id)
@@ -244,3 +342,177 @@ class OrderItem(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['order', 'product_info'], name='unique_order_item'),
         ]
+
+
+class ImportJob(models.Model):
+    """ Задание на загрузку прайса поставщика.
+        Создаётся при запросе на загрузку и выполняется отдельным процессом 'run_import_worker'.
+    """
+    class State(models.TextChoices):
+        """ Состояния задания. """
+        NEW = 'NE', 'В очереди'
+        RUNNING = 'RN', 'Выполняется'
+        DONE = 'DN', 'Выполнено'
+        FAILED = 'FL', 'Ошибка'
+
+    class Mode(models.TextChoices):
+        """ Режим загрузки. """
+        UPDATE = 'UP', 'Обновление'         # Товары, которых нет в файле, остаются без изменений.
+        SYNC = 'SY', 'Синхронизация'        # Товары, которых нет в файле, снимаются с продажи.
+
+    class Retire(models.TextChoices):
+        """ Способ снятия с продажи товаров, которых нет в файле. """
+        ZERO = 'ZR', 'Обнулить'
+        DELETE = 'DL', 'Удалить'
+
+    # Магазин задания, созданного по запросу на загрузку, определяет обработчик очереди по заголовку файла.
+    shop = models.ForeignKey(to=Shop, on_delete=models.CASCADE, null=True, blank=True, related_name='import_jobs',
+                             verbose_name='Магазин')
+    salesman = models.ForeignKey(to=Salesman, on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='import_jobs', verbose_name='Менеджер по закупкам')
+    parent = models.ForeignKey(to='self', on_delete=models.CASCADE, null=True, blank=True, related_name='sections',
+                               verbose_name='Задание файла нескольких Магазинов')
+    url = models.URLField(max_length=500, null=True, blank=True, verbose_name='Загрузочный файл')
+    file = models.FileField(upload_to='imports/', null=True, blank=True, verbose_name='Загруженный файл')
+    feed_format = models.CharField(max_length=5, blank=True, default='', verbose_name='Формат файла')
+    state = models.CharField(max_length=2, choices=State.choices, default=State.NEW, verbose_name='Состояние')
+    mode = models.CharField(max_length=2, choices=Mode.choices, default=Mode.UPDATE, verbose_name='Режим загрузки')
+    retire = models.CharField(max_length=2, choices=Retire.choices, default=Retire.ZERO,
+                              verbose_name='Снятие с продажи')
+    received = models.PositiveIntegerField(default=0, verbose_name='Получено товаров')
+    skipped = models.PositiveIntegerField(default=0, verbose_name='Пропущено')
+    created = models.PositiveIntegerField(default=0, verbose_name='Загружено')
+    updated = models.PositiveIntegerField(default=0, verbose_name='Обновлено')
+    unchanged = models.PositiveIntegerField(default=0, verbose_name='Без изменений')
+    retired = models.PositiveIntegerField(default=0, verbose_name='Снято с продажи')
+    resumed_from = models.PositiveIntegerField(default=0, verbose_name='Продолжено с товара')
+    feed_unchanged = models.BooleanField(default=False, verbose_name='Файл не изменился')
+    rejected = models.PositiveIntegerField(default=0, verbose_name='С ошибками')
+    message = models.TextField(blank=True, default='', verbose_name='Сообщение')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Начало выполнения')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Окончание выполнения')
+
+    objects = models.Manager()
+    DoesNotExist = models.Manager
+
+    class Meta:
+        verbose_name = 'Задание на загрузку'
+        verbose_name_plural = 'Задания на загрузку'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.id}: {self.shop}, {self.get_state_display()}'
+
+
+class ImportRun(models.Model):
+    """ Замеры одного выполнения Задания на загрузку прайса: время этапов, скорость, SQL-запросы и память.
+    """
+    job = models.ForeignKey(to=ImportJob, on_delete=models.CASCADE, related_name='runs', verbose_name='Задание')
+    state = models.CharField(max_length=2, choices=ImportJob.State.choices, verbose_name='Результат')
+    duration = models.FloatField(default=0, verbose_name='Время выполнения, с')
+    phases = models.JSONField(default=dict, blank=True, verbose_name='Время этапов, с')
+    rows_per_second = models.FloatField(default=0, verbose_name='Товаров в секунду')
+    queries = models.PositiveIntegerField(default=0, verbose_name='SQL-запросов')
+    peak_memory = models.PositiveBigIntegerField(null=True, blank=True, verbose_name='Пиковая память, байт')
+    counters = models.JSONField(default=dict, blank=True, verbose_name='Счётчики загрузки')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата выполнения')
+
+    objects = models.Manager()
+    DoesNotExist = models.Manager
+
+    class Meta:
+        verbose_name = 'Выполнение загрузки'
+        verbose_name_plural = 'Выполнения загрузок'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.id}: задание {self.job_id}, {self.duration:.2f} с'
+
+
+class ImportItemError(models.Model):
+    """ Ошибка товара при выполнении Задания на загрузку прайса.
+    """
+    job = models.ForeignKey(to=ImportJob, on_delete=models.CASCADE, related_name='item_errors',
+                            verbose_name='Задание')
+    external_id = models.CharField(max_length=100, blank=True, default='', verbose_name='Номер по каталогу')
+    message = models.TextField(verbose_name='Сообщение')
+
+    objects = models.Manager()
+    DoesNotExist = models.Manager
+
+    class Meta:
+        verbose_name = 'Ошибка товара'
+        verbose_name_plural = 'Ошибки товаров'
+        ordering = ['id']
+
+    def __str__(self):
+        return f'{self.external_id}: {self.message}'
+
+
+class PriceEntry(models.Model):
+    """ Строка Прайса: предложение Магазина со всеми отображаемыми сведениями в одной таблице.
+        Модель только для чтения: строки пересобираются из Описаний товаров ('backend.prices'),
+        чтобы Прайс отдавался без соединения таблиц и дозагрузки характеристик.
+    """
+    info = models.OneToOneField(to=ProductInfo, on_delete=models.CASCADE, primary_key=True,
+                                related_name='price_entry', verbose_name='Описание товара')
+    product = models.ForeignKey(to=Product, on_delete=models.CASCADE, related_name='+', verbose_name='Товар')
+    product_name = models.CharField(max_length=80, verbose_name='Название товара')
+    model = models.CharField(max_length=80, null=True, blank=True, verbose_name='Модель')
+    catalog_number = models.PositiveIntegerField(verbose_name='Номер по каталогу')
+    category = models.ForeignKey(to=Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+                                 verbose_name='Категория')
+    category_name = models.CharField(max_length=40, blank=True, default='', verbose_name='Название категории')
+    category_number = models.IntegerField(null=True, blank=True, verbose_name='Номер категории по каталогу')
+    shop = models.ForeignKey(to=Shop, on_delete=models.CASCADE, related_name='+', verbose_name='Магазин')
+    shop_name = models.CharField(max_length=50, verbose_name='Название магазина')
+    shop_open = models.BooleanField(default=False, verbose_name='Магазин принимает заказы')
+    quantity = models.PositiveIntegerField(default=0, verbose_name='Количество')
+    price_rrc = models.PositiveIntegerField(default=0, verbose_name='Рекомендуемая розничная цена')
+    parameters = models.JSONField(default=list, blank=True, verbose_name='Характеристики')
+
+    objects = models.Manager()
+    DoesNotExist = models.Manager
+
+    class Meta:
+        verbose_name = 'Строка прайса'
+        verbose_name_plural = 'Строки прайса'
+        ordering = ['info']
+        # Прайс показывает только товары в наличии в открытых Магазинах, поэтому индексы частичные.
+        # Индексы сортировок заканчиваются 'info', как курсор страницы (KeysetPagination).
+        # Полнотекстовый индекс создан миграцией 0018_price_search вне модели ('backend.search'). SQLite пересоздаёт
+        # таблицу при изменении полей и удаляет её триггеры, поэтому такие миграции должны создать их снова.
+        indexes = [
+            models.Index(fields=['info'], name='price_entry_available',
+                         condition=models.Q(shop_open=True, quantity__gt=0)),
+            models.Index(fields=['category', 'info'], name='price_entry_category',
+                         condition=models.Q(shop_open=True, quantity__gt=0)),
+            models.Index(fields=['shop', 'info'], name='price_entry_shop',
+                         condition=models.Q(shop_open=True, quantity__gt=0)),
+            models.Index(fields=['product_name', 'info'], name='price_entry_name',
+                         condition=models.Q(shop_open=True, quantity__gt=0)),
+            models.Index(fields=['price_rrc', 'info'], name='price_entry_price',
+                         condition=models.Q(shop_open=True, quantity__gt=0)),
+        ]
+
+    def __str__(self):
+        return f'{self.product_name}, external_id={self.catalog_number}, {self.shop_name}'
+
+
+class CatalogVersion(models.Model):
+    """ Версия каталога для ключей кэша Прайса: одна строка со счётчиком ('backend.price_cache').
+        Хранится в БД, а не в кэше, чтобы изменение каталога в любом процессе (обработчике очереди загрузок,
+        наблюдении за каталогами) сразу видели все процессы сервера.
+    """
+    version = models.PositiveBigIntegerField(default=0, verbose_name='Версия')
+
+    objects = models.Manager()
+    DoesNotExist = models.Manager
+
+    class Meta:
+        verbose_name = 'Версия каталога'
+        verbose_name_plural = 'Версия каталога'
+
+    def __str__(self):
+        return f'{self.version}'
@@ -0,0 +1,142 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class ImportItemErrorPagination(PageNumberPagination):
+    """ Постраничный вывод ошибок товаров: страницы крупнее общих, размер задаётся параметром 'page_size'.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class KeysetPagination(CursorPagination):
+    """ Курсорная (keyset) пагинация больших списков: курсор хранит значения полей сортировки последней строки
+        страницы, и следующая страница выбирается условием '(поле, id) > (значение, id)' по индексу,
+        без COUNT(*) и OFFSET. Поэтому любая страница стоит столько же, сколько первая, и не сдвигается,
+        если во время просмотра добавляются строки.
+        Сортировка берётся из запроса (order_by или 'ordering' модели) и дополняется первичным ключом.
+        Поля сортировки должны быть полями модели или аннотациями запроса (например, релевантность поиска)
+        без NULL.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.keyset = self.get_keyset(queryset)
+        self.annotations = set(queryset.query.annotations.keys())
+        self.reverse, self.position = self.decode_cursor(request)
+        if self.position is not None:
+            queryset = queryset.filter(self.get_keyset_query(self.position, self.reverse))
+
+        # Страница назад выбирается в обратном порядке и разворачивается.
+        order = [('-' if descending != self.reverse else '') + name for name, _, descending in self.keyset]
+        results = list(queryset.order_by(*order)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = self.position is not None, has_more
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    @staticmethod
+    def get_keyset(queryset):
+        """ Возвращает поля сортировки запроса: [(имя, поле модели или тип аннотации, по убыванию)].
+            Если сортировка не заканчивается уникальным полем, добавляется первичный ключ в том же направлении.
+        """
+        meta, annotations = queryset.model._meta, queryset.query.annotations
+        ordering = queryset.query.order_by or (meta.ordering if queryset.query.default_ordering else ())
+        keyset = []
+        for item in ordering:
+            name = item.lstrip('-')
+            if name in annotations:
+                keyset.append((name, annotations[name].output_field, item.startswith('-')))
+                continue
+            field = meta.pk if name == 'pk' else meta.get_field(name)
+            keyset.append((field.name, field, item.startswith('-')))
+            if field.primary_key or (field.unique and not field.null):
+                return keyset
+
+        keyset.append((meta.pk.name, meta.pk, keyset[-1][2] if keyset else False))
+        return keyset
+
+    def get_keyset_query(self, position, reverse):
+        """ Возвращает условие строк после 'position' (или до неё, если 'reverse') в порядке сортировки:
+            'a >= x AND (a > x OR (a = x AND id > y))'. Первое сравнение позволяет читать индекс с позиции.
+        """
+        query, equal = None, {}
+        for (name, _, descending), value in zip(self.keyset, position):
+            lookup = 'lt' if descending != reverse else 'gt'
+            term = Q(**equal, **{f'{name}__{lookup}': value})
+            query = term if query is None else query | term
+            equal[name] = value
+
+        if len(self.keyset) == 1:
+            return query
+
+        name, _, descending = self.keyset[0]
+        lookup = 'lte' if descending != reverse else 'gte'
+        return Q(**{f'{name}__{lookup}': position[0]}) & query
+
+    def decode_cursor(self, request):
+        """ Разбирает курсор из get-параметра: (назад ли, позиция). Без курсора - первая страница.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            position = cursor['p']
+            if len(position) != len(self.keyset):
+                raise ValueError('Число значений курсора не совпадает с сортировкой.')
+            position = [field.to_python(value) for (_, field, _), value in zip(self.keyset, position)]
+        except (ValueError, TypeError, KeyError, UnicodeError, binascii.Error, DjangoValidationError):
+            raise NotFound('Неверный курсор страницы. Возможно, изменилась сортировка, начните с первой страницы.')
+
+        return bool(cursor.get('r')), position
+
+    def encode_cursor(self, instance, reverse=False):
+        """ Возвращает ссылку на страницу после строки 'instance' (или до неё, если 'reverse').
+            Без строки - ссылку на первую страницу.
+        """
+        if instance is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+
+        # Значения аннотаций (числа) сохраняются как есть, значения полей - в текстовом виде поля.
+        cursor = {'p': [getattr(instance, name) if name in self.annotations else field.value_to_string(instance)
+                        for name, field, _ in self.keyset]}
+        if reverse:
+            cursor['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor, ensure_ascii=False).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1] if self.page else None)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.page[0] if self.page else None, reverse=True)
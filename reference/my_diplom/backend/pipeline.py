@@ -0,0 +1,99 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+
+from backend.feeds import FEED_FORMATS
+
+# Файлы меньшего размера загружаются без пула процессов: запуск процессов дольше самой загрузки.
+PARALLEL_MIN_SIZE = 1024 * 1024
+
+# Номера по каталогу существующих Категорий, передаются в процесс-обработчик при запуске.
+WORKER_CATEGORIES = set()
+
+
+def get_import_workers():
+    """ Возвращает количество процессов для разбора и проверки товаров. По умолчанию - по числу ядер.
+    """
+    return settings.IMPORT_WORKERS or os.cpu_count() or 1
+
+
+def use_pipeline(source):
+    """ Проверяет, стоит ли загружать файл через пул процессов: есть несколько ядер и файл достаточно велик.
+    """
+    if get_import_workers() < 2 or not source.seekable():
+        return False
+
+    position = source.tell()
+    size = source.seek(0, os.SEEK_END)
+    source.seek(position)
+    return size >= PARALLEL_MIN_SIZE
+
+
+def init_worker(categories):
+    """ Подготавливает процесс-обработчик: настраивает Django и запоминает номера Категорий.
+    """
+    global WORKER_CATEGORIES
+    django.setup()
+    WORKER_CATEGORIES = categories
+
+
+def validate_raw_chunk(feed_format, items):
+    """ Разбирает и проверяет пакет товаров в процессе-обработчике.
+        Возвращает результат 'validate_goods()' и текст ошибки разбора файла.
+    """
+    # Модуль с моделями импортируется после 'django.setup()' в 'init_worker()'.
+    from backend.importers import validate_goods
+
+    try:
+        goods = FEED_FORMATS[feed_format][0].parse_raw_goods(items)
+    except Exception as e:
+        return None, f'Ошибка разбора файла: {e}'
+
+    return validate_goods(goods, WORKER_CATEGORIES), ''
+
+
+def run_pipeline(importer, feed, workers, on_chunk=None):
+    """ Загружает товары конвейером. Читатель выдаёт неразобранные товары пакетами, пул процессов
+        разбирает и проверяет их, а текущий процесс последовательно записывает проверенные пакеты в БД.
+        Число пакетов в обработке ограничено, поэтому файл не считывается в память быстрее, чем идёт запись.
+        Пакеты записываются в порядке следования в файле. Товары до контрольной точки прерванной загрузки
+        разбираются в текущем процессе и пропускаются. Ожидание результатов пула относится к этапу 'validate'.
+    """
+    from backend.importers import split_into_chunks
+
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker,
+                             initargs=(set(importer.categories.keys()),)) as pool:
+        pending = deque()
+
+        def write_next():
+            with importer.profiler.phase('validate'):
+                checked, error = pending.popleft().result()
+            if error:
+                raise ValidationError({'detail': [error]})
+            importer.write_chunk(checked)
+            if on_chunk:
+                on_chunk(importer)
+
+        try:
+            raw_goods = iter(feed.iter_raw_goods())
+            with importer.profiler.phase('parse'):
+                for items in split_into_chunks(islice(raw_goods, importer.resume_from), importer.batch_size):
+                    importer.skip_goods(FEED_FORMATS[feed.feed_format][0].parse_raw_goods(items))
+            for items in importer.profiler.timed(split_into_chunks(raw_goods, importer.batch_size), 'parse'):
+                if len(pending) >= workers * 2:
+                    write_next()
+                pending.append(pool.submit(validate_raw_chunk, feed.feed_format, items))
+            while pending:
+                write_next()
+        except BaseException:
+            pool.shutdown(cancel_futures=True)
+            raise
+
+    return importer
@@ -0,0 +1,54 @@
+import hashlib
+import json
+
+from django.apps import apps
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+
+# Первичный ключ единственной строки версии каталога.
+CATALOG_VERSION_PK = 1
+
+
+def get_price_cache():
+    """ Возвращает кэш ответов Прайса (настройка CACHES['prices']).
+    """
+    return caches['prices']
+
+
+def get_catalog_version_model():
+    """ Возвращает модель версии каталога. Модели импортируют этот модуль, поэтому модель не импортируется напрямую.
+    """
+    return apps.get_model('backend', 'CatalogVersion')
+
+
+def get_catalog_version():
+    """ Возвращает версию каталога одним запросом к БД. Если строки версии ещё нет, она создаётся.
+    """
+    return get_catalog_version_model().objects.get_or_create(pk=CATALOG_VERSION_PK)[0].version
+
+
+def set_catalog_version():
+    """ Увеличивает версию каталога: ответы, сохранённые под прежней, больше не читаются.
+        Счётчик увеличивается в БД одним UPDATE, поэтому одновременные изменения из разных процессов не теряются.
+    """
+    model = get_catalog_version_model()
+    if not model.objects.filter(pk=CATALOG_VERSION_PK).update(version=F('version') + 1):
+        model.objects.get_or_create(pk=CATALOG_VERSION_PK, defaults={'version': 1})
+
+
+def bump_catalog_version():
+    """ Меняет версию каталога после фиксации транзакции, чтобы ответ, посчитанный до фиксации,
+        не сохранился в кэше под новой версией.
+    """
+    transaction.on_commit(set_catalog_version)
+
+
+def get_price_cache_key(request):
+    """ Возвращает ключ кэша ответа Прайса: версия каталога, адрес запроса (от него зависят ссылки страниц)
+        и get-параметры, отсортированные и без пустых значений. Версия читается до расчёта ответа.
+    """
+    params = sorted((key, sorted(value for value in request.query_params.getlist(key) if value))
+                    for key in request.query_params.keys())
+    data = [get_catalog_version(), request.build_absolute_uri(request.path), [item for item in params if item[1]]]
+    return 'price:' + hashlib.sha1(json.dumps(data, ensure_ascii=False).encode('utf-8')).hexdigest()
@@ -0,0 +1,65 @@
+from django.conf import settings
+
+from backend.models import PriceEntry, ProductInfo, ProductParameter, Shop
+from backend.price_cache import bump_catalog_version
+
+ENTRY_FIELDS = ['product', 'product_name', 'model', 'catalog_number', 'category', 'category_name', 'category_number',
+                'shop', 'shop_name', 'shop_open', 'quantity', 'price_rrc', 'parameters']
+
+
+def build_price_entries(info_ids):
+    """ Собирает строки Прайса для Описаний товаров 'info_ids' из основных таблиц двумя запросами:
+        Описания с Товаром, Категорией и Магазином и Значения параметров.
+        Описания без Товара или Магазина в Прайс не попадают.
+    """
+    parameters = {}
+    for info_id, name, value in ProductParameter.objects.filter(product_info_id__in=info_ids).order_by(
+            'id').values_list('product_info_id', 'parameter__name', 'value'):
+        parameters.setdefault(info_id, []).append({'parameter': name, 'value': value})
+
+    return [PriceEntry(info_id=info['id'], product_id=info['product_id'], product_name=info['product__name'],
+                       model=info['model'], catalog_number=info['catalog_number'],
+                       category_id=info['product__category_id'], category_name=info['product__category__name'] or '',
+                       category_number=info['product__category__catalog_number'], shop_id=info['shop_id'],
+                       shop_name=info['shop__name'], shop_open=info['shop__state'] == Shop.Worked.OPEN,
+                       quantity=info['quantity'], price_rrc=info['price_rrc'],
+                       parameters=parameters.get(info['id'], []))
+            for info in ProductInfo.objects.filter(id__in=info_ids, product__isnull=False, shop__isnull=False).values(
+                'id', 'product_id', 'product__name', 'model', 'catalog_number', 'product__category_id',
+                'product__category__name', 'product__category__catalog_number', 'shop_id', 'shop__name',
+                'shop__state', 'quantity', 'price_rrc')]
+
+
+def refresh_price_entries(info_ids, batch_size=None):
+    """ Пересобирает строки Прайса для Описаний товаров 'info_ids' пакетами: вставляет новые, обновляет
+        существующие одним запросом upsert и удаляет строки Описаний, которые больше не попадают в Прайс.
+        Вызывается после изменения Описаний товаров или их характеристик в обход сохранения моделей.
+        Меняет версию каталога, поэтому кэшированные ответы Прайса больше не отдаются.
+    """
+    info_ids, batch_size = list(info_ids), batch_size or settings.IMPORT_BATCH_SIZE
+    for pos in range(0, len(info_ids), batch_size):
+        ids = info_ids[pos:pos + batch_size]
+        entries = build_price_entries(ids)
+        if entries:
+            PriceEntry.objects.bulk_create(entries, update_conflicts=True, unique_fields=['info'],
+                                           update_fields=ENTRY_FIELDS)
+        if len(entries) < len(ids):
+            PriceEntry.objects.filter(info_id__in=set(ids) - {entry.info_id for entry in entries}).delete()
+
+    if info_ids:
+        bump_catalog_version()
+
+    return True
+
+
+def rebuild_price_entries(batch_size=None):
+    """ Пересобирает весь Прайс: строки всех Описаний товаров и удаление строк, Описаний которых нет.
+        Нужен после изменений в обход приложения, например, правки характеристик в БД вручную.
+    """
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    PriceEntry.objects.exclude(info_id__in=ProductInfo.objects.values('id')).delete()
+    bump_catalog_version()
+    ids = list(ProductInfo.objects.order_by('id').values_list('id', flat=True))
+    refresh_price_entries(ids, batch_size)
+
+    return len(ids)
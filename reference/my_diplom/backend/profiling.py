@@ -0,0 +1,122 @@
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.db import connection
+
+# Отслеживание памяти общее для процесса: оно запускается первой загрузкой и останавливается последней.
+TRACING_LOCK = threading.Lock()
+TRACING_USERS = 0
+TRACING_STARTED = False
+
+
+class ImportProfiler:
+    """ Замеры выполнения загрузки прайса: время этапов, количество SQL-запросов и пиковая память.
+        Время этапов не пересекается: пока идёт вложенный этап, время внешнего не учитывается.
+        Время вне этапов попадает в этап 'other'. Пиковая память отслеживается по всему процессу,
+        поэтому при одновременных загрузках в потоках ('run_feed_scheduler') она общая для них.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.phases = {}
+        self.current = None
+        self.mark = 0.0
+        self.started = 0.0
+        self.duration = 0.0
+        self.queries = 0
+        self.peak_memory = None
+        self.query_wrapper = None
+
+    def switch(self, name):
+        """ Завершает текущий этап и начинает этап 'name'.
+        """
+        now = time.perf_counter()
+        if self.current is not None:
+            self.phases[self.current] = self.phases.get(self.current, 0.0) + now - self.mark
+        self.current, self.mark = name, now
+
+    @contextmanager
+    def phase(self, name):
+        """ Относит время выполнения блока к этапу 'name'.
+        """
+        previous = self.current
+        self.switch(name)
+        try:
+            yield self
+        finally:
+            self.switch(previous)
+
+    def timed(self, iterable, name):
+        """ Выдаёт элементы последовательности, относя время их получения к этапу 'name'.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def count_query(self, execute, sql, params, many, context):
+        """ Подсчитывает SQL-запросы (см. 'connection.execute_wrapper()').
+        """
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def start(self):
+        """ Начинает замеры.
+        """
+        global TRACING_USERS, TRACING_STARTED
+        if self.trace_memory:
+            with TRACING_LOCK:
+                if not TRACING_USERS:
+                    TRACING_STARTED = not tracemalloc.is_tracing()
+                    if TRACING_STARTED:
+                        tracemalloc.start()
+                    else:
+                        tracemalloc.reset_peak()
+                TRACING_USERS += 1
+        self.query_wrapper = connection.execute_wrapper(self.count_query)
+        self.query_wrapper.__enter__()
+        self.started = time.perf_counter()
+        self.switch('other')
+        return self
+
+    def stop(self):
+        """ Завершает замеры.
+        """
+        self.switch(None)
+        self.duration = time.perf_counter() - self.started
+        self.query_wrapper.__exit__(None, None, None)
+        global TRACING_USERS
+        if self.trace_memory:
+            with TRACING_LOCK:
+                self.peak_memory = tracemalloc.get_traced_memory()[1]
+                TRACING_USERS -= 1
+                if not TRACING_USERS and TRACING_STARTED:
+                    tracemalloc.stop()
+        self.phases = {name: round(value, 4) for name, value in self.phases.items()}
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        return False
+
+
+class NullProfiler:
+    """ Заглушка замеров для загрузки без сбора статистики.
+    """
+
+    @contextmanager
+    def phase(self, name):
+        yield self
+
+    @staticmethod
+    def timed(iterable, name):
+        return iterable
@@ -0,0 +1,125 @@
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+# Полнотекстовый индекс строк Прайса: название товара, модель и Категория (миграция 0018_price_search).
+# SQLite: внешняя таблица FTS5, которую синхронизируют триггеры на 'backend_priceentry'.
+FTS_TABLE = 'backend_priceentry_fts'
+# Веса столбцов FTS5 в bm25(): название, модель, Категория.
+FTS_WEIGHTS = (10.0, 3.0, 1.0)
+# PostgreSQL: вычисляемый столбец 'search_vector' (tsvector с весами A, B, C) и триграммный индекс названия.
+SEARCH_CONFIG = 'russian'
+# Слова запроса: буквы и цифры, не больше MAX_SEARCH_WORDS.
+SEARCH_WORD = re.compile(r'\w+')
+MAX_SEARCH_WORDS = 10
+# Индексы подстрок названий Категорий и Магазинов (миграция 0022_name_search): SQLite - таблица FTS5
+# '<таблица>_name_fts' с токенизатором 'trigram', PostgreSQL - триграммный индекс столбца 'name'.
+# Триграммный индекс находит только подстроки не короче трёх символов.
+NAME_FTS_TABLE = '{}_name_fts'
+MIN_TRIGRAM_LENGTH = 3
+
+
+def get_search_words(text):
+    """ Разбивает поисковый запрос на слова в нижнем регистре.
+    """
+    return SEARCH_WORD.findall(text.lower())[:MAX_SEARCH_WORDS]
+
+
+class PriceSearch:
+    """ Поиск по строкам Прайса: фильтрует запрос по словам и добавляет релевантность 'search_rank'
+        (чем больше, тем лучше). Каждое слово ищется как начало слова в названии, модели или Категории,
+        поэтому поиск работает при наборе запроса. Базовый класс ищет вхождение подстроки без индекса
+        и используется, если индекса нет (другая СУБД или SQLite без FTS5).
+    """
+
+    def filter(self, queryset, words):
+        query = Q()
+        for word in words:
+            query &= Q(product_name__icontains=word) | Q(model__icontains=word) | Q(category_name__icontains=word)
+        return queryset.filter(query).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    def filter_name(self, queryset, text):
+        """ Фильтрует Категории или Магазины по вхождению подстроки в название.
+        """
+        return queryset.filter(name__icontains=text)
+
+
+class SqlitePriceSearch(PriceSearch):
+    """ Поиск по индексу FTS5, присоединённому к строкам Прайса по rowid, релевантность - bm25() с весами столбцов.
+        Таблица FTS5 не описана моделью, поэтому присоединяется через 'extra()': коррелированный подзапрос
+        на каждую строку заново выполнял бы поиск по индексу.
+    """
+
+    def filter(self, queryset, words):
+        match = ' '.join(f'"{word}"*' for word in words)
+        # bm25() отрицательна и меньше у лучших совпадений, поэтому знак меняется.
+        rank = RawSQL(f'-bm25({FTS_TABLE}, {', '.join(map(str, FTS_WEIGHTS))})', [], output_field=FloatField())
+        return queryset.extra(tables=[FTS_TABLE], where=[f'{FTS_TABLE}.rowid = backend_priceentry.info_id',
+                                                         f'{FTS_TABLE} MATCH %s'],
+                              params=[match]).annotate(search_rank=rank)
+
+    def filter_name(self, queryset, text):
+        """ Ищет подстроку названия фразой по индексу FTS5 'trigram', без учёта регистра
+            (в том числе кириллицы, которую не различает LIKE в SQLite).
+        """
+        fts_table = NAME_FTS_TABLE.format(queryset.model._meta.db_table)
+        if len(text) < MIN_TRIGRAM_LENGTH or fts_table not in connection.introspection.table_names():
+            return super().filter_name(queryset, text)
+
+        phrase = '"{}"'.format(text.replace('"', '""'))
+        return queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH %s', [phrase]))
+
+
+class PostgresPriceSearch(PriceSearch):
+    """ Поиск по tsvector с морфологией и по триграммам названия, которые находят слова с опечатками.
+        Релевантность - сумма ts_rank() и сходства слов названия с запросом.
+    """
+
+    def filter(self, queryset, words):
+        tsquery, text = ' & '.join(f'{word}:*' for word in words), ' '.join(words)
+        matched = RawSQL('(backend_priceentry.search_vector @@ to_tsquery(%s::regconfig, %s)'
+                         ' OR %s <%% backend_priceentry.product_name)', [SEARCH_CONFIG, tsquery, text],
+                         output_field=BooleanField())
+        rank = RawSQL('ts_rank(backend_priceentry.search_vector, to_tsquery(%s::regconfig, %s))'
+                      ' + word_similarity(%s, backend_priceentry.product_name)', [SEARCH_CONFIG, tsquery, text],
+                      output_field=FloatField())
+        return queryset.filter(matched).annotate(search_rank=rank)
+
+    def filter_name(self, queryset, text):
+        """ Ищет подстроку названия через ILIKE, которое использует триграммный индекс
+            ('icontains' сравнивает UPPER() столбца, и индекс не подходит).
+        """
+        table = queryset.model._meta.db_table
+        pattern = '%{}%'.format(re.sub(r'([\\%_])', r'\\\1', text))
+        return queryset.filter(RawSQL(f'{table}.name ILIKE %s', [pattern], output_field=BooleanField()))
+
+
+def get_price_search():
+    """ Возвращает поиск для текущей СУБД. Если индекса нет, то поиск подстроки без индекса.
+    """
+    if connection.vendor == 'postgresql':
+        return PostgresPriceSearch()
+    if connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+        return SqlitePriceSearch()
+
+    return PriceSearch()
+
+
+def search_price_entries(queryset, text):
+    """ Возвращает строки Прайса, подходящие под поисковый запрос 'text', с релевантностью 'search_rank'.
+        Запрос без слов ничего не находит.
+    """
+    words = get_search_words(text)
+    if not words:
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    return get_price_search().filter(queryset, words)
+
+
+def filter_by_name(queryset, text):
+    """ Возвращает Категории или Магазины из 'queryset', в названии которых есть подстрока 'text'.
+        Используется индекс подстрок текущей СУБД, если он есть.
+    """
+    return get_price_search().filter_name(queryset, text)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from rest_framework import serializers
@@ -6,9 +7,11 @@ from rest_framework.exceptions import ValidationError, NotFound, ErrorDetail
 from apiauth.validators import pre_check_incoming_fields
 from backend import models
 from backend.forms import ContactHasDiffForm, ShopHasDiffForm
+from backend.importers import describe_counters
+from backend.prices import refresh_price_entries
 from backend.services import (get_transmitted_obj, join_choice_errors, replace_salesmans_errors,
                               get_category_by_name_and_catalog_number, get_category, get_category_by_catalog_number,
-                              get_shop, get_or_create_parameter, set_new_category)
+                              get_shop, get_or_create_parameter, set_new_category, reset_feed_hash)
 from backend.validators import (is_not_salesman, is_permission_updated, is_validate_exists,
                                 get_or_create_product_with_category, add_parameters, is_enough_products)
 
@@ -175,7 +178,9 @@ class ShopSerializer(serializers.ModelSerializer):
         """
         instance.name = validated_data.get('name', instance.name)
         instance.state = validated_data.get('state', instance.state)
-        instance.filename = validated_data.get('filename', instance.filename)
+        if validated_data.get('filename', instance.filename) != instance.filename:
+            # Заголовки 'ETag' и 'Last-Modified' относятся к прежней ссылке.
+            instance.filename, instance.feed_etag, instance.feed_last_modified = validated_data['filename'], '', ''
         instance.seller = validated_data.get('seller', instance.seller)
         instance.buyer = validated_data.get('buyer', instance.buyer)
         categories = validated_data.pop('categories', [])
@@ -392,7 +397,10 @@ class ProductInfoSerializer(serializers.ModelSerializer):
         prod_info = super().create(validated_data)
         for item in product_parameters:
             parameter, created = get_or_create_parameter(item['parameter']['name'])
-            prod_info.parameters.add(parameter, through_defaults={'value': item['value']})
+            prod_info.parameters.add(parameter, through_defaults={
+                'value': item['value'], 'numeric_value': models.parse_numeric_value(item['value'])})
+        reset_feed_hash(prod_info.shop)
+        refresh_price_entries([prod_info.id])
 
         return prod_info
 
@@ -417,29 +425,45 @@ class ProductInfoSerializer(serializers.ModelSerializer):
         if 'product_parameters' in validated_data.keys():
             add_parameters(instance, validated_data['product_parameters'])
 
+        # Описание изменено вручную, при следующей загрузке прайса оно будет перезаписано.
+        instance.content_hash = ''
         instance.save()
+        reset_feed_hash(instance.shop)
+        refresh_price_entries([instance.id])
         return instance
 
 
 class PriceSerializer(serializers.ModelSerializer):
     """ Сериализатор для просмотра Прайса товаров.
+        Читает строку Прайса, поля отображаются так же, как у связанных моделей ('__str__()').
     """
-    product = serializers.StringRelatedField(read_only=True)
-    product_parameters = ParameterAndValueSerializer(read_only=True, many=True)
-    category = serializers.StringRelatedField(source='product.category', read_only=True)
-    shop = serializers.StringRelatedField(read_only=True)
+    info_id = serializers.IntegerField(read_only=True)
+    product = serializers.SerializerMethodField(read_only=True)
+    external_id = serializers.IntegerField(source='catalog_number', read_only=True)
+    price = serializers.IntegerField(source='price_rrc', read_only=True)
+    product_parameters = serializers.JSONField(source='parameters', read_only=True)
+    category = serializers.SerializerMethodField(read_only=True)
+    shop = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
-        model = models.ProductInfo
+        model = models.PriceEntry
         fields = ['info_id', 'product', 'model', 'external_id', 'quantity', 'price', 'product_parameters',
                   'category', 'shop']
-        extra_kwargs = {
-            'info_id': {'source': 'id', 'read_only': True},
-            'model': {'read_only': True},
-            'external_id': {'source': 'catalog_number', 'read_only': True},
-            'quantity': {'read_only': True},
-            'price': {'source': 'price_rrc', 'read_only': True}
-        }
+        read_only_fields = fields
+
+    @staticmethod
+    def get_product(obj):
+        return f'{obj.product_id}: {obj.product_name}'
+
+    @staticmethod
+    def get_category(obj):
+        if obj.category_id is None:
+            return None
+        return f'{obj.category_id}: {obj.category_name}, num={obj.category_number}'
+
+    @staticmethod
+    def get_shop(obj):
+        return f'{obj.shop_id}: {obj.shop_name}'
 
 
 class ShortOrderItemSerializer(serializers.ModelSerializer):
@@ -594,3 +618,65 @@ class OrderSerializer(serializers.ModelSerializer):
             order.product_infos.add(product, through_defaults={'quantity': item['quantity']})
 
         return order
+
+
+class ImportRunSerializer(serializers.ModelSerializer):
+    """ Сериализатор для отображения замеров выполнения Задания на загрузку прайса.
+    """
+    job_id = serializers.IntegerField(read_only=True)
+    shop = serializers.StringRelatedField(source='job.shop', read_only=True)
+    state = serializers.CharField(source='get_state_display', read_only=True)
+
+    class Meta:
+        model = models.ImportRun
+        fields = ['id', 'job_id', 'shop', 'state', 'duration', 'phases', 'rows_per_second', 'queries', 'peak_memory',
+                  'counters', 'created_at']
+        read_only_fields = fields
+
+
+class ImportItemErrorSerializer(serializers.ModelSerializer):
+    """ Сериализатор для отображения ошибки товара Задания на загрузку прайса.
+    """
+
+    class Meta:
+        model = models.ImportItemError
+        fields = ['external_id', 'message']
+        read_only_fields = fields
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    """ Сериализатор для отображения хода выполнения Задания на загрузку прайса.
+    """
+    job_id = serializers.IntegerField(source='id', read_only=True)
+    shop = serializers.StringRelatedField(read_only=True)
+    state = serializers.CharField(source='get_state_display', read_only=True)
+    mode = serializers.CharField(source='get_mode_display', read_only=True)
+    detail = serializers.SerializerMethodField(read_only=True)
+    errors = serializers.SerializerMethodField(read_only=True)
+    runs = ImportRunSerializer(many=True, read_only=True)
+    # Задания разделов Магазинов, если файл оказался файлом нескольких Магазинов.
+    sections = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+    class Meta:
+        model = models.ImportJob
+        fields = ['job_id', 'shop', 'state', 'mode', 'message', 'detail', 'rejected', 'errors', 'feed_unchanged',
+                  'resumed_from', 'created_at', 'started_at', 'finished_at', 'runs', 'sections']
+        read_only_fields = fields
+
+    @staticmethod
+    def get_errors(obj):
+        """ Отображает только первые ошибки товаров, чтобы ответ не рос вместе с файлом.
+            Все ошибки доступны постранично по запросу GET 'upload/<job_id>/errors/'.
+        """
+        if not obj.rejected:
+            return []
+
+        return ImportItemErrorSerializer(instance=obj.item_errors.all()[:settings.IMPORT_RESPONSE_ERRORS],
+                                         many=True).data
+
+    @staticmethod
+    def get_detail(obj):
+        """ Отображает счётчики загрузки так же, как при загрузке прайса.
+        """
+        retired = obj.retired if obj.mode == models.ImportJob.Mode.SYNC else None
+        return describe_counters(obj.received, obj.skipped, obj.created, obj.updated, obj.unchanged, retired)
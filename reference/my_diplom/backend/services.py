@@ -1,12 +1,19 @@
+import re
+
 from django.contrib.auth import get_user_model
 from django.core.exceptions import MultipleObjectsReturned
 from django.db.models import Q
 from rest_framework.exceptions import NotFound, ValidationError
 
-from backend.models import Contact, Shop, ProductInfo, Category, Parameter, Product
+from backend.models import (Contact, Shop, ProductInfo, Category, Parameter, Product, PriceEntry, ProductParameter,
+                            parse_numeric_value)
+from backend.search import filter_by_name, search_price_entries
 
 Salesman = get_user_model()
 
+# Фильтр Прайса по характеристике: 'param[<название>]' или 'param[<название>][<gt|gte|lt|lte>]'.
+PARAMETER_FILTER = re.compile(r'^param\[(?P<name>[^\]]+)\](?:\[(?P<operator>gte|gt|lte|lt)\])?$')
+
 
 def get_contacts(user, pk=0):
     """ Возвращает контакты пользователя из БД.
@@ -71,7 +78,7 @@ def get_shops(shop_view):
         return queryset.filter(categories__catalog_number=category_number)
 
     if category_name:
-        return queryset.filter(categories__name__icontains=category_name)
+        return queryset.filter(categories__in=filter_by_name(Category.objects.all(), category_name))
 
     return queryset
 
@@ -93,6 +100,17 @@ def get_shop(param):
     return shop
 
 
+def reset_feed_hash(shop):
+    """ Сбрасывает контрольную сумму последнего загруженного файла Магазина.
+        Вызывается при изменении товаров Магазина в обход загрузки, чтобы повторная загрузка
+        того же файла не была пропущена.
+    """
+    if shop:
+        Shop.objects.filter(pk=shop.pk).update(feed_hash='')
+
+    return True
+
+
 def join_choice_errors(errors, choice_errors):
     """ Объединяет тексты ошибок Choice-полей.
     """
@@ -194,7 +212,7 @@ def get_products(product_view):
     elif category_number:
         query = Q(category__catalog_number=category_number)
     elif category_name:
-        query = Q(category__name__icontains=category_name)
+        query = Q(category__in=filter_by_name(Category.objects.all(), category_name))
     queryset = queryset if query is None else queryset.filter(query)
 
     shop_id = product_view.request.GET.get('shop_id', '')
@@ -203,7 +221,7 @@ def get_products(product_view):
         return queryset.filter(product_infos__shop__id=shop_id)
 
     if shop_name:
-        return queryset.filter(product_infos__shop__name__icontains=shop_name)
+        return queryset.filter(product_infos__shop__in=filter_by_name(Shop.objects.all(), shop_name))
 
     return queryset
 
@@ -235,7 +253,7 @@ def get_product_infos(product_view):
     elif category_number:
         query = Q(product__category__catalog_number=category_number)
     elif category_name:
-        query = Q(product__category__name__icontains=category_name)
+        query = Q(product__category__in=filter_by_name(Category.objects.all(), category_name))
     queryset = queryset if query is None else queryset.filter(query)
 
     shop_id = product_view.request.GET.get('shop_id', '')
@@ -244,7 +262,7 @@ def get_product_infos(product_view):
         return queryset.filter(shop__id=shop_id)
 
     if shop_name:
-        return queryset.filter(shop__name__icontains=shop_name)
+        return queryset.filter(shop__in=filter_by_name(Shop.objects.all(), shop_name))
 
     return queryset
 
@@ -278,46 +296,100 @@ def converting_products_data(goods_dict, shop_name):
     return content
 
 
+def get_parameter_query(request):
+    """ Возвращает условие на строки Прайса по характеристикам товара из get-параметров или None.
+        '?param[Цвет]=красный&param[Цвет]=синий' - одно из значений,
+        '?param[Встроенная память (Гб)][gte]=256&param[Встроенная память (Гб)][lt]=1024' - диапазон числовых значений.
+        Условия разных характеристик выполняются одновременно. Каждая характеристика выбирает Описания товаров
+        из индекса Значений параметров ('parameter', 'value' или 'numeric_value', 'product_info').
+    """
+    facets, errors = {}, []
+    for key in request.query_params.keys():
+        match = PARAMETER_FILTER.match(key)
+        values = [value for value in request.query_params.getlist(key) if value]
+        if not match or not values:
+            continue
+
+        name, operator = match.group('name').strip(), match.group('operator')
+        if operator:
+            number = parse_numeric_value(values[-1])
+            if number is None:
+                errors.append(f'`{key}={values[-1]}`: ожидается число.')
+                continue
+            facets.setdefault(name, []).append(Q(**{f'numeric_value__{operator}': number}))
+        else:
+            facets.setdefault(name, []).append(Q(value__in=values))
+
+    if errors:
+        raise ValidationError(detail={'param': errors})
+    if not facets:
+        return None
+
+    query = Q()
+    for name, conditions in facets.items():
+        infos = ProductParameter.objects.filter(*conditions, parameter__name=name).values('product_info_id')
+        query &= Q(info__in=infos)
+
+    return query
+
+
 def get_price(self):
     """ Возвращает Прайс, список товаров.
         Регулирует перечень возвращаемых данных в зависимости от запрошенной Категории и Магазина.
+        Прайс читается из одной таблицы строк Прайса, без соединений и дозагрузки характеристик.
+        Названия Категории и Магазина ищутся по индексу подстрок в их таблицах ('filter_by_name()'),
+        а строки Прайса выбираются по индексам.
+        Фильтры по характеристикам товара - см. 'get_parameter_query()'.
     """
-    query = Q(shop__state=Shop.Worked.OPEN) & Q(quantity__gt=0)
+    query = Q(shop_open=True) & Q(quantity__gt=0)
     category_id = self.request.GET.get('category_id', '')
     category_number = self.request.GET.get('category_number', '')
     category_name = self.request.GET.get('category_name', '')
     if category_id:
-        query = query & Q(product__category_id=category_id)
+        query = query & Q(category_id=category_id)
     elif category_number:
-        query = query & Q(product__category__catalog_number=category_number)
+        query = query & Q(category_number=category_number)
     elif category_name:
-        query = query & Q(product__category__name__icontains=category_name)
+        query = query & Q(category__in=filter_by_name(Category.objects.all(), category_name))
 
     shop_id = self.request.GET.get('shop_id', '')
     shop_name = self.request.GET.get('shop_name', '')
     if shop_id:
         query = query & Q(shop_id=shop_id)
     elif shop_name:
-        query = query & Q(shop__name__icontains=shop_name)
-
-    # Фильтруем и отбрасываем дубликаты.
-    queryset = ProductInfo.objects.filter(query).select_related('shop', 'product__category').prefetch_related(
-        'product_parameters__parameter').distinct()
-
-    # Сортируем отображение товаров.
-    sort_param = self.request.GET.get('sort', 'id')
-    if sort_param != 'id' and sort_param != '-id':
-        if sort_param == 'name':
-            sort_param = 'product__name'
-        elif sort_param == '-name':
-            sort_param = '-product__name'
-        elif sort_param == 'min_price':
-            sort_param = 'price_rrc'
-        elif sort_param == 'max_price':
-            sort_param = '-price_rrc'
-        else:
-            # Неизвестные параметры сортировки игнорируются. (Можно возвращать ошибку или предупреждение).
-            sort_param = 'id'
+        query = query & Q(shop__in=filter_by_name(Shop.objects.all(), shop_name))
+
+    parameter_query = get_parameter_query(self.request)
+    if parameter_query is not None:
+        query = query & parameter_query
+
+    # Строка Прайса одна на Описание товара, поэтому дубликатов нет.
+    queryset = PriceEntry.objects.filter(query)
+
+    # Находит Товары по словам названия, модели или Категории: '.../?prod_name=<слова>'.
+    prod_name = self.request.GET.get('prod_name', '')
+    if prod_name:
+        queryset = search_price_entries(queryset, prod_name)
+
+    # Сортируем отображение товаров. Найденные товары по умолчанию сортируются по релевантности.
+    sort_param = self.request.GET.get('sort', 'rank' if prod_name else 'id')
+    if sort_param == 'id':
+        sort_param = 'info'
+    elif sort_param == '-id':
+        sort_param = '-info'
+    elif sort_param == 'name':
+        sort_param = 'product_name'
+    elif sort_param == '-name':
+        sort_param = '-product_name'
+    elif sort_param == 'min_price':
+        sort_param = 'price_rrc'
+    elif sort_param == 'max_price':
+        sort_param = '-price_rrc'
+    elif sort_param == 'rank' and prod_name:
+        sort_param = '-search_rank'
+    else:
+        # Неизвестные параметры сортировки игнорируются. (Можно возвращать ошибку или предупреждение).
+        sort_param = 'info'
 
     queryset = queryset.order_by(sort_param)
 
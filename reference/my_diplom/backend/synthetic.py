@@ -0,0 +1,107 @@
+import csv
+import json
+from itertools import chain
+
+from yaml import dump as dump_yaml
+
+try:
+    from yaml import CDumper as Dumper
+except ImportError:
+    from yaml import Dumper
+
+SYNTHETIC_SHOP = 'Синтетика'
+PARAMETERS = ['Диагональ (дюйм)', 'Встроенная память (Гб)', 'Цвет']
+
+
+def get_parameter_names(parameters_count):
+    """ Возвращает названия характеристик товаров: сначала как в 'data/shop1.yaml', затем пронумерованные.
+    """
+    return PARAMETERS[:parameters_count] + [f'Характеристика {num}'
+                                            for num in range(len(PARAMETERS) + 1, parameters_count + 1)]
+
+
+def get_parameter_value(name, num):
+    """ Возвращает значение характеристики товара с номером 'num'.
+    """
+    if name == PARAMETERS[0]:
+        return 5 + num % 3 + num % 10 / 10
+    if name == PARAMETERS[1]:
+        return 2 ** (5 + num % 5)
+    if name == PARAMETERS[2]:
+        return f'цвет-{num % 12}'
+
+    return f'значение-{num % 20}'
+
+
+def get_synthetic_catalog(goods_count, categories_count=20, parameters_count=3, duplicates=0.0,
+                          shop=SYNTHETIC_SHOP):
+    """ Возвращает синтетический каталог: название Магазина, Категории и генератор товаров.
+        Доля 'duplicates' товаров повторяет предыдущий товар (тот же номер по каталогу и название),
+        повторы распределены по файлу равномерно. Всего выдаётся 'goods_count' товаров вместе с повторами.
+    """
+    categories = [{'id': num, 'name': f'Категория {num}'} for num in range(1, categories_count + 1)]
+    names = get_parameter_names(parameters_count)
+    # Каждый 'step'-й товар - повтор предыдущего.
+    step = round(1 / duplicates) if duplicates > 0 else 0
+
+    def get_good(num):
+        return {'id': num, 'category': num % categories_count + 1, 'model': f'synthetic/model-{num % 500}',
+                'name': f'Товар {num}', 'price': 1000 + num % 9000, 'price_rrc': 1200 + num % 9000,
+                'quantity': num % 50, 'parameters': {name: get_parameter_value(name, num) for name in names}}
+
+    def iter_goods():
+        num = 0
+        for position in range(1, goods_count + 1):
+            if step and position % step == 0 and num:
+                yield get_good(num)
+                continue
+            num += 1
+            yield get_good(num)
+
+    return shop, categories, iter_goods()
+
+
+def write_yaml(f, shop, categories, goods):
+    """ Записывает каталог в формате YAML, как в файле 'data/shop1.yaml'.
+    """
+    f.write(dump_yaml({'shop': shop, 'categories': categories}, Dumper=Dumper, allow_unicode=True, sort_keys=False))
+    f.write('goods:\n')
+    for good in goods:
+        f.write(dump_yaml([good], Dumper=Dumper, allow_unicode=True, sort_keys=False))
+
+
+def write_csv(f, shop, categories, goods):
+    """ Записывает каталог в формате CSV, характеристики - отдельными колонками.
+        Колонки характеристик берутся из первого товара: у синтетических товаров они одинаковые.
+    """
+    names = {category['id']: category['name'] for category in categories}
+    goods = iter(goods)
+    first = next(goods, None)
+    parameters = list(first['parameters'].keys()) if first else []
+    writer = csv.writer(f)
+    writer.writerow(['shop', 'category', 'category_name', 'id', 'model', 'name', 'price', 'price_rrc', 'quantity',
+                     *parameters])
+    for good in chain([first], goods) if first else []:
+        writer.writerow([shop, good['category'], names[good['category']], good['id'], good['model'], good['name'],
+                         good['price'], good['price_rrc'], good['quantity'],
+                         *[good['parameters'].get(name, '') for name in parameters]])
+
+
+def write_jsonl(f, shop, categories, goods):
+    """ Записывает каталог в формате JSON Lines: заголовок и по одному товару в строке.
+    """
+    f.write(json.dumps({'shop': shop, 'categories': categories}, ensure_ascii=False) + '\n')
+    for good in goods:
+        f.write(json.dumps(good, ensure_ascii=False) + '\n')
+
+
+WRITERS = {'yaml': write_yaml, 'csv': write_csv, 'jsonl': write_jsonl}
+
+
+def write_synthetic_feed(path, feed_format='yaml', **options):
+    """ Записывает синтетический файл прайса. Параметры 'options' передаются в 'get_synthetic_catalog()'.
+    """
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        WRITERS[feed_format](f, *get_synthetic_catalog(**options))
+
+    return path
@@ -0,0 +1,45 @@
+import io
+
+from django.test import TestCase
+
+from backend.feeds import open_feed_reader
+from backend.importers import DUPLICATE_MSG
+from backend.jobs import check_feed, import_feed
+from backend.models import Product, ProductInfo, Shop
+
+# Товар без цены повторяется, Чехол указан в двух Категориях.
+FEED = '''shop: Связной
+categories:
+  - {id: 1, name: Смартфоны}
+  - {id: 2, name: Аксессуары}
+goods:
+  - {id: 10, category: 1, model: m10, name: Телефон 10, price_rrc: 120, quantity: 5}
+  - {id: 10, category: 1, model: m10, name: Телефон 10, price_rrc: 120, quantity: 5}
+  - {id: 11, category: 1, model: c11, name: Чехол, price: 10, price_rrc: 20, quantity: 1}
+  - {id: 12, category: 2, model: c12, name: Чехол, price: 10, price_rrc: 20, quantity: 1}
+'''.encode()
+
+
+class DryRunTests(TestCase):
+    """ Проверка файла без записи в БД сообщает о том же, что делает загрузка.
+    """
+
+    def setUp(self):
+        self.shop = Shop.objects.create(name='Связной', state='OP')
+
+    def test_duplicate_warned_once(self):
+        report = check_feed(self.shop, open_feed_reader(io.BytesIO(FEED), 'feed.yaml'))
+        self.assertEqual(report['errors'], {'10': [DUPLICATE_MSG]})
+        # Повтор не загружается, поэтому предупреждение о цене выдаётся только по первому товару.
+        self.assertEqual(report['warnings']['10'], ['price: Цена не указана, будет записан 0.'])
+
+    def test_categories_agree_with_import(self):
+        report = check_feed(self.shop, open_feed_reader(io.BytesIO(FEED), 'feed.yaml'))
+        for external_id in ('11', '12'):
+            self.assertNotIn(external_id, report['errors'])
+            self.assertIn('будет записан в Категорию 2', ' '.join(report['warnings'][external_id]))
+
+        importer = import_feed(self.shop, open_feed_reader(io.BytesIO(FEED), 'feed.yaml'))
+        self.assertEqual(importer.rejected, 1)
+        self.assertEqual(Product.objects.get(name='Чехол').category.catalog_number, 2)
+        self.assertEqual(ProductInfo.objects.filter(shop=self.shop).count(), 3)
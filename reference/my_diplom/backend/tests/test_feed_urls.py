@@ -0,0 +1,280 @@
+import gzip
+import hashlib
+import json
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from backend.fetchers import fetch_feed
+from backend.jobs import refresh_shop_feed, run_import_job
+from backend.models import ImportJob, Salesman, Shop, ProductInfo
+
+YAML_FEED = '''shop: Связной
+categories:
+  - {id: 1, name: Смартфоны}
+goods:
+  - {id: 10, category: 1, model: m10, name: Телефон 10, price: 100, price_rrc: 120, quantity: 5,
+     parameters: {Цвет: синий}}
+  - {id: 11, category: 1, model: m11, name: Телефон 11, price: 200, price_rrc: 220, quantity: 7,
+     parameters: {Цвет: белый}}
+'''.encode()
+CSV_FEED = '''shop,category,category_name,id,model,name,price,price_rrc,quantity,Цвет
+Связной,1,Смартфоны,10,m10,Телефон 10,100,120,5,синий
+Связной,1,Смартфоны,11,m11,Телефон 11,200,220,7,белый
+'''.encode()
+JSONL_FEED = '\n'.join(json.dumps(line, ensure_ascii=False) for line in [
+    {'shop': 'Связной', 'categories': [{'id': 1, 'name': 'Смартфоны'}]},
+    {'id': 10, 'category': 1, 'model': 'm10', 'name': 'Телефон 10', 'price': 100, 'price_rrc': 120, 'quantity': 5,
+     'parameters': {'Цвет': 'синий'}},
+    {'id': 11, 'category': 1, 'model': 'm11', 'name': 'Телефон 11', 'price': 200, 'price_rrc': 220, 'quantity': 7,
+     'parameters': {'Цвет': 'белый'}},
+]).encode()
+MULTI_FEED = YAML_FEED + '''---
+shop: Ситилинк
+categories:
+  - {id: 1, name: Смартфоны}
+goods:
+  - {id: 20, category: 1, model: m20, name: Телефон 20, price: 300, price_rrc: 320, quantity: 9}
+'''.encode()
+
+# Файлы, которые отдаёт локальный сервер: путь - тип содержимого и тело ответа.
+FEEDS = {
+    '/feed.yaml': ('application/yaml', YAML_FEED),
+    '/feed.yaml.gz': ('application/gzip', gzip.compress(YAML_FEED)),
+    '/feed.csv': ('text/csv', CSV_FEED),
+    '/feed.jsonl': ('application/x-ndjson', JSONL_FEED),
+    '/shops.yaml': ('application/yaml', MULTI_FEED),
+}
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    """ Отдаёт файлы прайса из FEEDS с заголовком 'ETag' и считает запросы.
+        На условный запрос с тем же 'ETag' отвечает 304. Путь '/slow.yaml' отдаёт начало файла и замолкает,
+        путь '/broken.yaml' обрывает соединение посреди файла.
+    """
+    requests = []
+    headers_seen = []
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        self.headers_seen.append(dict(self.headers))
+        if self.path in ('/slow.yaml', '/broken.yaml'):
+            self.send_partial()
+            return
+        if self.path not in FEEDS:
+            self.send_error(404)
+            return
+        content_type, body = FEEDS[self.path]
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_partial(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/yaml')
+        self.send_header('Content-Length', str(len(YAML_FEED)))
+        self.end_headers()
+        try:
+            self.wfile.write(YAML_FEED[:100])
+            self.wfile.flush()
+            if self.path == '/slow.yaml':
+                time.sleep(2)
+                self.wfile.write(YAML_FEED[100:])
+        except OSError:
+            # Клиент закрыл соединение, не дождавшись файла.
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FeedServerMixin:
+    """ Запускает локальный HTTP-сервер с файлами прайса на время тестов класса.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FeedHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.media_root = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def get_url(self, path):
+        return f'http://127.0.0.1:{self.server.server_address[1]}{path}'
+
+
+class FeedUrlTests(FeedServerMixin, TestCase):
+    """ Загрузка прайса по ссылке с локального HTTP-сервера.
+    """
+
+    def setUp(self):
+        FeedHandler.requests.clear()
+        FeedHandler.headers_seen.clear()
+        self.user = Salesman.persons.create_user(email='buyer@example.com', password=None, is_active=True)
+        self.shop = Shop.objects.create(name='Связной', buyer=self.user, state='OP')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, path, asynchronous=False, **params):
+        with override_settings(IMPORT_JOBS_ASYNC=asynchronous, MEDIA_ROOT=self.media_root):
+            return self.client.post('/api/v1/backend/upload/', {'url': self.get_url(path), **params}, format='json')
+
+    def assert_imported(self, path):
+        response = self.upload(path)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        goods = ProductInfo.objects.filter(shop=self.shop).order_by('catalog_number')
+        self.assertEqual([(item.catalog_number, item.quantity) for item in goods], [(10, 5), (11, 7)])
+        self.assertEqual(list(self.shop.categories.values_list('name', flat=True)), ['Смартфоны'])
+        # Файл скачивает задание один раз: определение Магазина и загрузка используют сохранённый файл.
+        self.assertEqual(FeedHandler.requests, [path])
+
+    def test_yaml(self):
+        self.assert_imported('/feed.yaml')
+
+    def test_gzip_yaml(self):
+        self.assert_imported('/feed.yaml.gz')
+
+    def test_csv(self):
+        self.assert_imported('/feed.csv')
+
+    def test_jsonl(self):
+        self.assert_imported('/feed.jsonl')
+
+    def test_queued_without_download(self):
+        response = self.upload('/feed.yaml', asynchronous=True)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
+        # Ответ не ждёт скачивания файла: Магазин задания ещё не известен.
+        self.assertEqual(FeedHandler.requests, [])
+        self.assertIsNone(response.data['shop'])
+        job = ImportJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual(self.client.get(f'/api/v1/backend/upload/{job.pk}/').status_code, status.HTTP_200_OK)
+        with override_settings(MEDIA_ROOT=self.media_root):
+            self.assertEqual(run_import_job(job).state, ImportJob.State.DONE, job.message)
+        self.assertEqual(job.shop, self.shop)
+        self.assertEqual(FeedHandler.requests, ['/feed.yaml'])
+        self.assertEqual(ProductInfo.objects.filter(shop=self.shop).count(), 2)
+        self.shop.refresh_from_db()
+        self.assertEqual(self.shop.filename, job.url)
+
+    def test_foreign_shop(self):
+        # Права проверяются в задании по пользователю, создавшему задание.
+        self.shop.buyer = None
+        self.shop.save(update_fields=['buyer'])
+        Shop.objects.create(name='Другой', buyer=self.user, state='OP')
+        response = self.upload('/feed.yaml')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, response.data)
+        self.assertIn('Менеджером по закупкам', response.data['message'])
+        self.assertIsNone(ImportJob.objects.get().shop)
+        self.assertFalse(ProductInfo.objects.exists())
+
+    def test_many_shops(self):
+        # Задания выполняются здесь же, а не в пуле потоков: потоки не видят данных транзакции теста.
+        other = Shop.objects.create(name='Ситилинк', state='OP')
+        self.user.is_staff = True
+        self.user.save(update_fields=['is_staff'])
+        response = self.upload('/shops.yaml', asynchronous=True)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
+        self.assertEqual(FeedHandler.requests, [])
+        with override_settings(MEDIA_ROOT=self.media_root):
+            job = run_import_job(ImportJob.objects.get(pk=response.data['job_id']))
+            self.assertEqual(job.state, ImportJob.State.DONE, job.message)
+            sections = list(job.sections.order_by('pk'))
+            self.assertEqual([section.shop for section in sections], [self.shop, other])
+            for section in sections:
+                self.assertTrue(section.file)
+                self.assertEqual(run_import_job(section).state, ImportJob.State.DONE, section.message)
+        # Файл скачан один раз, задания загружают сохранённые разделы своих Магазинов.
+        self.assertEqual(FeedHandler.requests, ['/shops.yaml'])
+        self.assertEqual(ProductInfo.objects.filter(shop=self.shop).count(), 2)
+        self.assertEqual(list(ProductInfo.objects.filter(shop=other).values_list('catalog_number', flat=True)), [20])
+
+    def test_size_limit(self):
+        with override_settings(FEED_FETCH_MAX_SIZE=64):
+            response = self.upload('/feed.yaml')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ImportJob.objects.get().state, ImportJob.State.FAILED)
+        self.assertFalse(ProductInfo.objects.exists())
+
+
+class FetchFeedTests(FeedServerMixin, TestCase):
+    """ Условные запросы, ограничение времени и обрыв соединения при скачивании файла.
+    """
+
+    def setUp(self):
+        FeedHandler.requests.clear()
+        FeedHandler.headers_seen.clear()
+
+    def test_not_modified(self):
+        user = Salesman.persons.create_user(email='buyer@example.com', password=None, is_active=True)
+        shop = Shop.objects.create(name='Связной', buyer=user, state='OP', filename=self.get_url('/feed.yaml'))
+        with override_settings(MEDIA_ROOT=self.media_root):
+            job = refresh_shop_feed(shop)
+            self.assertEqual(job.state, ImportJob.State.DONE, job.message)
+            shop.refresh_from_db()
+            self.assertTrue(shop.feed_etag)
+            job = refresh_shop_feed(shop)
+        # Второй запрос условный, сервер отвечает 304, и файл не разбирается.
+        self.assertEqual(FeedHandler.headers_seen[1].get('If-None-Match'), shop.feed_etag)
+        self.assertEqual(job.state, ImportJob.State.DONE, job.message)
+        self.assertTrue(job.feed_unchanged)
+        self.assertEqual(job.received, 0)
+        self.assertEqual(ProductInfo.objects.filter(shop=shop).count(), 2)
+
+    def test_conditional_request(self):
+        fetched = fetch_feed(self.get_url('/feed.yaml'))
+        fetched.file.close()
+        fetched = fetch_feed(self.get_url('/feed.yaml'), etag=fetched.etag)
+        self.assertTrue(fetched.not_modified)
+        fetched = fetch_feed(self.get_url('/feed.yaml'))
+        self.assertFalse(fetched.not_modified)
+        fetched.file.close()
+
+    def test_total_timeout(self):
+        # Сервер молчит дольше общего срока, но меньше срока одного чтения.
+        started = time.monotonic()
+        with override_settings(FEED_FETCH_TIMEOUT=5, FEED_FETCH_TOTAL_TIMEOUT=0.5):
+            with self.assertRaises(ValidationError) as error:
+                fetch_feed(self.get_url('/slow.yaml'))
+        self.assertLess(time.monotonic() - started, 1.5)
+        self.assertIn('Превышено время', str(error.exception.detail))
+
+    def test_broken_connection_closes_file(self):
+        files = []
+        temporary_file = tempfile.TemporaryFile
+
+        def create_file(**kwargs):
+            files.append(temporary_file(**kwargs))
+            return files[-1]
+
+        with mock.patch('backend.fetchers.tempfile.TemporaryFile', side_effect=create_file):
+            with self.assertRaises(ValidationError) as error:
+                fetch_feed(self.get_url('/broken.yaml'))
+        self.assertIn('Не удалось загрузить файл', str(error.exception.detail))
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].closed)
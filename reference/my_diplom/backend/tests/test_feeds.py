@@ -0,0 +1,123 @@
+import gzip
+import io
+import shutil
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from backend.feeds import open_feed_reader
+from backend.jobs import run_import_job
+from backend.models import ImportJob, ProductInfo, Salesman, Shop
+from backend.tests.test_feed_urls import CSV_FEED, MULTI_FEED, YAML_FEED
+
+
+class StreamOnly(io.RawIOBase):
+    """ Поток без произвольного доступа, как тело ответа сервера.
+    """
+
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self.data.readinto(buffer)
+
+
+class CsvFeedReaderTests(SimpleTestCase):
+    """ Чтение CSV-файла из потока без произвольного доступа.
+    """
+
+    def test_categories_from_stream(self):
+        feed = open_feed_reader(StreamOnly(CSV_FEED), 'feed.csv')
+        self.assertEqual(feed.feed_format, 'csv')
+        self.assertEqual(feed.header, {'shop': 'Связной', 'categories': [{'id': '1', 'name': 'Смартфоны'}]})
+        self.assertEqual([good['id'] for good in feed.iter_goods()], ['10', '11'])
+        feed.source.close()
+
+
+class CompressedFeedTests(SimpleTestCase):
+    """ Распаковка сжатого файла прайса.
+    """
+
+    def test_gzip_from_stream(self):
+        feed = open_feed_reader(StreamOnly(gzip.compress(YAML_FEED)), 'feed.yaml.gz')
+        self.assertEqual(feed.header['shop'], 'Связной')
+        self.assertEqual([good['id'] for good in feed.iter_goods()], [10, 11])
+        feed.source.close()
+
+    def test_decompressed_size_limit(self):
+        with override_settings(FEED_DECOMPRESSED_MAX_SIZE=len(CSV_FEED) // 2):
+            with self.assertRaises(ValidationError):
+                feed = open_feed_reader(io.BytesIO(gzip.compress(CSV_FEED)), 'feed.csv.gz')
+                list(feed.iter_goods())
+
+
+class YamlDocumentsTests(SimpleTestCase):
+    """ Поиск документов других Магазинов в YAML-файле.
+    """
+
+    def test_scan_on_request(self):
+        feed = open_feed_reader(io.BytesIO(MULTI_FEED), 'shops.yaml', scan_documents=True)
+        self.assertTrue(feed.multi_shop)
+        feed.close()
+
+    def test_header_without_scan(self):
+        # Второй документ большой: без поиска документов читается только начало файла.
+        stream = io.BytesIO(MULTI_FEED + b'---\n' + b'shop: X\ngoods:\n' + b'  - {id: 1}\n' * 50000)
+        feed = open_feed_reader(stream, 'shops.yaml')
+        self.assertFalse(feed.multi_shop)
+        self.assertEqual(feed.header['shop'], 'Связной')
+        self.assertLess(stream.tell(), len(stream.getvalue()) // 10)
+        feed.close()
+
+    def test_more_documents(self):
+        feed = open_feed_reader(io.BytesIO(MULTI_FEED), 'shops.yaml')
+        self.assertEqual([good['id'] for good in feed.iter_goods()], [10, 11])
+        self.assertTrue(feed.more_documents)
+        feed = open_feed_reader(io.BytesIO(YAML_FEED), 'feed.yaml')
+        list(feed.iter_goods())
+        self.assertFalse(feed.more_documents)
+
+
+class ManyShopsUploadTests(TestCase):
+    """ Загрузка файла нескольких Магазинов: документы других Магазинов находит задание, а не запрос.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.user = Salesman.persons.create_user(email='buyer@example.com', password=None, is_active=True,
+                                                 is_staff=True)
+        self.shop = Shop.objects.create(name='Связной', buyer=self.user, state='OP')
+        self.other = Shop.objects.create(name='Ситилинк', state='OP')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, asynchronous=False, **params):
+        file = SimpleUploadedFile('shops.yaml', MULTI_FEED, content_type='application/yaml')
+        with override_settings(IMPORT_JOBS_ASYNC=asynchronous, MEDIA_ROOT=self.media_root):
+            return self.client.post('/api/v1/backend/upload/', {'url': file, **params}, format='multipart')
+
+    def test_dry_run(self):
+        response = self.upload(dry_run='1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(set(response.data['shops'].keys()), {'Связной', 'Ситилинк'})
+        self.assertFalse(ProductInfo.objects.exists())
+
+    def test_import(self):
+        # Задания выполняются здесь же, а не в пуле потоков: потоки не видят данных транзакции теста.
+        response = self.upload(asynchronous=True)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
+        with override_settings(MEDIA_ROOT=self.media_root):
+            parent = run_import_job(ImportJob.objects.get(pk=response.data['job_id']))
+            self.assertEqual(parent.state, ImportJob.State.DONE, parent.message)
+            for section in parent.sections.order_by('pk'):
+                self.assertEqual(run_import_job(section).state, ImportJob.State.DONE, section.message)
+        self.assertEqual(ProductInfo.objects.filter(shop=self.shop).count(), 2)
+        self.assertEqual(ProductInfo.objects.filter(shop=self.other).count(), 1)
@@ -0,0 +1,94 @@
+import base64
+import json
+from urllib.parse import parse_qs, urlsplit
+
+from django.db.models import FloatField
+from django.db.models.functions import Cast, Mod
+from django.test import TestCase
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from backend.models import Category
+from backend.pagination import KeysetPagination
+
+
+def get_cursor(link):
+    """ Возвращает курсор из ссылки на страницу.
+    """
+    return parse_qs(urlsplit(link).query).get('cursor', [''])[0]
+
+
+def make_cursor(data):
+    """ Кодирует произвольные данные так же, как курсор страницы.
+    """
+    return base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode('ascii')
+
+
+class KeysetPaginationTests(TestCase):
+    """ Курсорная пагинация: переходы по страницам, сортировка по аннотации, неверные курсоры
+        и строки, добавленные между запросами страниц.
+    """
+
+    def setUp(self):
+        for number, name in enumerate('ABCDEFG', start=1):
+            Category.objects.create(catalog_number=number, name=name)
+
+    def paginate(self, queryset, cursor=''):
+        params = {'page_size': 3, **({'cursor': cursor} if cursor else {})}
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(queryset, Request(APIRequestFactory().get('/categories/', params)))
+        return page, paginator.get_next_link(), paginator.get_previous_link()
+
+    def get_names(self, cursor=''):
+        page, next_link, previous_link = self.paginate(Category.objects.all(), cursor)
+        return [category.name for category in page], next_link, previous_link
+
+    def test_next_and_previous(self):
+        names, next_link, previous_link = self.get_names()
+        self.assertEqual((names, previous_link), (['A', 'B', 'C'], None))
+        names, next_link, previous_link = self.get_names(get_cursor(next_link))
+        self.assertEqual(names, ['D', 'E', 'F'])
+        names, next_link, last_previous = self.get_names(get_cursor(next_link))
+        self.assertEqual((names, next_link), (['G'], None))
+
+        names, next_link, previous_link = self.get_names(get_cursor(last_previous))
+        self.assertEqual(names, ['D', 'E', 'F'])
+        self.assertIsNotNone(next_link)
+        names, next_link, previous_link = self.get_names(get_cursor(previous_link))
+        self.assertEqual((names, previous_link), (['A', 'B', 'C'], None))
+
+    def test_annotation_ordering(self):
+        # Релевантность с повторами: порядок дополняется первичным ключом, строки не теряются и не повторяются.
+        queryset = Category.objects.annotate(rank=Cast(Mod('catalog_number', 3), FloatField()) / 2).order_by('-rank')
+        expected = list(queryset.order_by('-rank', '-id').values_list('name', flat=True))
+        names, cursor = [], ''
+        while True:
+            page, next_link, _ = self.paginate(queryset, cursor)
+            names += [category.name for category in page]
+            if next_link is None:
+                break
+            cursor = get_cursor(next_link)
+        self.assertEqual(names, expected)
+
+    def test_tampered_cursor(self):
+        # Сортировка по уникальному названию: курсор содержит одно значение.
+        self.assertEqual(self.get_names(make_cursor({'p': ['C']}))[0], ['D', 'E', 'F'])
+        for cursor in ['garbage', make_cursor({'p': ['A', 1]}), make_cursor({'r': 1}), make_cursor([1])]:
+            with self.subTest(cursor=cursor), self.assertRaises(NotFound):
+                self.get_names(cursor)
+        # Значение, которое не приводится к типу поля сортировки.
+        queryset = Category.objects.annotate(rank=Cast(Mod('catalog_number', 3), FloatField())).order_by('-rank')
+        with self.assertRaises(NotFound):
+            self.paginate(queryset, make_cursor({'p': ['x', 1]}))
+
+    def test_rows_inserted_between_pages(self):
+        names, next_link, _ = self.get_names()
+        self.assertEqual(names, ['A', 'B', 'C'])
+        # Строки до курсора не сдвигают следующую страницу, строки после него появятся на своём месте.
+        Category.objects.create(catalog_number=10, name='AA')
+        Category.objects.create(catalog_number=11, name='Z')
+        names, next_link, _ = self.get_names(get_cursor(next_link))
+        self.assertEqual(names, ['D', 'E', 'F'])
+        names, next_link, _ = self.get_names(get_cursor(next_link))
+        self.assertEqual((names, next_link), (['G', 'Z'], None))
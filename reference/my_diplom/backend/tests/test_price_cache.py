@@ -0,0 +1,72 @@
+import io
+
+from django.db import transaction
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from backend.feeds import open_feed_reader
+from backend.jobs import import_feed
+from backend.models import Category, Salesman, Shop
+from backend.price_cache import get_catalog_version, get_price_cache
+from backend.tests.test_feed_urls import YAML_FEED
+
+
+class PriceCacheTests(TestCase):
+    """ Кэш ответов Прайса: версия каталога меняется после фиксации транзакции изменения каталога.
+    """
+
+    def setUp(self):
+        get_price_cache().clear()
+        self.addCleanup(get_price_cache().clear)
+        user = Salesman.persons.create_user(email='user@example.com', password=None, is_active=True)
+        self.shop = Shop.objects.create(name='Связной', seller=user)
+        with self.captureOnCommitCallbacks(execute=True):
+            import_feed(self.shop, open_feed_reader(io.BytesIO(YAML_FEED), 'feed.yaml'))
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def get_category_names(self):
+        response = self.client.get('/api/v1/backend/price/')
+        # Категория отображается как 'id: название, num=номер'.
+        return {row['category'].split(': ', 1)[1].split(',')[0] for row in response.data['results']}
+
+    def test_edit_invalidates_after_commit(self):
+        self.assertEqual(self.get_category_names(), {'Смартфоны'})
+        version = get_catalog_version()
+        category = Category.objects.get(name='Смартфоны')
+        with self.captureOnCommitCallbacks() as callbacks:
+            category.name = 'Телефоны'
+            category.save()
+            # До фиксации версия прежняя, и отдаётся сохранённый ответ.
+            self.assertEqual(get_catalog_version(), version)
+            self.assertEqual(self.get_category_names(), {'Смартфоны'})
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_catalog_version(), version + 1)
+        self.assertEqual(self.get_category_names(), {'Телефоны'})
+
+    def test_import_invalidates(self):
+        self.assertEqual(len(self.client.get('/api/v1/backend/price/').data['results']), 2)
+        version = get_catalog_version()
+        feed = YAML_FEED + '  - {id: 12, category: 1, model: m12, name: Телефон 12, price: 300, price_rrc: 320, ' \
+                           'quantity: 1}\n'.encode()
+        with self.captureOnCommitCallbacks(execute=True):
+            import_feed(self.shop, open_feed_reader(io.BytesIO(feed), 'feed.yaml'))
+        self.assertGreater(get_catalog_version(), version)
+        self.assertEqual(len(self.client.get('/api/v1/backend/price/').data['results']), 3)
+
+    def test_rollback_keeps_version(self):
+        self.get_category_names()
+        version = get_catalog_version()
+        category = Category.objects.get(name='Смартфоны')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    category.name = 'Телефоны'
+                    category.save()
+                    raise RuntimeError('Откат изменения.')
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(get_catalog_version(), version)
+        self.assertEqual(self.get_category_names(), {'Смартфоны'})
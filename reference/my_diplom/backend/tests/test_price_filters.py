@@ -0,0 +1,46 @@
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from backend.models import Category, Parameter, PriceEntry, Salesman, Shop
+from backend.price_cache import get_catalog_version
+
+
+class PriceParameterFilterTests(TestCase):
+    """ Отбор строк Прайса по характеристикам Описаний товаров, созданных через API.
+    """
+
+    def setUp(self):
+        self.admin = Salesman.persons.create_user(email='admin@example.com', password=None, is_active=True,
+                                                  is_staff=True)
+        seller = Salesman.persons.create_user(email='seller@example.com', password=None, is_active=True)
+        Shop.objects.create(name='Связной', seller=seller)
+        Category.objects.create(catalog_number=1, name='Смартфоны')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def create_info(self, external_id, name, memory):
+        response = self.client.post('/api/v1/backend/prod_info/', {
+            'name': name, 'model': name, 'external_id': external_id, 'quantity': 5, 'price': 100, 'price_rrc': 120,
+            'category_number': '1', 'shop_name': 'Связной',
+            'product_parameters': [{'parameter': 'Встроенная память (Гб)', 'value': memory}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+    def test_range_filter(self):
+        self.create_info(10, 'Телефон 128', '128 Гб')
+        self.create_info(11, 'Телефон 512', '512')
+        response = self.client.get('/api/v1/backend/price/', {'param[Встроенная память (Гб)][gte]': '256'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual([row['external_id'] for row in response.data['results']], [11])
+
+    def test_parameter_rename(self):
+        self.create_info(10, 'Телефон 128', '128 Гб')
+        parameter = Parameter.objects.get(name='Встроенная память (Гб)')
+        version = get_catalog_version()
+        parameter.name = 'Память (Гб)'
+        with self.captureOnCommitCallbacks(execute=True):
+            parameter.save(update_fields=['name'])
+        self.assertGreater(get_catalog_version(), version)
+        self.assertEqual(PriceEntry.objects.get().parameters, [{'parameter': 'Память (Гб)', 'value': '128 Гб'}])
+        response = self.client.get('/api/v1/backend/price/', {'param[Память (Гб)]': '128 Гб'})
+        self.assertEqual([row['external_id'] for row in response.data['results']], [10])
@@ -0,0 +1,74 @@
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files import File
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from backend import jobs
+from backend.models import ImportJob, ProductInfo, Salesman, Shop
+
+GOODS_COUNT = 10
+FEED = ('shop: Связной\ncategories:\n  - {id: 1, name: Смартфоны}\ngoods:\n' + ''.join(
+    f'  - {{id: {pk}, category: 1, model: m{pk}, name: Телефон {pk}, price: {pk}0, price_rrc: {pk}5, quantity: 1}}\n'
+    for pk in range(1, GOODS_COUNT + 1))).encode()
+
+
+class Crash(BaseException):
+    """ Аварийное завершение процесса загрузки: не перехватывается обработкой ошибок задания.
+    """
+
+
+@override_settings(IMPORT_BATCH_SIZE=3)
+class ResumeTests(TestCase):
+    """ Продолжение загрузки с контрольной точки после аварийного завершения процесса.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.user = Salesman.persons.create_user(email='buyer@example.com', password=None, is_active=True)
+        self.shop = Shop.objects.create(name='Связной', buyer=self.user, state='OP')
+
+    def test_resume_after_crash(self):
+        save_job_progress, calls = jobs.save_job_progress, []
+
+        def crash_after_two_chunks(job, importer):
+            save_job_progress(job, importer)
+            calls.append(importer.position)
+            if len(calls) == 2:
+                raise Crash()
+            return True
+
+        with override_settings(MEDIA_ROOT=self.media_root):
+            job = jobs.create_import_job(self.shop, self.user, File(io.BytesIO(FEED), name='feed.yaml'))
+            with mock.patch('backend.jobs.save_job_progress', side_effect=crash_after_two_chunks):
+                with self.assertRaises(Crash):
+                    jobs.run_import_job(job)
+
+            # Два пакета записаны и отмечены контрольной точкой, задание осталось "Выполняется".
+            self.shop.refresh_from_db()
+            self.assertEqual(self.shop.checkpoint_offset, 6)
+            self.assertEqual(ProductInfo.objects.filter(shop=self.shop).count(), 6)
+            job.refresh_from_db()
+            self.assertEqual(job.state, ImportJob.State.RUNNING)
+            self.assertTrue(job.file)
+
+            # Процесс завершился, не сняв блокировку: и она, и задание устаревают через IMPORT_LOCK_TIMEOUT,
+            # после чего задание забирается повторно.
+            expired = timezone.now() - timedelta(hours=1)
+            Shop.objects.filter(pk=self.shop.pk).update(import_lock=job.pk, import_locked_at=expired)
+            ImportJob.objects.filter(pk=job.pk).update(started_at=expired)
+            self.assertEqual(jobs.claim_import_job(), job)
+            job = jobs.run_import_job(ImportJob.objects.get(pk=job.pk))
+
+        self.assertEqual(job.state, ImportJob.State.DONE, job.message)
+        self.assertEqual(job.resumed_from, 6)
+        # Записанные до сбоя товары не разбираются и не считаются повторно.
+        self.assertEqual((job.received, job.created, job.updated, job.unchanged), (4, 4, 0, 0))
+        self.assertEqual(ProductInfo.objects.filter(shop=self.shop).count(), GOODS_COUNT)
+        self.shop.refresh_from_db()
+        self.assertEqual((self.shop.checkpoint_hash, self.shop.checkpoint_offset), ('', 0))
@@ -0,0 +1,104 @@
+import importlib
+import io
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from backend.feeds import open_feed_reader
+from backend.jobs import import_feed
+from backend.models import Category, PriceEntry, Salesman, Shop
+from backend.price_cache import get_price_cache
+from backend.search import NAME_FTS_TABLE, PostgresPriceSearch, filter_by_name, search_price_entries
+from backend.tests.test_feed_urls import YAML_FEED
+
+price_search = importlib.import_module('backend.migrations.0018_price_search')
+name_search = importlib.import_module('backend.migrations.0022_name_search')
+
+
+def has_name_index(table):
+    return NAME_FTS_TABLE.format(table) in connection.introspection.table_names()
+
+
+class NameSearchTests(TestCase):
+    """ Фильтры 'category_name' и 'shop_name': подстрока названия ищется по индексу текущей СУБД.
+    """
+
+    def setUp(self):
+        get_price_cache().clear()
+        self.addCleanup(get_price_cache().clear)
+        user = Salesman.persons.create_user(email='user@example.com', password=None, is_active=True)
+        self.shop = Shop.objects.create(name='Связной', seller=user, state='OP')
+        import_feed(self.shop, open_feed_reader(io.BytesIO(YAML_FEED), 'feed.yaml'))
+        Category.objects.create(catalog_number=2, name='Аксессуары для смартфонов')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def get_names(self, text):
+        return sorted(filter_by_name(Category.objects.all(), text).values_list('name', flat=True))
+
+    def test_substring_any_case(self):
+        self.assertEqual(self.get_names('СМАРТФОН'), ['Аксессуары для смартфонов', 'Смартфоны'])
+        self.assertEqual(self.get_names('сессуар'), ['Аксессуары для смартфонов'])
+        # Короче трёх символов ищется без индекса.
+        self.assertEqual(self.get_names('фо'), ['Аксессуары для смартфонов', 'Смартфоны'])
+        self.assertEqual(self.get_names('"; DROP'), [])
+
+    def test_renamed_category(self):
+        Category.objects.filter(name='Смартфоны').update(name='Телефоны')
+        self.assertEqual(self.get_names('телефон'), ['Телефоны'])
+        self.assertEqual(self.get_names('смартфон'), ['Аксессуары для смартфонов'])
+
+    def test_sqlite_index_used(self):
+        # Таблицы тестовой БД создаются после импорта модуля, поэтому индекс проверяется в самом тесте.
+        if not has_name_index('backend_shop'):
+            self.skipTest('Нет индекса FTS5 trigram.')
+        self.assertIn(NAME_FTS_TABLE.format('backend_shop'), str(filter_by_name(Shop.objects.all(), 'связ').query))
+        # Короткая подстрока в индексе не ищется.
+        self.assertNotIn(NAME_FTS_TABLE.format('backend_shop'), str(filter_by_name(Shop.objects.all(), 'св').query))
+
+    def test_price_filters(self):
+        response = self.client.get('/api/v1/backend/price/', {'category_name': 'смартф', 'shop_name': 'СВЯЗН'})
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get('/api/v1/backend/price/', {'category_name': 'аксессуар'})
+        self.assertEqual(response.data['results'], [])
+
+
+class PostgresPriceSearchTests(TestCase):
+    """ Поиск PostgreSQL: запросы и индексы миграций согласованы друг с другом.
+        SQL строится на любой СУБД, выполняется - только на PostgreSQL.
+    """
+
+    def test_search_sql(self):
+        queryset = PostgresPriceSearch().filter(PriceEntry.objects.filter(shop_open=True, quantity__gt=0),
+                                                ['телефон', 'син'])
+        sql = str(queryset.query)
+        self.assertIn("search_vector @@ to_tsquery(russian::regconfig, телефон:* & син:*)", sql)
+        self.assertIn('телефон син <% backend_priceentry.product_name', sql)
+        self.assertIn('word_similarity(телефон син, backend_priceentry.product_name)', sql)
+
+    def test_name_sql(self):
+        sql = str(PostgresPriceSearch().filter_name(Category.objects.all(), '50%_off\\').query)
+        self.assertIn('backend_category.name ILIKE %50\\%\\_off\\\\%', sql)
+
+    def test_indexes_match_queries(self):
+        # Частичные индексы 0018 подходят запросам Прайса, которые всегда содержат эти условия.
+        for sql in price_search.POSTGRES_CREATE[2:]:
+            self.assertTrue(sql.endswith(' WHERE shop_open AND quantity > 0'), sql)
+        self.assertIn("setweight(to_tsvector('russian'::regconfig", price_search.POSTGRES_CREATE[1])
+        self.assertIn('USING gin (product_name gin_trgm_ops)', price_search.POSTGRES_CREATE[3])
+        # Триграммные индексы названий 0022 используются условием ILIKE из 'filter_name()'.
+        for table in name_search.NAME_TABLES:
+            self.assertIn(f'ON {table} USING gin (name gin_trgm_ops)', name_search.get_postgres_create(table)[1])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Только PostgreSQL.')
+    def test_search(self):
+        shop = Shop.objects.create(name='Связной', state='OP')
+        import_feed(shop, open_feed_reader(io.BytesIO(YAML_FEED), 'feed.yaml'))
+        # Слово с морфологией и слово с опечаткой (по триграммам названия).
+        for text in ['телефоны', 'тлефон']:
+            with self.subTest(text=text):
+                self.assertEqual(search_price_entries(PriceEntry.objects.all(), text).count(), 2)
+        self.assertEqual(list(filter_by_name(Shop.objects.all(), 'вЯзН').values_list('name', flat=True)),
+                         ['Связной'])
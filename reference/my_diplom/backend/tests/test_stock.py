@@ -0,0 +1,79 @@
+import io
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from backend.feeds import open_feed_reader
+from backend.importers import update_stock
+from backend.jobs import import_feed
+from backend.models import PriceEntry, ProductInfo, Salesman, Shop
+from backend.tests.test_feed_urls import YAML_FEED
+
+
+class StockUpdateTests(TestCase):
+    """ Изменение остатков и цен товаров Магазина без загрузки прайса.
+        Запрос UPDATE со списком значений ('WITH delta ... UPDATE ... FROM') выполняется на той БД,
+        на которой запущены тесты: SQLite (3.33+) или PostgreSQL.
+    """
+
+    def setUp(self):
+        self.user = Salesman.persons.create_user(email='buyer@example.com', password=None, is_active=True)
+        self.shop = Shop.objects.create(name='Связной', buyer=self.user, state='OP', feed_hash='abc')
+        import_feed(self.shop, open_feed_reader(io.BytesIO(YAML_FEED), 'feed.yaml'))
+        self.info = ProductInfo.objects.get(shop=self.shop, catalog_number=10)
+        # Тот же номер по каталогу в другом Магазине.
+        self.other = Shop.objects.create(name='Ситилинк', state='OP')
+        self.other_info = ProductInfo.objects.create(product=self.info.product, shop=self.other, catalog_number=10,
+                                                     quantity=3, price=90, price_rrc=110)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, goods):
+        return self.client.post('/api/v1/backend/upload/stock/', {'goods': goods}, format='json')
+
+    def get_values(self, catalog_number):
+        return ProductInfo.objects.filter(shop=self.shop, catalog_number=catalog_number).values_list(
+            'quantity', 'price', 'price_rrc', 'content_hash').get()
+
+    def test_counters(self):
+        response = self.post({'10': {'quantity': 1}, '11': {'price': 250}, '99': {'quantity': 1},
+                              'x': {'quantity': 1}, '12': {'quantity': -1}})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['detail'], ['Получено товаров `5`', 'Изменено `2`', 'Не найдено `1`',
+                                                   'С ошибками `2`'])
+        self.assertEqual(response.data['unknown'], [99])
+        self.assertEqual(set(response.data['errors'].keys()), {'x', '12'})
+        # Не указанные поля не меняются, контрольная сумма сбрасывается.
+        self.assertEqual(self.get_values(10), (1, 100, 120, ''))
+        self.assertEqual(self.get_values(11), (7, 250, 220, ''))
+        self.assertEqual(PriceEntry.objects.get(info=self.info).quantity, 1)
+        self.other_info.refresh_from_db()
+        self.assertEqual(self.other_info.quantity, 3)
+        self.shop.refresh_from_db()
+        self.assertEqual(self.shop.feed_hash, '')
+
+    def test_partial_fields_in_batches(self):
+        # В пакете из одного товара столбцы без значений состоят только из NULL: их тип выводит сама БД.
+        with CaptureQueriesContext(connection) as queries:
+            result = update_stock(self.shop, {'10': {'quantity': 0}, '11': {'price_rrc': 230}}, batch_size=1)
+        self.assertEqual(sum(query['sql'].startswith('WITH delta') for query in queries), 2)
+        self.assertEqual((result['matched'], result['unknown'], result['errors']), (2, [], {}))
+        self.assertEqual(self.get_values(10), (0, 100, 120, ''))
+        self.assertEqual(self.get_values(11), (7, 200, 230, ''))
+
+    def test_conflict_while_importing(self):
+        Shop.objects.filter(pk=self.shop.pk).update(import_lock=1, import_locked_at=timezone.now())
+        response = self.post({'10': {'quantity': 1}})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT, response.data)
+        self.assertEqual(self.get_values(10)[0], 5)
+
+        # Устаревшая блокировка прерванной загрузки изменениям не мешает.
+        Shop.objects.filter(pk=self.shop.pk).update(import_locked_at=timezone.now() - timedelta(hours=1))
+        response = self.post({'10': {'quantity': 1}})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(self.get_values(10)[0], 1)
@@ -0,0 +1,93 @@
+import shutil
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from backend.models import ImportJob, Order, OrderItem, ProductInfo, Salesman, Shop
+from backend.tests.test_feed_urls import YAML_FEED
+
+# Тот же прайс без товара 10.
+SHORT_FEED = '''shop: Связной
+categories:
+  - {id: 1, name: Смартфоны}
+goods:
+  - {id: 11, category: 1, model: m11, name: Телефон 11, price: 200, price_rrc: 220, quantity: 7,
+     parameters: {Цвет: белый}}
+'''.encode()
+EMPTY_FEED = '''shop: Связной
+categories:
+  - {id: 1, name: Смартфоны}
+goods: []
+'''.encode()
+
+
+class SyncImportTests(TestCase):
+    """ Загрузка в режиме синхронизации: товары Магазина, которых нет в файле, снимаются с продажи.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.user = Salesman.persons.create_user(email='buyer@example.com', password=None, is_active=True)
+        self.shop = Shop.objects.create(name='Связной', buyer=self.user, state='OP')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.upload(YAML_FEED).status_code, status.HTTP_201_CREATED)
+        self.info = ProductInfo.objects.get(shop=self.shop, catalog_number=10)
+        # Тот же Товар в другом Магазине.
+        self.other = Shop.objects.create(name='Ситилинк', state='OP')
+        self.other_info = ProductInfo.objects.create(product=self.info.product, shop=self.other, catalog_number=10,
+                                                     quantity=3, price=90, price_rrc=110)
+
+    def upload(self, body, **params):
+        file = SimpleUploadedFile('feed.yaml', body, content_type='application/yaml')
+        with override_settings(IMPORT_JOBS_ASYNC=False, MEDIA_ROOT=self.media_root):
+            return self.client.post('/api/v1/backend/upload/', {'url': file, **params}, format='multipart')
+
+    def assert_other_shop_untouched(self):
+        self.other_info.refresh_from_db()
+        self.assertEqual(self.other_info.quantity, 3)
+
+    def test_zero(self):
+        response = self.upload(SHORT_FEED, mode='sync')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.info.refresh_from_db()
+        self.assertEqual((self.info.quantity, self.info.content_hash), (0, ''))
+        self.assertEqual(ProductInfo.objects.get(shop=self.shop, catalog_number=11).quantity, 7)
+        self.assertEqual(ImportJob.objects.latest('pk').retired, 1)
+        self.assert_other_shop_untouched()
+
+    def test_delete(self):
+        response = self.upload(SHORT_FEED, mode='sync', retire='delete')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertFalse(ProductInfo.objects.filter(pk=self.info.pk).exists())
+        self.assertEqual(ImportJob.objects.latest('pk').retired, 1)
+        self.assert_other_shop_untouched()
+
+    def test_delete_keeps_ordered(self):
+        order = Order.objects.create(customer=self.user, state=Order.Status.NEW)
+        OrderItem.objects.create(order=order, product_info=self.info, quantity=1)
+        response = self.upload(SHORT_FEED, mode='sync', retire='delete')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        # Описание товара из Заказа не удаляется, а обнуляется.
+        self.info.refresh_from_db()
+        self.assertEqual(self.info.quantity, 0)
+        self.assertEqual(order.ordered_items.get().product_info, self.info)
+        self.assert_other_shop_untouched()
+
+    def test_update_keeps_missing(self):
+        # Без синхронизации товара нет в файле, но он остаётся в продаже: оставшийся товар не изменился.
+        response = self.upload(SHORT_FEED)
+        self.assertEqual(response.status_code, status.HTTP_208_ALREADY_REPORTED, response.data)
+        self.info.refresh_from_db()
+        self.assertEqual(self.info.quantity, 5)
+
+    def test_empty_feed_refused(self):
+        response = self.upload(EMPTY_FEED, mode='sync', retire='delete')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, response.data)
+        self.assertIn('не сняты с продажи', response.data['message'])
+        self.assertEqual(ProductInfo.objects.filter(shop=self.shop, quantity__gt=0).count(), 2)
+        self.assert_other_shop_untouched()
@@ -28,6 +28,10 @@ urlpatterns = [
     # Работает с товарами.                              http://127.0.0.1:8000/api/v1/backend/product/
     # Работает с описанием товара.                      http://127.0.0.1:8000/api/v1/backend/prod_info/
     path('upload/', views.PartnerUpdate.as_view(), name='upload'),
+    path('upload/<int:job_id>/', views.ImportJobView.as_view(), name='upload_job'),
+    path('upload/<int:job_id>/errors/', views.ImportItemErrorView.as_view(), name='upload_job_errors'),
+    path('upload/stock/', views.StockUpdate.as_view(), name='upload_stock'),
+    path('upload/runs/', views.ImportRunView.as_view(), name='upload_runs'),
     path('price/', views.PriceView.as_view(), name='price'),
     # Работает с корзиной и общим списком заказов.      http://127.0.0.1:8000/api/v1/backend/order/
 ] + router.urls
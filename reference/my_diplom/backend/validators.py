@@ -1,13 +1,19 @@
-from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files import File
+from django.core.files.uploadedfile import UploadedFile
 from django.core.validators import URLValidator
 from django.db.models import Q
-from requests import get
 from rest_framework.exceptions import PermissionDenied, ValidationError, NotFound
-from yaml import load as load_yaml, Loader
 
 from apiauth.services import verify_choices
-from backend.models import Shop, Category, Product, ProductParameter, ProductInfo, Order
-from backend.services import get_category, get_or_create_parameter, get_shop, set_new_category
+from backend.feeds import open_feed_reader
+from backend.fetchers import fetch_feed
+from backend.models import (Shop, Category, Product, ProductParameter, ProductInfo, Order, ImportJob,
+                            parse_numeric_value)
+from backend.prices import refresh_price_entries
+from backend.services import get_category, get_or_create_parameter, get_shop, set_new_category, reset_feed_hash
+
+SOURCE_ERROR_MSG = ['Источник может быть задан ссылкой на интернет-ресурс или файлом с Вашего компьютера, '
+                    'путём выбора его в форме с полем `FileField`.']
 
 
 def is_not_salesman(obj_ser, salesman):
@@ -159,7 +165,8 @@ def add_parameters(prod_info, product_parameters):
             else:    # Если Значение характеристики "item['value']" равно пустому значению "None" или пустой строке "":
                 prod_info.parameters.remove(parameter)
         elif item['value'] and item['value'].replace(" ", ""):
-            prod_info.parameters.add(parameter, through_defaults={'value': item['value']})
+            prod_info.parameters.add(parameter, through_defaults={
+                'value': item['value'], 'numeric_value': parse_numeric_value(item['value'])})
 
     return True
 
@@ -186,6 +193,7 @@ def delete_product_info(product_info):
     is_delete_product = not ProductInfo.objects.exclude(id=product_info.id).filter(product=prod).exists()
     category = product_info.product.category
     shop = product_info.shop
+    reset_feed_hash(shop)
     # Отвязывает Параметры (характеристики) от Описания товара.
     remove_parameters(product_info)
     product_info.delete()
@@ -205,8 +213,93 @@ def delete_product_info(product_info):
     return result
 
 
-def load_yaml_data(request):
-    """ Загружает данные из внешнего источника.
+def retire_product_infos(shop, info_ids, delete=False, batch_size=1000):
+    """ Снимает с продажи Описания товаров Магазина, которых нет в загруженном файле.
+        Это пакетный вариант 'delete_product_info()': Описания Магазина обнуляются или удаляются одним запросом
+        на пакет, затем одним запросом от Магазина отвязываются Категории, в которых у него не осталось Товаров.
+        Описания товаров, входящие в Заказы, не удаляются, а только обнуляются.
+        Товары, Категории и Параметры общие для всех Магазинов, а одновременная загрузка другого Магазина хранит
+        их 'id' в словарях, поэтому оставшиеся без записей справочники здесь не удаляются, их удаляет
+        команда 'clean_catalog'.
+    """
+    info_ids, result = list(info_ids), {'zeroed': 0, 'deleted': 0}
+    for pos in range(0, len(info_ids), batch_size):
+        ids = info_ids[pos:pos + batch_size]
+        if delete:
+            deletable = ProductInfo.objects.filter(id__in=ids, shop=shop, ordered_items__isnull=True)
+            ProductParameter.objects.filter(product_info__in=deletable).delete()
+            result['deleted'] += deletable.delete()[1].get(ProductInfo._meta.label, 0)
+
+        # Сбрасывает контрольную сумму, чтобы товар, вернувшийся в файл, был загружен заново.
+        result['zeroed'] += ProductInfo.objects.filter(id__in=ids, shop=shop).exclude(
+            quantity=0, content_hash='').update(quantity=0, content_hash='')
+        refresh_price_entries(ids, batch_size)
+
+    if delete and result['deleted']:
+        # Если в Магазине больше нет Товаров Категории, то Категория отвязывается от Магазина.
+        shop.categories.remove(*Category.objects.filter(shops=shop).exclude(products__product_infos__shop=shop))
+
+    return result
+
+
+def get_import_options(request):
+    """ Определяет режим загрузки из параметров запроса:
+        'mode' - `update` (по умолчанию) или `sync`, при котором товары, которых нет в файле, снимаются с продажи;
+        'retire' - `zero` (по умолчанию, количество обнуляется) или `delete` (Описания товаров удаляются).
+    """
+    options, errors = {}, {}
+    for param, choices_type in [('mode', ImportJob.Mode), ('retire', ImportJob.Retire)]:
+        value = request.data.get(param) or request.query_params.get(param)
+        if not value:
+            continue
+        value, error = verify_choices(value, choices_type)
+        if error:
+            errors[param] = [error['errors']]
+        options[param] = value
+
+    if errors:
+        raise ValidationError(detail=errors)
+
+    return options
+
+
+def is_dry_run(request):
+    """ Проверяет, запрошена ли только проверка файла без записи в БД: параметр 'dry_run=1'.
+    """
+    value = request.data.get('dry_run') or request.query_params.get('dry_run') or ''
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def validate_source_url(url):
+    """ Проверяет ссылку на ресурс в интернете, не обращаясь к нему.
+    """
+    validate_url = URLValidator()
+    try:
+        validate_url(url)
+    except ValidationError as e:
+        raise ValidationError({'detail': str(e)})
+
+
+def open_source(url):
+    """ Открывает поток данных из внешнего источника.
+        Источник может быть задан ссылкой на ресурс в интернете или загруженным файлом.
+        Возвращает поток, имя источника и тип содержимого, по которым определяется формат файла.
+    """
+    if isinstance(url, str):
+        validate_source_url(url)
+        # Файл скачивается во временный файл с теми же ограничениями размера и времени, что и в заданиях.
+        fetched = fetch_feed(url)
+        return fetched.file, url, fetched.content_type
+
+    if isinstance(url, File):
+        url.open('rb')
+        return url, url.name, getattr(url, 'content_type', '')
+
+    raise ValidationError({'detail': SOURCE_ERROR_MSG})
+
+
+def get_feed_stream(request):
+    """ Открывает поток данных из источника, указанного в запросе.
         Ссылка может указывать как на ресурс в интернете, так и на файл на компьютере.
         При загрузке из файла указать тип данных в запросе Content-Type: 'multipart/form-data'.
     """
@@ -214,36 +307,39 @@ def load_yaml_data(request):
     if not url:
         raise ValidationError({'detail': ['Не задана ссылка на ресурс.']})
 
-    if isinstance(url, str):
-        validate_url = URLValidator()
-        try:
-            validate_url(url)
-        except ValidationError as e:
-            raise ValidationError({'detail': str(e)})
-
-        stream = get(url).content
+    # Файл больше FILE_UPLOAD_MAX_MEMORY_SIZE Django сохраняет на диск ('TemporaryUploadedFile'),
+    # такой файл тоже читается частями, а в хранилище заданий переносится без копирования.
+    if not isinstance(url, (str, UploadedFile)):
+        raise ValidationError({'detail': SOURCE_ERROR_MSG})
 
-    elif isinstance(url, InMemoryUploadedFile):
-        stream = url
+    return open_source(url)
 
-    else:
-        raise ValidationError({'detail': ['Источник может быть задан ссылкой на интернет-ресурс или файлом '
-                                          'с Вашего компьютера, путём выбора его в форме с полем `FileField`.']})
 
-    data = load_yaml(stream=stream, Loader=Loader)    # Здесь можно организовать проверку десериализации.
-
-    return data
+def open_feed(request):
+    """ Открывает источник для потокового чтения.
+        Формат файла (YAML, CSV или JSON Lines) определяется по типу содержимого или расширению файла.
+        Возвращает читателя, у которого заголовок файла (`shop`, `categories`) уже прочитан,
+        а товары выдаются по одному через 'iter_goods()'.
+    """
+    return open_feed_reader(*get_feed_stream(request))
 
 
 def get_shop_obj(request, shop_name):
     """ Проверяет, что магазин существует и пользователю можно выполнить загрузку.
     """
+    return get_user_shop(request.user, shop_name)
+
+
+def get_user_shop(user, shop_name):
+    """ Проверяет, что магазин существует и пользователю 'user' можно выполнить загрузку.
+        Используется и обработчиком очереди: права проверяются по пользователю, создавшему задание.
+    """
     shop = get_shop(shop_name)
     if not shop:
         raise NotFound(detail={'shop': [f'Магазин с названием `{shop_name}` не существует.']})
 
     # Загружать новый товар разрешено "Менеджерам по закупкам" своего магазина.
-    if not bool(request.user and ((shop.buyer == request.user) or request.user.is_staff or request.user.is_superuser)):
+    if not bool(user and ((shop.buyer == user) or user.is_staff or user.is_superuser)):
         raise PermissionDenied(detail={'detail': f'Вы не являетесь `Менеджером по закупкам` магазина `{shop_name}`.'})
 
     return shop
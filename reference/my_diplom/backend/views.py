@@ -1,22 +1,41 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import transaction
+from django.db.models import Q
 from rest_framework import viewsets, status, generics, views
 from rest_framework.decorators import action
 from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.filters import SearchFilter
-from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
 from backend import models, serializers
-from backend.filters import OrderFilter
+from backend.feeds import iter_shop_sections, open_feed_reader
+from backend.filters import ImportRunFilter, OrderFilter
+from backend.importers import update_stock
+from backend.jobs import check_feed, create_import_job, hold_idle_shop, run_import_job, run_import_jobs
+from backend.pagination import ImportItemErrorPagination, KeysetPagination
+from backend.price_cache import bump_catalog_version, get_price_cache, get_price_cache_key
 from backend.permissions import IsAdminOrReadOnly, ShopPermission, IsBuyer
 from backend.services import (get_contacts, get_short_contacts, get_shops, get_shop, get_category, get_products,
-                              get_product_infos, converting_categories_data, converting_products_data, get_price)
-from backend.validators import validate_categories, delete_product_info, load_yaml_data, get_shop_obj, get_state_orders
+                              get_product_infos, converting_categories_data, get_price)
+from backend.validators import (validate_categories, delete_product_info, open_feed, get_shop_obj,
+                                get_state_orders, get_import_options, is_dry_run, validate_source_url)
 
 Salesman = get_user_model()
 
 
+class CatalogChangeMixin:
+    """ Меняет версию каталога после успешного изменяющего запроса, чтобы кэш Прайса не отдавал
+        ответы, посчитанные до изменения (в том числе удалений, которые не проходят через строки Прайса).
+    """
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method not in SAFE_METHODS and status.is_success(response.status_code):
+            bump_catalog_version()
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
 class ContactModelView(viewsets.ModelViewSet):
     """ Класс для создания, просмотра, изменения и удаления Контакта пользователя.
     """
@@ -59,7 +78,7 @@ class ContactsListView(viewsets.GenericViewSet):
         return Response(data=salesmans_list, status=status.HTTP_200_OK)
 
 
-class ShopView(viewsets.ModelViewSet):
+class ShopView(CatalogChangeMixin, viewsets.ModelViewSet):
     """ Класс для создания, просмотра, изменения и удаления Магазина.
     """
     queryset = models.Shop.objects.all()
@@ -165,7 +184,7 @@ class ShopView(viewsets.ModelViewSet):
         return Response(data={**content, 'shop': serializers.ShopSerializer(instance=shop).data}, status=state)
 
 
-class CategoryView(viewsets.ModelViewSet):
+class CategoryView(CatalogChangeMixin, viewsets.ModelViewSet):
     """ Класс для создания, просмотра, изменения и удаления Категории.
     """
     queryset = models.Category.objects.all()
@@ -214,12 +233,13 @@ class CategoryView(viewsets.ModelViewSet):
                         status=state)
 
 
-class ProductView(viewsets.ModelViewSet):
+class ProductView(CatalogChangeMixin, viewsets.ModelViewSet):
     """ Класс для создания, просмотра, изменения и удаления Товара.
     """
     queryset = models.Product.objects.all()
     serializer_class = serializers.ProductSerializer
     permission_classes = [IsAdminOrReadOnly]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """ Изменяет перечень возвращаемых данных.
@@ -240,12 +260,13 @@ class ProductView(viewsets.ModelViewSet):
         return Response(data={'detail': [f'Товар с id={pk} удалён.']}, status=status.HTTP_204_NO_CONTENT)
 
 
-class ProductInfoView(viewsets.ModelViewSet):
+class ProductInfoView(CatalogChangeMixin, viewsets.ModelViewSet):
     """ Класс для создания, просмотра, изменения и удаления Описания товара.
     """
     queryset = models.ProductInfo.objects.all()
     serializer_class = serializers.ProductInfoSerializer
     permission_classes = [IsAdminUser]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """ Изменяет перечень возвращаемых данных.
@@ -268,70 +289,233 @@ class ProductInfoView(viewsets.ModelViewSet):
 
 class PartnerUpdate(views.APIView):
     """ Класс для обновления прайса от поставщика.
+        Версию каталога меняет само задание после фиксации записанных товаров ('refresh_price_entries()'),
+        а не ответ на запрос: задание из очереди выполняется уже после ответа.
     """
     permission_classes = [IsBuyer]
 
     def post(self, request, *args, **kwargs):
-        """ Загружает новый товар.
+        """ Ставит в очередь загрузку нового товара.
+            Загрузку выполняет отдельный процесс 'python manage.py run_import_worker',
+            ход загрузки можно узнать по запросу: GET 'http://127.0.0.1:8000/api/v1/backend/upload/<job_id>/'.
+            Ответ содержит счётчики, время этапов и первые ошибки товаров (IMPORT_RESPONSE_ERRORS),
+            все ошибки доступны постранично: GET '.../upload/<job_id>/errors/?page=<n>&page_size=<size>'.
+            С параметром 'mode=sync' товары Магазина, которых нет в файле, снимаются с продажи:
+            обнуляется их количество или, с параметром 'retire=delete', они удаляются.
+            Кроме YAML принимаются файлы CSV и JSON Lines, формат определяется по Content-Type или расширению файла.
+            Файлы, сжатые gzip, bzip2 или zip, распаковываются на лету.
+            С параметром 'dry_run=1' файл только проверяется целиком и возвращается отчёт, в БД ничего не записывается.
+            Файл YAML может содержать прайсы нескольких Магазинов: каждый раздел загружается отдельным заданием
+            своего Магазина (см. 'split_import_job()').
         """
-        data = load_yaml_data(request)
-
-        shop_obj = get_shop_obj(request, data['shop'])
-        shop_obj.filename = request.data.get('url')
-        shop_obj.save(update_fields=['filename'])
-        if 'categories' in data.keys():
-            # Выделяет Категории, которых нет, подготавливает данные и сохраняет через сериализатор.
-            categories_data = converting_categories_data(data['categories'])
-            if categories_data:
-                category_ser = serializers.CategorySerializer(data=categories_data, many=True)
-                category_ser.is_valid(raise_exception=True)
-                category_ser.save()
-
-        setattr(self, 'action', 'create')
-        # Подготавливает данные к сохранению Описания товара через сериализатор.
-        products_data = converting_products_data(data['goods'], shop_obj.name)
-        products, all_num, new_num, skip_num, errors = [], len(products_data), 0, 0, {}
-        for prod_data in products_data:
-            # Товары сохраняются в БД по одному.
-            # При ошибке пропустится сохранение только ошибочного Товара, а не всего пакета.
-            product_ser = serializers.ProductInfoSerializer(data=prod_data, context={'view': self})
-            if product_ser.is_valid():
-                try:
-                    product_ser.save()
-                except ValidationError as e:
-                    errors[f'{prod_data['external_id']}'] = str(e)
-                    skip_num += 1
-                else:
-                    products.append(product_ser.data)
-                    new_num += 1 if product_ser.context.pop('created', False) else 0
-            else:
-                if 'prod_info_err' in product_ser.errors.keys():
-                    errors[f'{prod_data['external_id']}'] = str(product_ser.errors['prod_info_err'][0])
-                else:
-                    errors[f'{prod_data['external_id']}'] = str(product_ser.errors)
-                skip_num += 1
+        options = get_import_options(request)
+        url = request.data.get('url')
+        if isinstance(url, str) and not is_dry_run(request):
+            # Файл по ссылке скачивает задание в обработчике очереди: ответ не ждёт скачивания файла,
+            # а Магазин и права пользователя проверяются по заголовку скачанного файла.
+            validate_source_url(url)
+            job = create_import_job(None, request.user, url, **options)
+            return self.get_job_response(job)
+
+        feed = open_feed(request)
+        if feed.multi_shop:
+            feed.close()
+            try:
+                if is_dry_run(request):
+                    return self.check_shops(request, feed.source)
+                # Разделы Магазинов выделяет и проверяет задание (см. 'split_import_job()').
+                job = create_import_job(None, request.user, url, feed_format=feed.feed_format, **options)
+            finally:
+                if isinstance(url, str):
+                    feed.source.close()
+            return self.get_job_response(job)
+
+        try:
+            # Заголовок файла нужен, чтобы проверить Магазин и права пользователя.
+            shop_obj = get_shop_obj(request, feed.header.get('shop'))
+            if is_dry_run(request):
+                report = check_feed(shop_obj, feed)
+                if feed.more_documents:
+                    # Документы других Магазинов замечаются только после проверки первого документа,
+                    # файл не просматривается заранее.
+                    return self.check_shops(request, feed.source)
+                return Response(data={'message': 'Проверка выполнена, в БД ничего не записано.', **report},
+                                status=status.HTTP_200_OK)
+            feed.close()
+            # Магазин задания определяется по заголовку файла ещё раз в обработчике очереди:
+            # там же файл проверяется на документы других Магазинов.
+            job = create_import_job(None, request.user, url, feed_format=feed.feed_format, **options)
+        finally:
+            feed.close()
+            if isinstance(url, str):
+                feed.source.close()
+
+        return self.get_job_response(job)
 
-        if all_num == 0:
-            return Response(data=[{'detail': ['У этого источника пустой список товаров.']}],
-                            status=status.HTTP_204_NO_CONTENT)
+    @staticmethod
+    def get_job_response(job):
+        """ Возвращает ответ на запрос загрузки: задание поставлено в очередь или, если задания
+            не выполняются отдельным процессом (IMPORT_JOBS_ASYNC), результат загрузки.
+            Задание файла нескольких Магазинов загружает разделы отдельными заданиями ('get_sections_response()').
+        """
+        if not settings.IMPORT_JOBS_ASYNC:
+            # Загрузка выполняется сразу, в процессе обработки запроса.
+            job = run_import_job(job, wait=settings.IMPORT_LOCK_WAIT)
+            sections = list(job.sections.select_related('shop'))
+            if sections:
+                return PartnerUpdate.get_sections_response(sections)
+            state = status.HTTP_201_CREATED
+            if job.state == models.ImportJob.State.FAILED:
+                state = status.HTTP_400_BAD_REQUEST
+            elif job.feed_unchanged:
+                state = status.HTTP_208_ALREADY_REPORTED
+            elif job.received == 0:
+                state = status.HTTP_204_NO_CONTENT
+            elif job.received == job.unchanged and not job.retired:
+                state = status.HTTP_208_ALREADY_REPORTED
+            return Response(data=serializers.ImportJobSerializer(instance=job).data, status=state)
+
+        return Response(data={**serializers.ImportJobSerializer(instance=job).data,
+                              'message': 'Загрузка поставлена в очередь.'}, status=status.HTTP_202_ACCEPTED)
 
-        msg = [f'Получено товаров `{all_num}`', f'Пропущено `{skip_num}`', f'Загружено `{new_num}`']
-        if all_num == skip_num:
-            return Response(data=[{'detail': ['Возможно, этот файл уже загружен.'] + msg}] + [errors],
-                            status=status.HTTP_208_ALREADY_REPORTED)
+    @staticmethod
+    def get_sections_response(jobs):
+        """ Загружает разделы файла нескольких Магазинов одновременно (IMPORT_SHOP_WORKERS).
+            Ответ содержит результат по каждому Магазину: 201 - все загружены, 207 - часть, 400 - ни один.
+        """
+        jobs = run_import_jobs(jobs, wait=settings.IMPORT_LOCK_WAIT)
+        failed = sum(job.state == models.ImportJob.State.FAILED for job in jobs)
+        state = status.HTTP_201_CREATED
+        if failed == len(jobs):
+            state = status.HTTP_400_BAD_REQUEST
+        elif failed:
+            state = status.HTTP_207_MULTI_STATUS
 
-        return Response(data=[{'detail': ['Загрузка выполнена.'] + msg}] + products, status=status.HTTP_201_CREATED)
+        return Response(data={'message': f'Загружено Магазинов `{len(jobs) - failed}` из `{len(jobs)}`.',
+                              'detail': [f'Магазин `{job.shop.name}`: {job.message or job.get_state_display()}'
+                                         for job in jobs],
+                              'shops': serializers.ImportJobSerializer(instance=jobs, many=True).data},
+                        status=state)
+
+    @staticmethod
+    def check_shops(request, source):
+        """ Проверяет файл нескольких Магазинов: документы, разделённые строкой '---', или список Магазинов.
+            Каждый раздел проверяется для своего Магазина, в БД ничего не записывается.
+        """
+        source.seek(0)
+        files, sections = [], []
+        try:
+            for shop_name, file in iter_shop_sections(source):
+                files.append(file)
+                shop_obj = get_shop_obj(request, shop_name)
+                if any(shop_obj == shop for shop, _ in sections):
+                    raise ValidationError({'shop': [f'Раздел Магазина `{shop_name}` указан в файле дважды.']})
+                sections.append((shop_obj, file))
+            if not sections:
+                raise ValidationError({'detail': ['В файле нет разделов Магазинов.']})
+
+            reports = {shop_obj.name: check_feed(shop_obj, open_feed_reader(file, feed_format='yaml'))
+                       for shop_obj, file in sections}
+        finally:
+            for file in files:
+                file.close()
+
+        return Response(data={'message': 'Проверка выполнена, в БД ничего не записано.', 'shops': reports},
+                        status=status.HTTP_200_OK)
+
+
+class StockUpdate(CatalogChangeMixin, views.APIView):
+    """ Класс для массового изменения остатков и цен товаров Магазина.
+    """
+    permission_classes = [IsBuyer]
+
+    def post(self, request, *args, **kwargs):
+        """ Изменяет остатки и цены товаров одного Магазина без загрузки всего прайса.
+            Данные: {"shop": <название или id>, "goods": {"<external_id>": {"quantity": 5, "price": 100,
+            "price_rrc": 120}, ...}}. Поля товара необязательны, не указанные не меняются.
+            Менеджер по закупкам может не указывать `shop`, тогда используется его Магазин.
+            Пока выполняется загрузка прайса этого Магазина, возвращается 409.
+        """
+        shop_name = request.data.get('shop') or getattr(getattr(request.user, 'buyer', None), 'name', None)
+        if not shop_name:
+            raise ValidationError({'shop': ['Не указан Магазин.']})
+        shop_obj = get_shop_obj(request, shop_name)
+        goods = request.data.get('goods')
+        if not isinstance(goods, dict) or not goods:
+            raise ValidationError({'goods': ['Ожидается словарь `{external_id: {quantity, price, price_rrc}}`.']})
+
+        with transaction.atomic():
+            # Загрузка прайса перезаписала бы остатки из файла, поэтому остатки не меняются, пока она выполняется.
+            if not hold_idle_shop(shop_obj):
+                return Response(data={'detail': ['Выполняется загрузка прайса Магазина, повторите запрос позже.']},
+                                status=status.HTTP_409_CONFLICT)
+            result = update_stock(shop_obj, goods)
+        content = [f'Получено товаров `{result['received']}`', f'Изменено `{result['matched']}`',
+                   f'Не найдено `{len(result['unknown'])}`', f'С ошибками `{len(result['errors'])}`']
+        return Response(data={'detail': content, 'unknown': result['unknown'], 'errors': result['errors']},
+                        status=status.HTTP_200_OK)
+
+
+class ImportJobView(generics.RetrieveAPIView):
+    """ Класс для просмотра хода выполнения Задания на загрузку прайса.
+    """
+    queryset = models.ImportJob.objects.all()
+    serializer_class = serializers.ImportJobSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_url_kwarg = 'job_id'
+
+    def get_queryset(self):
+        """ Менеджеру по закупкам доступны задания его Магазина и созданные им задания,
+            администраторам - все задания.
+        """
+        if self.request.user.is_staff or self.request.user.is_superuser:
+            return self.queryset
+
+        return self.queryset.filter(Q(shop__buyer=self.request.user) | Q(salesman=self.request.user))
+
+
+class ImportItemErrorView(generics.ListAPIView):
+    """ Класс для постраничного просмотра ошибок товаров Задания на загрузку прайса.
+    """
+    serializer_class = serializers.ImportItemErrorSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = ImportItemErrorPagination
+
+    def get_queryset(self):
+        """ Менеджеру по закупкам доступны ошибки заданий его Магазина, администраторам - всех заданий.
+        """
+        jobs = models.ImportJob.objects.all()
+        if not (self.request.user.is_staff or self.request.user.is_superuser):
+            jobs = jobs.filter(Q(shop__buyer=self.request.user) | Q(salesman=self.request.user))
+        job = generics.get_object_or_404(jobs, pk=self.kwargs['job_id'])
+
+        return job.item_errors.all()
+
+
+class ImportRunView(generics.ListAPIView):
+    """ Класс для просмотра истории загрузок прайсов: время этапов, скорость, SQL-запросы и память.
+    """
+    queryset = models.ImportRun.objects.select_related('job__shop')
+    serializer_class = serializers.ImportRunSerializer
+    permission_classes = [IsAuthenticated]
+    filterset_class = ImportRunFilter
+
+    def get_queryset(self):
+        """ Менеджеру по закупкам доступны загрузки его Магазина, администраторам - все загрузки.
+        """
+        if self.request.user.is_staff or self.request.user.is_superuser:
+            return self.queryset
+
+        return self.queryset.filter(job__shop__buyer=self.request.user)
 
 
 class PriceView(generics.ListAPIView):
     """ Класс для просмотра Прайса (списка товаров с дополнительными сведениями).
     """
-    queryset = models.ProductInfo.objects.all()
+    queryset = models.PriceEntry.objects.all()
     serializer_class = serializers.PriceSerializer
     permission_classes = [IsAuthenticated]
-    # Находит Товары определённого названия (сочетания символов в названии). Команда: '.../?prod_name=<prod_name>'.
-    search_fields = ['product__name']
-    SearchFilter.search_param = 'prod_name'
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """ Изменяет перечень возвращаемых данных с учётом фильтров,
@@ -339,6 +523,18 @@ class PriceView(generics.ListAPIView):
         """
         return get_price(self)
 
+    def list(self, request, *args, **kwargs):
+        """ Возвращает страницу Прайса из кэша, если каталог не менялся с её расчёта.
+        """
+        cache, key = get_price_cache(), get_price_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data=data, status=status.HTTP_200_OK)
+
+        response = super().list(request, *args, **kwargs)
+        cache.set(key, response.data)
+        return response
+
 
 class OrderView(viewsets.ModelViewSet):
     """ Класс для создания и просмотра Заказа.
@@ -346,6 +542,7 @@ class OrderView(viewsets.ModelViewSet):
     queryset = models.Order.objects.all()
     serializer_class = serializers.OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     filterset_class = OrderFilter
 
     def get_queryset(self):
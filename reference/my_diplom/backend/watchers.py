@@ -0,0 +1,157 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import time
+
+from backend.feeds import COMPRESSIONS, FEED_FORMATS
+
+# События inotify: файл закрыт после записи, перемещён в каталог, создан или изменён.
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, 'O_CLOEXEC', 0)
+
+# Временные файлы клиентов SFTP и программ выгрузки, которые ещё дописываются.
+PARTIAL_SUFFIXES = ('.part', '.partial', '.tmp', '.filepart', '.crdownload', '.swp')
+
+
+def is_feed_file(name):
+    """ Проверяет по имени, что файл - прайс известного формата, возможно сжатый.
+        Скрытые и временные файлы, которые ещё дописываются, не подходят.
+    """
+    name = name.lower()
+    if name.startswith(('.', '~')) or name.endswith(PARTIAL_SUFFIXES):
+        return False
+
+    root, extension = os.path.splitext(name)
+    if extension == '.zip':
+        return True
+    if any(extension in extensions for _, extensions in COMPRESSIONS.values()):
+        extension = os.path.splitext(root)[1]
+
+    return any(extension in extensions for _, _, extensions in FEED_FORMATS.values())
+
+
+class InotifyWaiter:
+    """ Ожидание изменений в каталогах через inotify (Linux), без сторонних библиотек.
+        Событие только прерывает ожидание: какие файлы готовы к загрузке, определяет просмотр каталогов.
+    """
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1')
+        self.watches = {}           # path: watch descriptor
+
+    def watch(self, paths):
+        """ Устанавливает наблюдение за каталогами 'paths' и снимает его с каталогов, которых больше нет в списке.
+            Каталог, который не удалось наблюдать (ещё не создан), проверяется при следующем вызове.
+        """
+        paths = set(paths)
+        for path in set(self.watches.keys()) - paths:
+            self.libc.inotify_rm_watch(self.fd, self.watches.pop(path))
+        for path in paths - set(self.watches.keys()):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), IN_WATCH_MASK)
+            if wd >= 0:
+                self.watches[path] = wd
+
+    def wait(self, timeout):
+        """ Ждёт события в наблюдаемых каталогах не дольше 'timeout' секунд. Возвращает True, если событие было.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        # События только будят просмотр каталогов, поэтому их содержимое не разбирается.
+        try:
+            while os.read(self.fd, 64 * 1024):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWaiter:
+    """ Ожидание изменений в каталогах периодическим просмотром, если inotify недоступен.
+    """
+
+    def watch(self, paths):
+        pass
+
+    @staticmethod
+    def wait(timeout):
+        time.sleep(timeout)
+        return False
+
+    def close(self):
+        pass
+
+
+def get_waiter(polling=False):
+    """ Возвращает ожидание через inotify, а если он недоступен (не Linux) или 'polling' - периодический просмотр.
+    """
+    if not polling:
+        try:
+            return InotifyWaiter()
+        except (OSError, AttributeError, TypeError):
+            pass
+
+    return PollingWaiter()
+
+
+class DropFolder:
+    """ Просмотр каталогов, в которые поставщики выкладывают прайсы (например, по SFTP).
+        Файл считается дописанным, когда его размер и время изменения не менялись два просмотра подряд
+        и с последнего изменения прошло не меньше 'settle' секунд. Загруженный файл повторно выдаётся,
+        только если он изменился.
+    """
+
+    def __init__(self, settle):
+        self.settle = settle
+        self.pending = {}           # path: (size, mtime_ns) на предыдущем просмотре
+        self.imported = {}          # path: (size, mtime_ns) при передаче на загрузку
+
+    def scan(self, folders, once=False):
+        """ Просматривает каталоги 'folders' ({path: shop}) и возвращает готовые к загрузке файлы: [(shop, path)].
+            С 'once' файл не ждёт второго просмотра, достаточно, что он не менялся 'settle' секунд.
+        """
+        ready, seen, now = [], set(), time.time()
+        for folder, shop in folders.items():
+            try:
+                entries = list(os.scandir(folder))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if not entry.is_file() or not is_feed_file(entry.name):
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                seen.add(entry.path)
+                # Пустой файл обычно только что создан и ещё не дописан.
+                if not stat.st_size:
+                    continue
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if self.imported.get(entry.path) == signature:
+                    continue
+                previous = self.pending.get(entry.path)
+                self.pending[entry.path] = signature
+                if (once or previous == signature) and now - stat.st_mtime >= self.settle:
+                    del self.pending[entry.path]
+                    self.imported[entry.path] = signature
+                    ready.append((shop, entry.path))
+
+        # Удалённые файлы забываются, чтобы файл с тем же именем загрузился снова.
+        for state in (self.pending, self.imported):
+            for path in set(state.keys()) - seen:
+                del state[path]
+
+        return ready
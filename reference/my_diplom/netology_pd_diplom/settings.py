@@ -145,6 +145,13 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Загруженные файлы (в том числе файлы прайсов, ожидающие загрузки).
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+# Загруженные файлы больше FILE_UPLOAD_MAX_MEMORY_SIZE и скачанные прайсы сохраняются во временный каталог,
+# а не в память. По умолчанию - системный временный каталог.
+FILE_UPLOAD_TEMP_DIR = os.getenv('FILE_UPLOAD_TEMP_DIR') or None
+
 
 # Имя класса модели, хранящей список зарегистрированных пользователей.
 AUTH_USER_MODEL='users.User'
@@ -194,6 +201,68 @@ REST_FRAMEWORK = {
 }
 
 
+# Настройки импорта товаров.
+# Размер пакета товаров, записываемых в БД одним запросом.
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE') or 1000)
+# Количество процессов для разбора и проверки товаров больших файлов. Если 0, то по числу ядер процессора.
+IMPORT_WORKERS = int(os.getenv('IMPORT_WORKERS') or 0)
+# Загрузка выполняется в отдельном процессе 'run_import_worker'. Если 'False', то в процессе обработки запроса.
+IMPORT_JOBS_ASYNC = os.getenv('IMPORT_JOBS_ASYNC') != 'False'
+# Количество одновременно загружаемых разделов файла нескольких Магазинов при загрузке в процессе обработки запроса.
+IMPORT_SHOP_WORKERS = int(os.getenv('IMPORT_SHOP_WORKERS') or 4)
+# Период опроса очереди заданий на загрузку, в секундах.
+IMPORT_WORKER_INTERVAL = float(os.getenv('IMPORT_WORKER_INTERVAL') or 2)
+# Загрузки одного Магазина выполняются по очереди. Пока загрузка идёт, блокировка продлевается каждую треть
+# IMPORT_LOCK_TIMEOUT, а блокировка, которая не продлевалась дольше IMPORT_LOCK_TIMEOUT секунд (процесс загрузки
+# аварийно завершился), снимается. Загрузка в процессе обработки запроса ожидает снятия блокировки
+# не дольше IMPORT_LOCK_WAIT секунд.
+IMPORT_LOCK_TIMEOUT = float(os.getenv('IMPORT_LOCK_TIMEOUT') or 600)
+IMPORT_LOCK_WAIT = float(os.getenv('IMPORT_LOCK_WAIT') or 30)
+# Замер пиковой памяти загрузки ('tracemalloc'). Замедляет загрузку в несколько раз, поэтому включается явно: 'True'.
+IMPORT_TRACE_MEMORY = os.getenv('IMPORT_TRACE_MEMORY') == 'True'
+# Количество ошибок товаров в ответе на загрузку, все ошибки доступны постранично: 'upload/<job_id>/errors/'.
+IMPORT_RESPONSE_ERRORS = int(os.getenv('IMPORT_RESPONSE_ERRORS') or 20)
+# Время ожидания ответа сервера поставщика и предельное время скачивания файла прайса, в секундах.
+FEED_FETCH_TIMEOUT = float(os.getenv('FEED_FETCH_TIMEOUT') or 30)
+FEED_FETCH_TOTAL_TIMEOUT = float(os.getenv('FEED_FETCH_TOTAL_TIMEOUT') or 600)
+# Предельный размер скачиваемого файла прайса, в байтах.
+FEED_FETCH_MAX_SIZE = int(os.getenv('FEED_FETCH_MAX_SIZE') or 1024 ** 3)
+# Предельный размер распакованного файла прайса, сжатого gzip, bzip2 или zip, в байтах.
+FEED_DECOMPRESSED_MAX_SIZE = int(os.getenv('FEED_DECOMPRESSED_MAX_SIZE') or 4 * 1024 ** 3)
+# Количество соединений, сохраняемых открытыми для повторных запросов к серверам поставщиков.
+FEED_FETCH_POOL_SIZE = int(os.getenv('FEED_FETCH_POOL_SIZE') or 10)
+# Период плановой загрузки прайсов по ссылкам магазинов ('run_feed_scheduler'), в секундах.
+FEED_REFRESH_INTERVAL = float(os.getenv('FEED_REFRESH_INTERVAL') or 3600)
+# Количество одновременных плановых загрузок, всего и к одному серверу поставщика.
+FEED_REFRESH_WORKERS = int(os.getenv('FEED_REFRESH_WORKERS') or 4)
+FEED_REFRESH_PER_HOST = int(os.getenv('FEED_REFRESH_PER_HOST') or 1)
+# Наибольшая случайная задержка запуска плановой загрузки, в секундах.
+FEED_REFRESH_JITTER = float(os.getenv('FEED_REFRESH_JITTER') or 60)
+# Каталоги, в которые поставщики выкладывают прайсы ('watch_drop_folders'): наибольший период просмотра
+# и время, которое файл не должен меняться, чтобы считаться дописанным, в секундах; количество одновременных загрузок.
+FEED_DROP_INTERVAL = float(os.getenv('FEED_DROP_INTERVAL') or 60)
+FEED_DROP_SETTLE = float(os.getenv('FEED_DROP_SETTLE') or 10)
+FEED_DROP_WORKERS = int(os.getenv('FEED_DROP_WORKERS') or 2)
+
+
+# Кэш ответов Прайса. Ключ ответа включает версию каталога, которая меняется при каждом изменении товаров,
+# поэтому устаревшие страницы не отдаются и не удаляются по одной, а вытесняются по времени 'PRICE_CACHE_TIMEOUT'.
+# Версия хранится в БД ('CatalogVersion'), поэтому изменения из других процессов ('run_import_worker',
+# 'watch_drop_folders') видны и с кэшем в памяти ('LocMemCache'). Общий кэш, например, файловый:
+# PRICE_CACHE_BACKEND='django.core.cache.backends.filebased.FileBasedCache', PRICE_CACHE_LOCATION - каталог кэша,
+# нужен только для того, чтобы процессы сервера использовали ответы друг друга.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'prices': {
+        'BACKEND': os.getenv('PRICE_CACHE_BACKEND') or 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': os.getenv('PRICE_CACHE_LOCATION') or 'prices',
+        'TIMEOUT': int(os.getenv('PRICE_CACHE_TIMEOUT') or 300),
+    },
+}
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 